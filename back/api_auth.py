@@ -8,6 +8,8 @@ from flet.auth.providers import GoogleOAuthProvider
 from google.oauth2 import id_token
 from google.auth.transport import requests as greq
 
+from back.drive.service_pool import SERVICE_POOL, page_identity
+
 class GoogleAuthHandler:
     def __init__(
         self,
@@ -68,6 +70,16 @@ class GoogleAuthHandler:
         return bool(self.user and self.token)
 
     def logout(self):
+        try:
+            # la cola de logs de este usuario se manda con sus credenciales: se vacía antes
+            from back.sheet.log_api import flush_logs
+            flush_logs(timeout=5.0, user=page_identity(self.page))
+        except Exception:
+            pass
+        try:
+            SERVICE_POOL.forget(self.page)
+        except Exception:
+            pass
         try:
             self.page.logout()
         except:
@@ -3,9 +3,10 @@ from datetime import datetime
 import flet as ft
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from back.drive.service_pool import SERVICE_POOL
+
 DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive"]
 SHEETS_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
@@ -47,13 +48,18 @@ def _creds_from_flet(
 
 
 def build_drive_service(page: ft.Page, client_id: str | None = None, client_secret: str | None = None):
-    creds = _creds_from_flet(page, client_id=client_id, client_secret=client_secret)
-    return build("drive", "v3", credentials=creds, cache_discovery=False)
+    # Cliente compartido por usuario (ver back/drive/service_pool.py)
+    return SERVICE_POOL.service(
+        page, "drive", "v3",
+        lambda: _creds_from_flet(page, client_id=client_id, client_secret=client_secret),
+    )
 
 
 def build_sheets_service(page: ft.Page, client_id: str | None = None, client_secret: str | None = None):
-    creds = _creds_from_flet(page, client_id=client_id, client_secret=client_secret)
-    return build("sheets", "v4", credentials=creds, cache_discovery=False)
+    return SERVICE_POOL.service(
+        page, "sheets", "v4",
+        lambda: _creds_from_flet(page, client_id=client_id, client_secret=client_secret),
+    )
 
 
 # -------------------- Folders & Files helpers --------------------
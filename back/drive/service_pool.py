@@ -0,0 +1,223 @@
+# back/drive/service_pool.py
+"""
+Pool de clientes de Google API para todo el proceso.
+
+Antes cada SheetsBase / SheetsAPI / LogAPI armaba sus propias Credentials y un
+build("sheets", "v4") nuevo (con su propio transporte HTTP). Acá:
+  - Las credenciales se guardan por identidad de usuario y se comparten entre APIs.
+    Si el token de page.auth cambia (refresh), se actualiza la MISMA instancia de
+    Credentials, así todos los clientes ya construidos usan el token nuevo.
+  - Los clientes se guardan por (identidad, api, versión) y se reutilizan.
+  - forget() (logout) sólo suelta las credenciales de una identidad cuando se va la
+    última sesión de ese usuario: las otras pestañas siguen usando los mismos clientes.
+  - El AuthorizedHttp es uno por hilo y va sobre el transporte compartido con pool
+    de conexiones (back/integrations/http_pool.py): keep-alive entre llamadas y
+    entre sesiones. Sin urllib3 se usa un httplib2.Http por hilo.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from googleapiclient.discovery import build
+
+try:
+    import httplib2
+    import google_auth_httplib2
+    from googleapiclient.http import HttpRequest
+except Exception:  # sin httplib2: se sigue compartiendo las credenciales, no el cliente
+    httplib2 = None
+    google_auth_httplib2 = None
+    HttpRequest = None
+
+from back.integrations import http_pool
+from back.integrations.api_metrics import TrackedHttpRequest
+
+
+def _short_hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+def page_identity(page) -> str:
+    """Clave estable del usuario logueado (id/email de page.auth.user, o hash del token)."""
+    auth = getattr(page, "auth", None)
+    user = getattr(auth, "user", None)
+    if user is not None:
+        for k in ("id", "sub", "email"):
+            v = getattr(user, k, None)
+            if v is None and hasattr(user, "get"):
+                try:
+                    v = user.get(k)
+                except Exception:
+                    v = None
+            if v:
+                return f"user:{v}"
+    t = getattr(auth, "token", None)
+    for k in ("refresh_token", "access_token"):
+        v = getattr(t, k, None)
+        if v:
+            return f"tok:{_short_hash(str(v))}"
+    return "anon"
+
+
+def _session_key(page):
+    return getattr(page, "session_id", None) or id(page)
+
+
+class ServicePool:
+    """Clientes de Google API y credenciales compartidos por todo el proceso."""
+
+    HTTP_TIMEOUT = 60
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # identidad -> [Credentials, access_token de page.auth con el que se armaron]
+        self._creds: Dict[str, list] = {}
+        # (identidad, api, versión) -> cliente
+        self._services: Dict[Tuple[str, str, str], Any] = {}
+        # identidad -> sesiones (page.session_id) que la están usando
+        self._sessions: Dict[str, Set[Any]] = {}
+        self._local = threading.local()
+        # Fábrica del transporte base
+        self.http_factory: Callable[[], Any] = self._default_http
+        self.stats = {"built": 0, "reused": 0, "token_updates": 0}
+        # (api, versión) -> servicio que reemplaza al real (p. ej. el emulador local)
+        self.overrides: Dict[Tuple[str, str], Any] = {}
+
+    def _default_http(self):
+        if http_pool.available():
+            return http_pool.PooledHttp(timeout=self.HTTP_TIMEOUT)
+        return httplib2.Http(timeout=self.HTTP_TIMEOUT) if httplib2 else None
+
+    # --------- credenciales ----------
+    def credentials(self, page, make_creds: Callable[[], Any], identity: Optional[str] = None):
+        """
+        Credentials compartidas de la identidad. Si el token de la página es el mismo con
+        el que se armaron, se devuelven tal cual (sin tocar la red); si cambió, se arman
+        unas nuevas con make_creds() y se copian sobre la instancia compartida.
+        """
+        identity = identity or page_identity(page)
+        t = getattr(getattr(page, "auth", None), "token", None)
+        token = getattr(t, "access_token", None)
+        with self._lock:
+            if page is not None:
+                self._sessions.setdefault(identity, set()).add(_session_key(page))
+            entry = self._creds.get(identity)
+            if entry is not None and token and entry[1] == token:
+                return entry[0]
+
+        fresh = make_creds()
+        with self._lock:
+            entry = self._creds.get(identity)
+            if entry is None:
+                self._creds[identity] = [fresh, token]
+                return fresh
+            self._update_in_place(entry[0], fresh)
+            entry[1] = token
+            self.stats["token_updates"] += 1
+            return entry[0]
+
+    @staticmethod
+    def _update_in_place(cur, fresh):
+        # Un refresh hecho por google-auth sobre la instancia compartida puede ser más
+        # nuevo que el token que trae la página: no se pisa con uno más viejo.
+        cur_exp, new_exp = getattr(cur, "expiry", None), getattr(fresh, "expiry", None)
+        if cur_exp and new_exp and new_exp < cur_exp:
+            return
+        cur.token = fresh.token
+        cur.expiry = new_exp
+        # refresh_token / client_id / client_secret son de solo lectura en Credentials
+        for attr in ("_refresh_token", "_client_id", "_client_secret"):
+            v = getattr(fresh, attr, None)
+            if v:
+                setattr(cur, attr, v)
+
+    # --------- transporte ----------
+    def _http_for(self, identity: str, fallback=None):
+        """
+        AuthorizedHttp del hilo actual para la identidad (se reutiliza: keep-alive).
+        fallback: credenciales con las que se armó el cliente, por si la identidad ya se
+        olvidó y alguien sigue teniendo el cliente en la mano.
+        """
+        https = getattr(self._local, "https", None)
+        if https is None:
+            https = self._local.https = {}
+        with self._lock:
+            entry = self._creds.get(identity)
+        creds = entry[0] if entry is not None else fallback
+        if creds is None:
+            raise RuntimeError(f"sin credenciales para {identity}")
+        http = https.get(identity)
+        if http is None or http.credentials is not creds:
+            http = google_auth_httplib2.AuthorizedHttp(creds, http=self.http_factory())
+            https[identity] = http
+        return http
+
+    def _request_builder(self, identity: str, creds):
+        def builder(_http, *args, **kwargs):
+            # Ignora el http del cliente: cada hilo usa su propio transporte.
+            # TrackedHttpRequest mide cada execute() (back/integrations/api_metrics.py)
+            cls = TrackedHttpRequest or HttpRequest
+            return cls(self._http_for(identity, creds), *args, **kwargs)
+        return builder
+
+    # --------- clientes ----------
+    def service(self, page, api: str, version: str, make_creds: Callable[[], Any]):
+        override = self.overrides.get((api, version))
+        if override is not None:
+            return override
+        identity = page_identity(page)
+        creds = self.credentials(page, make_creds, identity=identity)
+
+        if not (httplib2 and google_auth_httplib2 and HttpRequest):
+            self.stats["built"] += 1
+            return build(api, version, credentials=creds, cache_discovery=False)
+
+        key = (identity, api, version)
+        with self._lock:
+            svc = self._services.get(key)
+            if svc is not None:
+                self.stats["reused"] += 1
+                return svc
+            svc = build(
+                api, version,
+                http=self._http_for(identity, creds),
+                requestBuilder=self._request_builder(identity, creds),
+                cache_discovery=False,
+            )
+            self._services[key] = svc
+            self.stats["built"] += 1
+            return svc
+
+    def forget(self, page=None, identity: Optional[str] = None) -> bool:
+        """
+        Logout de una sesión. Las credenciales y clientes de la identidad se olvidan sólo
+        si no queda otra sesión usándolos (o si se llama sin page, con identity=...).
+        Devuelve True si se olvidaron.
+        """
+        identity = identity or page_identity(page)
+        with self._lock:
+            sessions = self._sessions.get(identity)
+            if page is not None and sessions:
+                sessions.discard(_session_key(page))
+                if sessions:
+                    return False
+            self._sessions.pop(identity, None)
+            self._creds.pop(identity, None)
+            for key in [k for k in self._services if k[0] == identity]:
+                self._services.pop(key, None)
+        https = getattr(self._local, "https", None)
+        if https:
+            https.pop(identity, None)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._creds.clear()
+            self._sessions.clear()
+            self._services.clear()
+        self._local = threading.local()
+
+
+SERVICE_POOL = ServicePool()
@@ -0,0 +1,146 @@
+# ./back/image/drive_thumbs.py
+"""
+Miniaturas que genera Drive (files.get fields=thumbnailLink).
+
+Para las filas de las listas no hace falta bajar el archivo completo por
+uc?export=download: Drive ya tiene una miniatura del lado del servidor y el link acepta
+un sufijo =s{lado} con el tamaño pedido. DriveThumbLinks resuelve ID de archivo -> link:
+  - sólo para archivos compartidos con "cualquiera con el link": el link se pide con las
+    credenciales de un usuario, pero la miniatura queda en el cache del proceso y en
+    assets/ (sin login). Un archivo privado da None y se sigue por la descarga normal
+    (uc?export=download), que sin credenciales tampoco lo puede leer;
+  - los pedidos que llegan juntos (una lista que se dibuja) se juntan durante
+    BATCH_WINDOW y salen en UN batch de files.get (hasta BATCH_MAX por batch);
+  - los links resueltos (y los archivos sin miniatura o privados) se guardan LINK_TTL segundos:
+    Drive los rota cada algunas horas.
+
+Configuración por entorno: DRIVE_THUMB_LINKS (0 = desactivado), DRIVE_THUMB_TTL.
+"""
+from __future__ import annotations
+import os, re, threading, time
+from concurrent.futures import Future
+from typing import Dict, Iterable, Optional, Tuple
+
+ENABLED = os.getenv("DRIVE_THUMB_LINKS", "1") != "0"
+LINK_TTL = float(os.getenv("DRIVE_THUMB_TTL", "3000"))
+BATCH_WINDOW = 0.03     # segundos que se espera para juntar pedidos
+BATCH_MAX = 100         # máximo de requests por batch en la API de Drive
+MAX_LINKS = 5000
+
+_RX_SIZE = re.compile(r"=s\d+(-[a-z0-9-]*)?$")
+
+
+def sized(link: str, size: int) -> str:
+    """thumbnailLink con el lado pedido (reemplaza el =s220 que trae por defecto)."""
+    if _RX_SIZE.search(link):
+        return _RX_SIZE.sub(f"=s{int(size)}", link)
+    return f"{link}=s{int(size)}"
+
+
+def is_public(meta: Dict) -> bool:
+    """El archivo tiene permiso 'anyone' (si Drive no muestra los permisos, se toma como privado)."""
+    return any(p.get("type") == "anyone" and p.get("role") in ("reader", "commenter", "writer", "owner")
+               for p in (meta or {}).get("permissions") or [])
+
+
+class DriveThumbLinks:
+    def __init__(self, ttl: float = LINK_TTL, window: float = BATCH_WINDOW):
+        self.ttl = ttl
+        self.window = window
+        self._lock = threading.Lock()
+        self._links: Dict[str, Tuple[float, Optional[str]]] = {}          # fid -> (ts, link o None)
+        self._pending: Dict[str, Tuple[object, Dict[str, Future]]] = {}   # usuario -> (page, {fid: fut})
+        self.batches = 0
+
+    def cached(self, fid: str) -> Tuple[bool, Optional[str]]:
+        """(está en cache y vigente, link)."""
+        with self._lock:
+            item = self._links.get(fid)
+        if item is not None and time.time() - item[0] < self.ttl:
+            return True, item[1]
+        return False, None
+
+    def request(self, page, fid: str) -> Future:
+        """Future con el thumbnailLink del archivo (None si Drive no tiene, es privado o falló)."""
+        hit, link = self.cached(fid)
+        if hit:
+            fut: Future = Future()
+            fut.set_result(link)
+            return fut
+        from back.drive.service_pool import page_identity
+        who = page_identity(page)
+        with self._lock:
+            slot = self._pending.get(who)
+            if slot is None:
+                slot = self._pending[who] = (page, {})
+                threading.Timer(self.window, self._flush, args=(who,)).start()
+            fut = slot[1].get(fid)
+            if fut is None:
+                fut = slot[1][fid] = Future()
+            return fut
+
+    def prefetch(self, page, fids: Iterable[str]) -> None:
+        """Encola varios IDs a la vez (por ejemplo, todos los de una lista)."""
+        for fid in fids:
+            if fid:
+                self.request(page, fid)
+
+    def invalidate(self, fid: str) -> None:
+        with self._lock:
+            self._links.pop(fid, None)
+
+    def _flush(self, who: str):
+        with self._lock:
+            page, futs = self._pending.pop(who, (None, {}))
+        fids = list(futs)
+        found: Dict[str, Optional[str]] = {}
+        try:
+            from back.drive.drive_check import build_drive_service
+            svc = build_drive_service(page)
+            for i in range(0, len(fids), BATCH_MAX):
+                found.update(self._batch(svc, fids[i:i + BATCH_MAX]))
+        except Exception as ex:
+            print(f"[drive_thumbs] ERROR batch n={len(fids)} ex={ex}", flush=True)
+        now = time.time()
+        with self._lock:
+            if len(self._links) > MAX_LINKS:
+                self._links.clear()
+            for fid in fids:
+                if fid in found:     # los que fallaron por red no se guardan
+                    self._links[fid] = (now, found[fid])
+        for fid, fut in futs.items():
+            fut.set_result(found.get(fid))
+
+    def _batch(self, svc, fids) -> Dict[str, Optional[str]]:
+        out: Dict[str, Optional[str]] = {}
+
+        def on_result(rid, resp, exc):
+            if exc is None:
+                out[rid] = ((resp or {}).get("thumbnailLink") or None) if is_public(resp) else None
+            elif getattr(getattr(exc, "resp", None), "status", None) in (403, 404):
+                out[rid] = None      # sin acceso / no existe: no tiene sentido repreguntar
+
+        files = svc.files()
+        batch = svc.new_batch_http_request(callback=on_result)
+        for fid in fids:
+            batch.add(files.get(fileId=fid, fields="id,thumbnailLink,permissions(type,role)",
+                                supportsAllDrives=True),
+                      request_id=fid)
+        batch.execute()
+        with self._lock:
+            self.batches += 1
+        return out
+
+
+_links: Optional[DriveThumbLinks] = None
+_links_lock = threading.Lock()
+
+
+def get_drive_thumb_links() -> Optional[DriveThumbLinks]:
+    global _links
+    if not ENABLED:
+        return None
+    with _links_lock:
+        if _links is None:
+            _links = DriveThumbLinks()
+        return _links
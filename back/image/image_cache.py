@@ -1,61 +1,246 @@
 # ./back/image/image_cache.py
+"""
+Cache de imágenes en dos niveles.
+
+L1 (memoria): OrderedDict en orden LRU (get / set / desalojo en O(1)). El límite es en
+bytes de la imagen decodificada, no en cantidad: mil fotos de celular no pueden ocupar
+cientos de MB por proceso. Cada entrada vence a los ttl_seconds.
+
+L2 (disco): un archivo por clave en cache_dir, con su propio tope en bytes. Un hilo
+"janitor" borra los archivos más viejos (por mtime; un hit en disco lo renueva) cuando
+la carpeta pasa el tope, y los vencidos si hay disk_ttl_seconds.
+
+Configuración por entorno: IMAGE_CACHE_MEM_MB, IMAGE_CACHE_DISK_MB, IMAGE_CACHE_TTL.
+"""
 from __future__ import annotations
-import os, time, base64, hashlib
-from typing import Optional
+import os, time, base64, hashlib, threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+MEM_BUDGET = int(float(os.getenv("IMAGE_CACHE_MEM_MB", "64")) * 1024 * 1024)
+DISK_BUDGET = int(float(os.getenv("IMAGE_CACHE_DISK_MB", "512")) * 1024 * 1024)
+TTL_SECONDS = int(os.getenv("IMAGE_CACHE_TTL", "3600"))
+JANITOR_SECONDS = 300
+
+
+def scan_dir(path: str) -> Tuple[List[Tuple[float, int, str]], int]:
+    """([(mtime, tamaño, ruta)], bytes totales) de los archivos de la carpeta."""
+    files = []
+    total = 0
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                if not e.is_file() or e.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+    except OSError:
+        pass
+    return files, total
+
+
+def trim_dir(path: str, max_bytes: int, ttl: Optional[float] = None) -> Tuple[int, int]:
+    """Borra los vencidos y los más viejos hasta quedar bajo max_bytes. (borrados, bytes que quedan)."""
+    files, total = scan_dir(path)
+    now = time.time()
+    files.sort()
+    removed = 0
+    for mtime, size, fpath in files:
+        expired = bool(ttl) and now - mtime > ttl
+        if not expired and total <= max_bytes:
+            break
+        try:
+            os.remove(fpath)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    return removed, total
+
 
 class ImageCache:
-    def __init__(self, cache_dir: str = "images_cache", ttl_seconds: int = 3600, max_items: int = 1000):
+    def __init__(
+        self,
+        cache_dir: str = "images_cache",
+        ttl_seconds: int = TTL_SECONDS,
+        max_bytes: int = MEM_BUDGET,
+        disk_max_bytes: int = DISK_BUDGET,
+        disk_ttl_seconds: Optional[int] = None,
+        janitor_seconds: Optional[float] = JANITOR_SECONDS,
+    ):
         self.cache_dir = cache_dir
         self.ttl = ttl_seconds
-        self.max_items = max_items
-        self.mem = {}       # recid -> (ts, b64)
-        self.order = []     # LRU order
+        self.max_bytes = int(max_bytes)
+        self.disk_max_bytes = int(disk_max_bytes)
+        self.disk_ttl = disk_ttl_seconds
+        self.mem: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()   # key -> (ts, bytes), LRU primero
+        self.mem_bytes = 0
+        self.disk_bytes = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stats: Dict[str, int] = {
+            "hits": 0, "disk_hits": 0, "misses": 0, "expired": 0,
+            "evictions": 0, "evicted_bytes": 0, "disk_evictions": 0, "disk_errors": 0,
+        }
         os.makedirs(self.cache_dir, exist_ok=True)
+        self.disk_bytes = scan_dir(self.cache_dir)[1]
+        if janitor_seconds:
+            threading.Thread(target=self._janitor, args=(janitor_seconds,),
+                             name="image-cache-janitor", daemon=True).start()
 
     # ----- L1: memoria -----
-    def get_b64(self, recid: str) -> Optional[str]:
-        if not recid: return None
-        item = self.mem.get(recid)
+    def get(self, key: str, disk: bool = True, promote: bool = True) -> Optional[bytes]:
+        """
+        Bytes de la imagen (memoria o disco) o None. disk=False: sólo memoria, sin I/O.
+        promote=False: un hit en disco no se sube a memoria.
+        """
+        if not key:
+            return None
         now = time.time()
-        if item and (now - item[0] < self.ttl):
-            # refresh LRU
-            try: self.order.remove(recid)
-            except ValueError: pass
-            self.order.append(recid)
-            return item[1]
+        with self._lock:
+            item = self.mem.get(key)
+            if item is not None:
+                if now - item[0] < self.ttl:
+                    self.mem.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return item[1]
+                self._drop(key)
+                self._stats["expired"] += 1
+        if not disk:
+            return None         # no cuenta como miss: el que llama sigue con el disco
         # L2: disco
-        path = self._path(recid)
-        if os.path.exists(path):
-            try:
-                with open(path, "rb") as f:
-                    data = f.read()
-                b64 = base64.b64encode(data).decode("utf-8")
-                self._set_mem(recid, b64)
-                return b64
-            except Exception:
+        data = self._read_disk(key, now)
+        with self._lock:
+            if data is None:
+                self._stats["misses"] += 1
                 return None
-        return None
+            self._stats["disk_hits"] += 1
+            if promote:
+                self._set_mem(key, data, now)
+        return data
+
+    def set(self, key: str, data: bytes, disk: bool = True, mem: bool = True) -> None:
+        if not key or not data:
+            return
+        if mem:
+            with self._lock:
+                self._set_mem(key, data, time.time())
+        if disk:
+            self._write_disk(key, data)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._drop(key)
+        try:
+            path = self._path(key)
+            size = os.path.getsize(path)
+            os.remove(path)
+            with self._lock:
+                self.disk_bytes -= size
+        except OSError:
+            pass
+
+    # compat: la interfaz anterior trabajaba con base64
+    def get_b64(self, recid: str) -> Optional[str]:
+        data = self.get(recid)
+        return base64.b64encode(data).decode("utf-8") if data is not None else None
 
     def set_b64(self, recid: str, b64: str) -> None:
-        self._set_mem(recid, b64)
         try:
             data = base64.b64decode(b64)
-            with open(self._path(recid), "wb") as f:
-                f.write(data)
         except Exception:
+            return
+        self.set(recid, data)
+
+    def _set_mem(self, key: str, data: bytes, now: float):
+        # con el lock tomado
+        self._drop(key)
+        if len(data) > self.max_bytes:
+            return              # no entra: sólo queda en disco
+        self.mem[key] = (now, data)
+        self.mem_bytes += len(data)
+        while self.mem_bytes > self.max_bytes:
+            _old, (_ts, b) = self.mem.popitem(last=False)
+            self.mem_bytes -= len(b)
+            self._stats["evictions"] += 1
+            self._stats["evicted_bytes"] += len(b)
+
+    def _drop(self, key: str):
+        item = self.mem.pop(key, None)
+        if item is not None:
+            self.mem_bytes -= len(item[1])
+
+    # ----- L2: disco -----
+    def _read_disk(self, key: str, now: float) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            if self.disk_ttl and now - os.path.getmtime(path) > self.disk_ttl:
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, None)        # el janitor borra por mtime: esto lo deja como reciente
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError:
+            with self._lock:
+                self._stats["disk_errors"] += 1
+            return None
+
+    def _write_disk(self, key: str, data: bytes):
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            try:
+                prev = os.path.getsize(path)
+            except OSError:
+                prev = 0
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            with self._lock:
+                self.disk_bytes += len(data) - prev
+                over = self.disk_bytes > self.disk_max_bytes
+            if over:
+                self._wake.set()
+        except OSError:
             # si no se pudo escribir, al menos queda en RAM
-            pass
+            with self._lock:
+                self._stats["disk_errors"] += 1
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
 
-    def _set_mem(self, recid: str, b64: str):
-        now = time.time()
-        self.mem[recid] = (now, b64)
-        try: self.order.remove(recid)
-        except ValueError: pass
-        self.order.append(recid)
-        # LRU trim
-        while len(self.order) > self.max_items:
-            old = self.order.pop(0)
-            self.mem.pop(old, None)
+    def trim_disk(self) -> int:
+        """Borra vencidos y, si hace falta, los más viejos hasta quedar bajo el tope. Devuelve cuántos."""
+        removed, total = trim_dir(self.cache_dir, self.disk_max_bytes, self.disk_ttl)
+        with self._lock:
+            self.disk_bytes = total
+            self._stats["disk_evictions"] += removed
+        return removed
+
+    def _janitor(self, every: float):
+        while True:
+            self._wake.wait(every)
+            self._wake.clear()
+            try:
+                self.trim_disk()
+            except Exception as ex:
+                print(f"[image_cache.janitor] ERROR {ex}", flush=True)
+
+    # ----- métricas -----
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._stats)
+            out.update(items=len(self.mem), mem_bytes=self.mem_bytes, disk_bytes=self.disk_bytes)
+        lookups = out["hits"] + out["disk_hits"] + out["misses"]
+        out["hit_rate"] = round((out["hits"] + out["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return out
 
     def _path(self, recid: str) -> str:
         # nombre estable y seguro
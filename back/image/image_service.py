@@ -0,0 +1,488 @@
+# ./back/image/image_service.py
+"""
+Servicio único de imágenes (Drive / URLs directas) para todo el proceso.
+
+get(fuente) -> bytes o None:
+  1. L1 memoria y L2 disco (ImageCache, con tope en bytes).
+  2. Negative cache: si una fuente falló hace menos de NEGATIVE_TTL segundos no se
+     vuelve a pedir (links rotos, archivos sin permiso).
+  3. Single-flight: varios pedidos de la misma imagen a la vez hacen UNA descarga.
+  4. Descargas limitadas por un semáforo (MAX_CONCURRENCY) compartido por todas las
+     sesiones, por el pool HTTP.
+
+variant="list" / "detail": miniatura de ese tamaño, guardada en la cache con su propia
+clave. Para archivos de Drive (si se pasa la page, para las credenciales) se baja la
+miniatura que ya genera Drive (back/image/drive_thumbs.py); si no hay, se baja la original
+y se achica en el pool de miniaturas (back/image/thumbnails.py), sin que la original
+ocupe la memoria. Sin variant (vista de detalle) se baja siempre el archivo completo.
+
+Los contadores (hits, descargas, bytes bajados...) se llevan por sesión de Flet y en total.
+
+get_src(fuente) -> valor para ft.Image.src. En vez de un data: URL en base64 (que viaja por
+el websocket, 33% más grande, y se reenvía en cada update del control) la imagen se
+escribe una vez en assets/img_cache/<sha256>.<ext> y src queda como "img_cache/<archivo>":
+el navegador la baja del servidor de assets de Flet y la guarda en su cache. Como el
+nombre sale del contenido, una URL siempre corresponde a los mismos bytes.
+
+Configuración por entorno: IMAGE_MAX_CONCURRENCY, IMAGE_NEGATIVE_TTL, IMAGE_STATIC_URLS
+(0 = volver a data: URLs), IMAGE_STATIC_MB, IMAGE_ASSETS_DIR (y los de image_cache).
+"""
+from __future__ import annotations
+import asyncio, base64, hashlib, os, re, threading, time
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple
+
+from back.integrations.http_pool import fetch_bytes
+from back.image.image_cache import ImageCache, scan_dir, trim_dir
+from back.image import thumbnails
+from back.image.drive_thumbs import get_drive_thumb_links, sized
+
+MAX_CONCURRENCY = int(os.getenv("IMAGE_MAX_CONCURRENCY", "6"))
+NEGATIVE_TTL = float(os.getenv("IMAGE_NEGATIVE_TTL", "300"))
+FETCH_TIMEOUT = 25
+
+CACHE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../..", "images_cache", "http")
+)
+
+STATIC_URLS = os.getenv("IMAGE_STATIC_URLS", "1") != "0"
+STATIC_BUDGET = int(float(os.getenv("IMAGE_STATIC_MB", "256")) * 1024 * 1024)
+ASSETS_DIR = os.getenv("IMAGE_ASSETS_DIR") or os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../..", "front", "assets")
+)
+STATIC_SUBDIR = "img_cache"
+
+# ---------- URL helpers (Drive y genéricas) ----------
+_RX_FILE_D = re.compile(r"/d/([a-zA-Z0-9_-]+)")
+_RX_Q_ID = re.compile(r"[?&]id=([a-zA-Z0-9_-]+)")
+
+
+def extract_drive_id(url_or_id: str) -> str:
+    """ID de archivo de Drive en links /file/d/<id>/..., ?id=<id>, o el texto tal cual."""
+    if not url_or_id:
+        return ""
+    m = _RX_FILE_D.search(url_or_id) or _RX_Q_ID.search(url_or_id)
+    return m.group(1) if m else url_or_id.strip()
+
+
+def is_drive(url: str) -> bool:
+    return "drive.google.com" in (url or "") or "docs.google.com" in (url or "")
+
+
+def drive_download_url(fid: str) -> str:
+    return f"https://drive.google.com/uc?export=download&id={fid}"
+
+
+def resolve(source: str) -> Tuple[str, str]:
+    """(url de descarga, clave de cache). Los links de Drive comparten clave por ID."""
+    s = (source or "").strip()
+    if not s:
+        return "", ""
+    if is_drive(s):
+        fid = extract_drive_id(s)
+        return drive_download_url(fid), f"drive:{fid}"
+    return s, s
+
+
+def looks_like_html(b: Optional[bytes]) -> bool:
+    if not b:
+        return False
+    head = b[:256].lstrip().lower()
+    return head.startswith(b"<!doctype html") or head.startswith(b"<html") or b"<html" in head
+
+
+def is_image_content_type(ct: str) -> bool:
+    return (ct or "").lower().startswith("image/")
+
+
+def guess_mime(b: bytes) -> str:
+    if not b or len(b) < 12:
+        return "image/jpeg"
+    if b.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if b.startswith(b"\x89PNG"):
+        return "image/png"
+    if b.startswith(b"GIF8"):
+        return "image/gif"
+    if b[:4] == b"RIFF" and b[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+_EXT = {"image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}
+
+
+def data_url(b: bytes) -> str:
+    return f"data:{guess_mime(b)};base64,{base64.b64encode(b).decode('utf-8')}"
+
+
+class StaticImages:
+    """
+    Carpeta de imágenes dentro de assets_dir, con nombre = hash del contenido.
+    Tiene su propio tope en bytes: al pasarlo se borran las más viejas en un hilo aparte.
+    """
+    MAX_KEYS = 5000
+
+    def __init__(self, assets_dir: str = ASSETS_DIR, subdir: str = STATIC_SUBDIR,
+                 max_bytes: int = STATIC_BUDGET):
+        self.subdir = subdir
+        self.dir = os.path.join(assets_dir, subdir)
+        self.max_bytes = int(max_bytes)
+        os.makedirs(self.dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, str] = {}      # clave de la fuente -> src ya publicado
+        self._bytes = scan_dir(self.dir)[1]
+        self._trimming = False
+
+    def _file(self, src: str) -> str:
+        return os.path.join(self.dir, src.rsplit("/", 1)[-1])
+
+    def lookup(self, key: str) -> Optional[str]:
+        """src ya publicado para esa fuente (sin leer ni hashear la imagen)."""
+        with self._lock:
+            src = self._by_key.get(key)
+        if src and os.path.exists(self._file(src)):
+            return src
+        return None
+
+    def publish(self, data: bytes, key: Optional[str] = None) -> str:
+        name = hashlib.sha256(data).hexdigest()[:32] + _EXT.get(guess_mime(data), ".img")
+        path = os.path.join(self.dir, name)
+        if not os.path.exists(path):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            with self._lock:
+                self._bytes += len(data)
+        src = f"{self.subdir}/{name}"
+        with self._lock:
+            if key:
+                if len(self._by_key) >= self.MAX_KEYS:
+                    self._by_key.clear()
+                self._by_key[key] = src
+            trim = self._bytes > self.max_bytes and not self._trimming
+            if trim:
+                self._trimming = True
+        if trim:
+            threading.Thread(target=self._trim, name="image-static-trim", daemon=True).start()
+        return src
+
+    def _trim(self):
+        try:
+            # hasta el 80% del tope, para no recortar en cada imagen nueva
+            _removed, total = trim_dir(self.dir, int(self.max_bytes * 0.8))
+            with self._lock:
+                self._bytes = total
+        finally:
+            with self._lock:
+                self._trimming = False
+
+
+# ---------- Servicio ----------
+_COUNTERS = ("requests", "mem_hits", "disk_hits", "negative_hits", "deduped",
+             "downloads", "download_bytes", "failures", "thumbnails", "drive_thumbs")
+
+
+class ImageService:
+    def __init__(self, cache: Optional[ImageCache] = None, max_concurrency: int = MAX_CONCURRENCY,
+                 negative_ttl: float = NEGATIVE_TTL):
+        self.cache = cache or ImageCache(CACHE_DIR)
+        self.negative_ttl = negative_ttl
+        self._sem = threading.BoundedSemaphore(max(1, int(max_concurrency)))
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}       # clave -> Future compartido (single-flight)
+        self._work: set = set()                      # tareas de los líderes (referencia fuerte)
+        self._negative: Dict[str, float] = {}        # clave -> cuándo falló
+        self._sessions: Dict[str, Dict[str, int]] = {}
+        self._total: Dict[str, int] = dict.fromkeys(_COUNTERS, 0)
+        self.static: Optional[StaticImages] = None
+        if STATIC_URLS:
+            try:
+                self.static = StaticImages()
+            except OSError as ex:
+                print(f"[image_service] sin carpeta de assets ({ex}): se usan data: URLs", flush=True)
+
+    # ----- API -----
+    async def get(self, source: str, session: Optional[str] = None,
+                  variant: Optional[str] = None, page=None) -> Optional[bytes]:
+        """
+        Bytes de la imagen (cache o descarga) o None si no se pudo obtener.
+        variant ("list" / "detail", ver thumbnails.VARIANTS): la miniatura de ese tamaño.
+        page: sesión de Flet, para pedirle a Drive su miniatura con las credenciales del usuario.
+        """
+        url, key = resolve(source)
+        if not key:
+            return None
+        self._count(session, "requests")
+        if self._vkey(key, variant) != key:
+            return await self._variant(url, key, variant, session, page)
+        return await self._original(url, key, session)
+
+    def get_sync(self, source: str, session: Optional[str] = None) -> Optional[bytes]:
+        """Igual que get() para código sin event loop (corre en el hilo que llama)."""
+        url, key = resolve(source)
+        if not key:
+            return None
+        self._count(session, "requests")
+        data = self.cache.get(key, disk=False)
+        if data is not None:
+            self._count(session, "mem_hits")
+            return data
+        fut, leader = self._join(key, session)
+        if fut is None:
+            return None
+        if leader:
+            self._load(key, url, fut, session)
+        return fut.result()
+
+    def src_for(self, data: bytes, key: Optional[str] = None) -> str:
+        """Valor de ft.Image.src para esos bytes: URL de assets (o data: URL si no hay carpeta)."""
+        if self.static is not None:
+            try:
+                return self.static.publish(data, key)
+            except OSError as ex:
+                print(f"[image_service] no se pudo publicar key={key} ex={ex}", flush=True)
+        return data_url(data)
+
+    async def get_src(self, source: str, session: Optional[str] = None,
+                      variant: Optional[str] = None, page=None) -> Optional[str]:
+        """get() + src_for(): lo que hay que poner en ft.Image.src, o None."""
+        key = self._vkey(resolve(source)[1], variant)
+        if self.static is not None and key:
+            src = self.static.lookup(key)
+            if src is not None:
+                self._count(session, "requests")
+                self._count(session, "mem_hits")
+                return src
+        data = await self.get(source, session=session, variant=variant, page=page)
+        if data is None:
+            return None
+        return await asyncio.to_thread(self.src_for, data, key)
+
+    def invalidate(self, source: str) -> None:
+        """Olvida la imagen (por ejemplo, después de reemplazarla en Drive)."""
+        _url, key = resolve(source)
+        with self._lock:
+            self._negative.pop(key, None)
+        links = get_drive_thumb_links()
+        if links is not None and key.startswith("drive:"):
+            links.invalidate(key[len("drive:"):])
+        for k in [key] + [f"{key}#{v}" for v in thumbnails.VARIANTS]:
+            if self.static is not None:
+                with self.static._lock:
+                    self.static._by_key.pop(k, None)
+            self.cache.discard(k)
+
+    # ----- internos -----
+    @staticmethod
+    def _vkey(key: str, variant: Optional[str]) -> str:
+        # sin Pillow sólo hay miniaturas de Drive; para el resto se usa la original
+        if key and variant in thumbnails.VARIANTS and (thumbnails.available() or key.startswith("drive:")):
+            return f"{key}#{variant}"
+        return key
+
+    async def _original(self, url: str, key: str, session: Optional[str],
+                        keep_mem: bool = True) -> Optional[bytes]:
+        data = self.cache.get(key, disk=False)
+        if data is not None:
+            self._count(session, "mem_hits")
+            return data
+        fut, leader = self._join(key, session)
+        if fut is None:
+            return None
+        if leader:
+            # en un hilo aparte: cancelar al que espera no deja el Future sin resultado
+            asyncio.get_running_loop().run_in_executor(None, self._load, key, url, fut, session, keep_mem)
+        return await self._wait(fut)
+
+    async def _variant(self, url: str, key: str, variant: str, session: Optional[str],
+                       page=None) -> Optional[bytes]:
+        vkey = self._vkey(key, variant)
+        data = self.cache.get(vkey, disk=False)
+        if data is not None:
+            self._count(session, "mem_hits")
+            return data
+        fut, leader = self._join(vkey, session)
+        if fut is None:
+            return None
+        if leader:
+            # tarea propia: si se cancela la fila que la pidió, los demás igual reciben la imagen
+            task = asyncio.ensure_future(self._make_variant(url, key, vkey, variant, fut, session, page))
+            self._work.add(task)
+            task.add_done_callback(self._work.discard)
+        return await self._wait(fut)
+
+    @staticmethod
+    async def _wait(fut: Future) -> Optional[bytes]:
+        # shield: cancelar a uno de los que esperan no cancela el Future compartido
+        return await asyncio.shield(asyncio.wrap_future(fut))
+
+    @staticmethod
+    def _resolve(fut: Future, data: Optional[bytes]):
+        if not fut.done():
+            fut.set_result(data)
+
+    async def _make_variant(self, url: str, key: str, vkey: str, variant: str, fut: Future,
+                            session: Optional[str], page=None):
+        data = None
+        try:
+            data = await asyncio.to_thread(self.cache.get, vkey)
+            if data is not None:
+                self._count(session, "disk_hits")
+            elif page is not None and key.startswith("drive:"):
+                data = await self._drive_thumb(vkey, key[len("drive:"):], thumbnails.VARIANTS[variant],
+                                               page, session)
+            if data is None:
+                # la original sólo hace falta para achicarla: no ocupa la memoria
+                orig = await self._original(url, key, session, keep_mem=False)
+                if orig is not None:
+                    size = thumbnails.VARIANTS[variant]
+                    data = await asyncio.wrap_future(
+                        thumbnails.pool().submit(self._thumbnail, vkey, orig, size, session))
+                    if data is None:
+                        data = orig      # no se pudo decodificar: se muestra la original
+        except Exception as ex:
+            print(f"[image_service] ERROR variante key={vkey} ex={ex}", flush=True)
+            data = None
+        finally:
+            with self._lock:
+                self._inflight.pop(vkey, None)
+            self._resolve(fut, data)
+
+    async def _drive_thumb(self, vkey: str, fid: str, size: int, page,
+                           session: Optional[str]) -> Optional[bytes]:
+        links = get_drive_thumb_links()
+        if links is None:
+            return None
+        link = await asyncio.wrap_future(links.request(page, fid))
+        if not link:
+            return None
+        data = await asyncio.to_thread(self._download, sized(link, size), session)
+        if data is None:
+            links.invalidate(fid)        # link vencido: la próxima vez se vuelve a resolver
+            return None
+        await asyncio.to_thread(self.cache.set, vkey, data)
+        self._count(session, "drive_thumbs")
+        return data
+
+    def _thumbnail(self, vkey: str, data: bytes, size: int, session: Optional[str]) -> Optional[bytes]:
+        thumb = thumbnails.make_thumbnail(data, size)
+        if thumb is not None:
+            self.cache.set(vkey, thumb)
+            self._count(session, "thumbnails")
+        return thumb
+
+    def _join(self, key: str, session: Optional[str]):
+        """(future, soy_el_que_descarga). (None, False) si está en la negative cache."""
+        with self._lock:
+            failed = self._negative.get(key)
+            if failed is not None:
+                if time.time() - failed < self.negative_ttl:
+                    self._count_locked(session, "negative_hits")
+                    return None, False
+                self._negative.pop(key, None)
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self._count_locked(session, "deduped")
+                return fut, False
+            fut = self._inflight[key] = Future()
+            return fut, True
+
+    def _load(self, key: str, url: str, fut: Future, session: Optional[str], keep_mem: bool = True):
+        data: Optional[bytes] = None
+        try:
+            data = self.cache.get(key, promote=keep_mem)
+            if data is not None:
+                self._count(session, "disk_hits")
+                return
+            data = self._download(url, session)
+            if data is not None:
+                self.cache.set(key, data, mem=keep_mem)
+        except Exception as ex:
+            print(f"[image_service] ERROR key={key} ex={ex}", flush=True)
+            data = None
+        finally:
+            with self._lock:
+                if data is None:
+                    self._negative[key] = time.time()
+                self._inflight.pop(key, None)
+            self._resolve(fut, data)
+
+    def _download(self, url: str, session: Optional[str]) -> Optional[bytes]:
+        with self._sem:
+            try:
+                b, ct = fetch_bytes(url, timeout=FETCH_TIMEOUT)
+            except Exception as ex:
+                print(f"[image_service.fetch] ERROR url={url} ex={ex}", flush=True)
+                b, ct = None, ""
+        self._count(session, "downloads")
+        if b:
+            self._count(session, "download_bytes", len(b))
+        if b and (is_image_content_type(ct) or not looks_like_html(b)):
+            return b
+        self._count(session, "failures")
+        return None
+
+    def _count(self, session: Optional[str], name: str, n: int = 1):
+        with self._lock:
+            self._count_locked(session, name, n)
+
+    def _count_locked(self, session: Optional[str], name: str, n: int = 1):
+        self._total[name] += n
+        s = self._sessions.get(session or "-")
+        if s is None:
+            s = self._sessions[session or "-"] = dict.fromkeys(_COUNTERS, 0)
+        s[name] += n
+
+    # ----- métricas -----
+    @staticmethod
+    def _rates(c: Dict[str, int]) -> Dict:
+        out = dict(c)
+        hits = c["mem_hits"] + c["disk_hits"]
+        out["hit_rate"] = round(hits / c["requests"], 3) if c["requests"] else 0.0
+        return out
+
+    def session_stats(self, session: Optional[str]) -> Dict:
+        with self._lock:
+            c = dict(self._sessions.get(session or "-") or dict.fromkeys(_COUNTERS, 0))
+        return self._rates(c)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            c = dict(self._total)
+            c["sessions"] = len(self._sessions)
+        out = self._rates(c)
+        out["cache"] = self.cache.stats()
+        return out
+
+    def forget_session(self, session: Optional[str]) -> None:
+        with self._lock:
+            self._sessions.pop(session or "-", None)
+
+
+# ---------- instancia global ----------
+_service: Optional[ImageService] = None
+_service_lock = threading.Lock()
+
+
+def get_image_service() -> ImageService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ImageService()
+        return _service
+
+
+def page_of(control):
+    """Page de Flet del control (None si todavía no está montado)."""
+    try:
+        return control.page
+    except Exception:
+        return None
+
+
+def session_of(control) -> Optional[str]:
+    """ID de la sesión de Flet del control (None si todavía no está montado)."""
+    page = page_of(control)
+    return getattr(page, "session_id", None) if page is not None else None
@@ -0,0 +1,72 @@
+# ./back/image/thumbnails.py
+"""
+Miniaturas para las listas: una foto de celular de varios MB se reduce una sola vez al
+tamaño en que se muestra, y lo que se guarda en cache / se manda al navegador es eso.
+
+Pillow es opcional: sin Pillow available() es False y el servicio usa la imagen original.
+El trabajo (decodificar + achicar + codificar) corre en un pool de hilos propio, fuera del
+event loop de Flet; Pillow suelta el GIL mientras decodifica y escala.
+
+Configuración por entorno: IMAGE_THUMB_WORKERS.
+"""
+from __future__ import annotations
+import io, os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+try:
+    from PIL import Image, ImageOps
+except Exception:
+    Image = None
+    ImageOps = None
+
+# variante -> lado corto en px (las filas muestran 64px con fit=COVER; el detalle ~300x220)
+VARIANTS = {"list": 96, "detail": 512}
+JPEG_QUALITY = 82
+THUMB_WORKERS = int(os.getenv("IMAGE_THUMB_WORKERS", "2"))
+
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=max(1, THUMB_WORKERS), thread_name_prefix="thumb")
+    return _pool
+
+
+def make_thumbnail(data: bytes, size: int) -> Optional[bytes]:
+    """
+    Achica la imagen para que su lado corto sea `size` (sin recortar, para que fit=COVER
+    la llene bien). Devuelve JPEG (PNG si tiene transparencia), o None si no se pudo.
+    Si la imagen ya es chica se devuelven los mismos bytes.
+    """
+    if Image is None or not data:
+        return None
+    try:
+        img = Image.open(io.BytesIO(data))
+        w, h = img.size
+        scale = size / float(min(w, h) or 1)
+        if scale >= 1:
+            return data
+        target = (max(1, round(w * scale)), max(1, round(h * scale)))
+        # JPEG: decodifica directo a una escala menor (mucho más rápido que abrir a tamaño real)
+        img.draft("RGB", target)
+        img = ImageOps.exif_transpose(img)
+        w, h = img.size
+        scale = size / float(min(w, h) or 1)
+        target = (max(1, round(w * scale)), max(1, round(h * scale)))
+        img = img.resize(target, Image.LANCZOS, reducing_gap=2.0)
+        out = io.BytesIO()
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            img.save(out, format="PNG", optimize=True)
+        else:
+            img.convert("RGB").save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+    except Exception as ex:
+        print(f"[thumbnails] ERROR size={size} ex={ex}", flush=True)
+        return None
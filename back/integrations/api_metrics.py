@@ -0,0 +1,376 @@
+# back/integrations/api_metrics.py
+"""
+Instrumentación de los requests a Google Sheets / Drive.
+
+Cada request registra: operación lógica (p. ej. "StockBackend.move_add_row"),
+spreadsheet, método de la API, rango, status HTTP, intento (reintentos), latencia y
+bytes enviados / recibidos. Todo queda en memoria del proceso:
+  - Histogramas de latencia por (operación, spreadsheet): duración de la acción
+    completa y de cada request, con p50 / p95 / p99.
+  - Últimos requests (ring buffer) para ver qué rangos se leen / escriben.
+
+Dónde se engancha:
+  - TrackedHttpRequest: el ServicePool arma todos los HttpRequest con esta clase, así
+    que cualquier execute() de un cliente pooled queda medido.
+  - El scheduler marca spreadsheet e intento (contextvars) antes de cada intento.
+  - track_operation("X.y"): context manager / decorador que nombra la acción de UI.
+    Si se anidan, manda la más externa (es la que ve el usuario).
+
+Exportación: snapshot() (dict) / export_json().
+"""
+from __future__ import annotations
+
+import bisect
+import contextvars
+import functools
+import json
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+try:
+    from googleapiclient.http import HttpRequest
+    from googleapiclient.errors import HttpError
+except Exception:
+    HttpRequest = None
+    HttpError = None
+
+UNTRACKED = "(sin operación)"
+RECENT_MAX = 300
+
+# Límites superiores de los buckets (ms), escala ~logarítmica; el último es +inf
+BUCKETS_MS: Tuple[float, ...] = (
+    5, 10, 20, 35, 50, 75, 100, 150, 200, 300, 400, 500, 750, 1000,
+    1500, 2000, 3000, 5000, 7500, 10000, 20000, 30000, 60000, float("inf"),
+)
+
+_operation: contextvars.ContextVar[str] = contextvars.ContextVar("api_operation", default="")
+_sheet: contextvars.ContextVar[str] = contextvars.ContextVar("api_sheet", default="")
+_attempt: contextvars.ContextVar[int] = contextvars.ContextVar("api_attempt", default=0)
+# spreadsheet de la acción en curso (lo completa el primer request que lo conoce)
+_action_sheet: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("api_action_sheet", default=None)
+
+_RX_SHEET = re.compile(r"/spreadsheets/([^/:?]+)")
+_RX_FILE = re.compile(r"/files/([^/:?]+)")
+_RX_RANGE = re.compile(r"/values/([^:?]+)")
+
+
+class Histogram:
+    """Histograma de buckets fijos (memoria constante). Percentiles por interpolación."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = BUCKETS_MS[i - 1] if i else 0.0
+                hi = BUCKETS_MS[i] if BUCKETS_MS[i] != float("inf") else self.max
+                lo, hi = max(lo, self.min), min(hi, self.max)
+                return lo + (hi - lo) * ((rank - seen) / c)
+            seen += c
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 2) if self.count else 0.0,
+            "min_ms": round(self.min, 2) if self.count else 0.0,
+            "max_ms": round(self.max, 2),
+            "p50_ms": round(self.percentile(0.50), 2),
+            "p95_ms": round(self.percentile(0.95), 2),
+            "p99_ms": round(self.percentile(0.99), 2),
+            "buckets": {("inf" if b == float("inf") else str(b)): c
+                        for b, c in zip(BUCKETS_MS, self.counts) if c},
+        }
+
+
+class _OpStats:
+    __slots__ = ("actions", "action_errors", "requests", "request_errors", "retries",
+                 "bytes_sent", "bytes_received", "statuses", "methods")
+
+    def __init__(self):
+        self.actions = Histogram()      # duración de la acción completa
+        self.action_errors = 0
+        self.requests = Histogram()     # latencia de cada request
+        self.request_errors = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.statuses: Dict[str, int] = {}
+        self.methods: Dict[str, Histogram] = {}
+
+
+class ApiMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops: Dict[Tuple[str, str], _OpStats] = {}
+        self._recent: deque = deque(maxlen=RECENT_MAX)
+        self.enabled = True
+        self.started = time.time()
+
+    def _get(self, op: str, sheet: str) -> _OpStats:
+        st = self._ops.get((op, sheet))
+        if st is None:
+            st = self._ops[(op, sheet)] = _OpStats()
+        return st
+
+    # --------- registro ----------
+    def record_request(self, method: str, *, sheet_id: str = "", range_: str = "",
+                       status: int = 200, latency_s: float = 0.0,
+                       bytes_sent: int = 0, bytes_received: int = 0):
+        if not self.enabled:
+            return
+        op = _operation.get() or UNTRACKED
+        sheet = _sheet.get() or sheet_id or ""
+        attempt = _attempt.get()
+        holder = _action_sheet.get()
+        if holder is not None and not holder[0]:
+            holder[0] = sheet
+        ms = latency_s * 1000.0
+        with self._lock:
+            st = self._get(op, sheet)
+            st.requests.add(ms)
+            h = st.methods.get(method)
+            if h is None:
+                h = st.methods[method] = Histogram()
+            h.add(ms)
+            if status >= 400 or status == 0:
+                st.request_errors += 1
+            if attempt:
+                st.retries += 1
+            key = str(status or "network")
+            st.statuses[key] = st.statuses.get(key, 0) + 1
+            st.bytes_sent += int(bytes_sent or 0)
+            st.bytes_received += int(bytes_received or 0)
+            self._recent.append({
+                "ts": round(time.time(), 3), "op": op, "sheet": sheet, "method": method,
+                "range": range_, "status": status, "attempt": attempt,
+                "ms": round(ms, 2), "sent": int(bytes_sent or 0), "recv": int(bytes_received or 0),
+            })
+
+    def record_action(self, op: str, sheet: str, latency_s: float, ok: bool = True):
+        if not self.enabled:
+            return
+        with self._lock:
+            st = self._get(op, sheet)
+            st.actions.add(latency_s * 1000.0)
+            if not ok:
+                st.action_errors += 1
+
+    # --------- lectura ----------
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            ops = []
+            for (op, sheet), st in self._ops.items():
+                ops.append({
+                    "operation": op,
+                    "sheet_id": sheet,
+                    "action": st.actions.to_dict(),
+                    "action_errors": st.action_errors,
+                    "request": st.requests.to_dict(),
+                    "request_errors": st.request_errors,
+                    "retries": st.retries,
+                    "bytes_sent": st.bytes_sent,
+                    "bytes_received": st.bytes_received,
+                    "statuses": dict(st.statuses),
+                    "methods": {m: h.to_dict() for m, h in st.methods.items()},
+                })
+            recent = list(self._recent)
+        ops.sort(key=lambda d: (d["action"]["p95_ms"] or d["request"]["p95_ms"]), reverse=True)
+        return {"since": self.started, "generated": time.time(), "operations": ops, "recent": recent}
+
+    def export_json(self, path: Optional[str] = None, indent: int = 2) -> str:
+        data = json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(data)
+        return data
+
+    def reset(self, sheet_id: Optional[str] = None):
+        """Borra todo, o solo lo de un spreadsheet (sus operaciones y sus últimos requests)."""
+        with self._lock:
+            if sheet_id is None:
+                self._ops.clear()
+                self._recent.clear()
+                self.started = time.time()
+                return
+            for key in [k for k in self._ops if k[1] == sheet_id]:
+                del self._ops[key]
+            keep = [r for r in self._recent if r.get("sheet") != sheet_id]
+            self._recent.clear()
+            self._recent.extend(keep)
+
+
+METRICS = ApiMetrics()
+
+
+# ------------------------------------------------------------------
+#  Contexto: operación / spreadsheet / intento
+# ------------------------------------------------------------------
+class track_operation:
+    """
+    Nombra la acción lógica de los requests que se hagan adentro.
+
+        with track_operation("StockBackend.add_qty", sheet_id=sid): ...
+
+        @track_operation("StockBackend.add_qty")
+        def add_qty(self, ...): ...
+    """
+
+    def __init__(self, name: str, sheet_id: str = ""):
+        self.name = name
+        self.sheet_id = sheet_id
+        self._tokens: List = []
+
+    def __enter__(self):
+        outer = bool(_operation.get())
+        holder = None if outer else [self.sheet_id]
+        self._tokens.append((
+            None if outer else _operation.set(self.name),
+            None if outer else _action_sheet.set(holder),
+            _sheet.set(self.sheet_id) if self.sheet_id else None,
+            holder, time.perf_counter(),
+        ))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        tok_op, tok_holder, tok_sheet, holder, t0 = self._tokens.pop()
+        if tok_op is not None:
+            METRICS.record_action(self.name, holder[0] or "", time.perf_counter() - t0,
+                                  ok=exc_type is None)
+            _action_sheet.reset(tok_holder)
+            _operation.reset(tok_op)
+        if tok_sheet is not None:
+            _sheet.reset(tok_sheet)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track_operation(self.name, self.sheet_id):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def current_operation() -> str:
+    return _operation.get()
+
+
+class request_context:
+    """Lo usa el scheduler: spreadsheet e intento del request que está por salir."""
+
+    def __init__(self, sheet_id: str = "", attempt: int = 0):
+        self.sheet_id = sheet_id
+        self.attempt = attempt
+
+    def __enter__(self):
+        self._t_sheet = _sheet.set(self.sheet_id) if self.sheet_id else None
+        self._t_attempt = _attempt.set(self.attempt)
+        return self
+
+    def __exit__(self, *exc):
+        _attempt.reset(self._t_attempt)
+        if self._t_sheet is not None:
+            _sheet.reset(self._t_sheet)
+        return False
+
+
+# ------------------------------------------------------------------
+#  HttpRequest medido
+# ------------------------------------------------------------------
+def describe_uri(uri: str) -> Tuple[str, str]:
+    """(spreadsheet / archivo, rango) a partir de la URL de un request de Google API."""
+    path = urlparse(uri or "").path
+    m = _RX_SHEET.search(path) or _RX_FILE.search(path)
+    target = unquote(m.group(1)) if m else ""
+    r = _RX_RANGE.search(path)
+    if r:
+        return target, unquote(r.group(1))
+    ranges = parse_qs(urlparse(uri or "").query).get("ranges")
+    return target, ",".join(ranges) if ranges else ""
+
+
+def method_name(method_id: str) -> str:
+    """'sheets.spreadsheets.values.get' -> 'values.get', 'drive.files.list' -> 'files.list'."""
+    name = (method_id or "").split(".", 1)[-1]
+    return name[len("spreadsheets."):] if name.startswith("spreadsheets.values.") else name
+
+
+def body_ranges(body, limit: int = 65536) -> str:
+    """Rangos de un values.batchUpdate (van en el body, no en la URL). Sólo bodies chicos."""
+    if not body or _body_size(body) > limit:
+        return ""
+    try:
+        data = json.loads(body) if isinstance(body, (str, bytes)) else body
+        return ",".join(str(d.get("range", "")) for d in (data.get("data") or []))
+    except Exception:
+        return ""
+
+
+def _body_size(body) -> int:
+    if body is None:
+        return 0
+    try:
+        return len(body)
+    except Exception:
+        return 0
+
+
+if HttpRequest is not None:
+    class TrackedHttpRequest(HttpRequest):
+        """HttpRequest que registra cada execute() en METRICS."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._recv = 0
+            postproc = self.postproc
+
+            def _measured(resp, content):
+                self._recv = _body_size(content)
+                return postproc(resp, content)
+            self.postproc = _measured
+
+        def execute(self, http=None, num_retries=0):
+            t0 = time.perf_counter()
+            status = 200
+            self._recv = 0
+            try:
+                return super().execute(http=http, num_retries=num_retries)
+            except HttpError as ex:
+                status = int(getattr(ex.resp, "status", 0) or 0)
+                self._recv = _body_size(getattr(ex, "content", b""))
+                raise
+            except Exception:
+                status = 0
+                raise
+            finally:
+                target, rng = describe_uri(self.uri)
+                rng = rng or body_ranges(self.body)
+                METRICS.record_request(
+                    method_name(self.methodId) or self.method, sheet_id=target, range_=rng, status=status,
+                    latency_s=time.perf_counter() - t0,
+                    bytes_sent=_body_size(self.body), bytes_received=self._recv,
+                )
+else:
+    TrackedHttpRequest = None
@@ -0,0 +1,740 @@
+# back/integrations/google_emulator.py
+"""
+Emulador local (en memoria) de Google Sheets v4 y Drive v3.
+
+Implementa el subconjunto que usa la app, con la misma forma que los clientes de
+googleapiclient (recurso().método(...).execute()):
+  Sheets: spreadsheets().get / batchUpdate (addSheet, deleteSheet, deleteDimension,
+          updateCells) / create
+          spreadsheets().values().get / batchGet / update / batchUpdate / append / clear
+  Drive:  files().create / get / list / update / delete
+          permissions().list / create / update / delete
+          new_batch_http_request() (un solo request "batch" con los de adentro)
+
+Sirve para benchmarks y pruebas sin cuenta de Google: cuenta requests y bytes por
+método y permite simular latencia y errores (429/5xx).
+
+Uso:
+    emu = GoogleEmulator(latency=0.05)
+    sid = emu.create_spreadsheet("demo", {"stock": [["data_ini_prox", "RecID", ...]]})
+    emu.install()      # build_sheets_service / build_drive_service devuelven el emulador
+    ...
+    emu.uninstall()
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+from back.integrations.api_metrics import METRICS, body_ranges
+
+try:
+    import httplib2
+except Exception:
+    httplib2 = None
+
+SPREADSHEET_MIME = "application/vnd.google-apps.spreadsheet"
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+_RX_CELL = re.compile(r"^\$?([A-Za-z]*)\$?(\d*)$")
+
+
+class _Resp(dict):
+    def __init__(self, status: int, reason: str = ""):
+        super().__init__({"status": str(status)})
+        self.status = status
+        self.reason = reason
+
+
+def _http_error(status: int, message: str) -> HttpError:
+    reason = {400: "Bad Request", 404: "Not Found", 429: "Too Many Requests"}.get(status, "Error")
+    resp = httplib2.Response({"status": str(status), "reason": reason}) if httplib2 else _Resp(status, reason)
+    content = json.dumps({"error": {"code": status, "message": message}}).encode("utf-8")
+    return HttpError(resp, content)
+
+
+def _col_to_num(col: str) -> int:
+    n = 0
+    for ch in col.upper():
+        n = n * 26 + (ord(ch) - 64)
+    return n
+
+
+def _num_to_col(n: int) -> str:
+    s = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def _now_rfc3339() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _size(obj: Any) -> int:
+    try:
+        return len(json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8"))
+    except Exception:
+        return 0
+
+
+# ------------------------------------------------------------------
+#  Modelo
+# ------------------------------------------------------------------
+class _Sheet:
+    def __init__(self, sheet_id: int, title: str, index: int):
+        self.sheet_id = sheet_id
+        self.title = title
+        self.index = index
+        self.rows: List[List[str]] = []
+        # filas de la grilla (vacías incluidas): 1000 por defecto, como una pestaña nueva
+        self.grid_rows = 1000
+
+    def props(self) -> Dict:
+        width = max((len(r) for r in self.rows), default=0)
+        return {
+            "sheetId": self.sheet_id, "title": self.title, "index": self.index,
+            "sheetType": "GRID",
+            "gridProperties": {"rowCount": max(self.grid_rows, len(self.rows)), "columnCount": max(26, width)},
+        }
+
+
+class _Spreadsheet:
+    def __init__(self, spreadsheet_id: str, title: str):
+        self.id = spreadsheet_id
+        self.title = title
+        self.sheets: List[_Sheet] = []
+        self._ids = itertools.count(0)
+
+    def add_sheet(self, title: str) -> _Sheet:
+        if self.by_title(title):
+            raise _http_error(400, f'Invalid requests[0].addSheet: A sheet with the name "{title}" already exists.')
+        sh = _Sheet(next(self._ids), title, len(self.sheets))
+        self.sheets.append(sh)
+        return sh
+
+    def by_title(self, title: str) -> Optional[_Sheet]:
+        return next((s for s in self.sheets if s.title == title), None)
+
+    def by_id(self, sheet_id: int) -> Optional[_Sheet]:
+        return next((s for s in self.sheets if s.sheet_id == sheet_id), None)
+
+
+class _Range:
+    """'tab!A2:E' ya resuelto. Filas/columnas 1-based; None = abierto."""
+
+    def __init__(self, sheet: _Sheet, c1: int, r1: int, c2: Optional[int], r2: Optional[int]):
+        self.sheet, self.c1, self.r1, self.c2, self.r2 = sheet, c1, r1, c2, r2
+
+    def a1(self, r2: Optional[int] = None, c2: Optional[int] = None) -> str:
+        r2 = r2 or self.r2 or self.r1
+        c2 = c2 or self.c2 or self.c1
+        title = self.sheet.title
+        q = f"'{title}'" if re.search(r"[^A-Za-z0-9_]", title) else title
+        return f"{q}!{_num_to_col(self.c1)}{self.r1}:{_num_to_col(c2)}{r2}"
+
+
+# ------------------------------------------------------------------
+#  Requests
+# ------------------------------------------------------------------
+class EmulatedRequest:
+    """Equivalente de googleapiclient.http.HttpRequest: se ejecuta con execute()."""
+
+    def __init__(self, emu: "GoogleEmulator", method: str, fn: Callable[[], Any], payload: Any = None):
+        self.emu = emu
+        self.method = method
+        self.fn = fn
+        self.payload = payload
+        self.sent = 0
+        self.received = 0
+
+    def execute(self, http=None, num_retries: int = 0):
+        return self.emu._run(self)
+
+
+class _Values:
+    def __init__(self, emu: "GoogleEmulator"):
+        self.emu = emu
+
+    def get(self, spreadsheetId: str, range: str, majorDimension: str = "ROWS", **kw):
+        return self.emu._req("values.get", lambda: self.emu._values_get(spreadsheetId, range), {"range": range})
+
+    def batchGet(self, spreadsheetId: str, ranges: List[str], majorDimension: str = "ROWS", **kw):
+        ranges = [ranges] if isinstance(ranges, str) else list(ranges)
+
+        def fn():
+            return {"spreadsheetId": spreadsheetId,
+                    "valueRanges": [self.emu._values_get(spreadsheetId, r) for r in ranges]}
+        return self.emu._req("values.batchGet", fn, {"ranges": ranges})
+
+    def update(self, spreadsheetId: str, range: str, valueInputOption: str = "RAW", body: Dict = None, **kw):
+        body = body or {}
+
+        def fn():
+            rng = self.emu._write(spreadsheetId, range, body.get("values") or [])
+            return {"spreadsheetId": spreadsheetId, "updatedRange": rng,
+                    "updatedRows": len(body.get("values") or [])}
+        return self.emu._req("values.update", fn, dict(body, range=range))
+
+    def batchUpdate(self, spreadsheetId: str, body: Dict = None, **kw):
+        body = body or {}
+
+        def fn():
+            out = [{"updatedRange": self.emu._write(spreadsheetId, d["range"], d.get("values") or [])}
+                   for d in body.get("data") or []]
+            return {"spreadsheetId": spreadsheetId, "totalUpdatedRows": sum(len(d.get("values") or []) for d in body.get("data") or []),
+                    "responses": out}
+        return self.emu._req("values.batchUpdate", fn, body)
+
+    def append(self, spreadsheetId: str, range: str, valueInputOption: str = "RAW",
+               insertDataOption: str = "OVERWRITE", body: Dict = None, **kw):
+        body = body or {}
+        return self.emu._req("values.append",
+                             lambda: self.emu._append(spreadsheetId, range, body.get("values") or [],
+                                                      insert=insertDataOption == "INSERT_ROWS"),
+                             dict(body, range=range))
+
+    def clear(self, spreadsheetId: str, range: str, body: Dict = None, **kw):
+        return self.emu._req("values.clear", lambda: self.emu._clear(spreadsheetId, range), {"range": range})
+
+
+class _Spreadsheets:
+    def __init__(self, emu: "GoogleEmulator"):
+        self.emu = emu
+
+    def values(self) -> _Values:
+        return _Values(self.emu)
+
+    def get(self, spreadsheetId: str, fields: Optional[str] = None, ranges=None, includeGridData: bool = False, **kw):
+        return self.emu._req("spreadsheets.get", lambda: self.emu._meta(spreadsheetId), {"fields": fields})
+
+    def batchUpdate(self, spreadsheetId: str, body: Dict = None, **kw):
+        body = body or {}
+        return self.emu._req("spreadsheets.batchUpdate",
+                             lambda: self.emu._batch_update(spreadsheetId, body.get("requests") or []), body)
+
+    def create(self, body: Dict = None, fields: Optional[str] = None, **kw):
+        body = body or {}
+
+        def fn():
+            title = ((body.get("properties") or {}).get("title")) or "Untitled spreadsheet"
+            tabs = [((s.get("properties") or {}).get("title")) for s in body.get("sheets") or []]
+            sid = self.emu.create_spreadsheet(title, {t: [] for t in tabs if t} or None)
+            return self.emu._meta(sid)
+        return self.emu._req("spreadsheets.create", fn, body)
+
+
+class _Files:
+    def __init__(self, emu: "GoogleEmulator"):
+        self.emu = emu
+
+    def create(self, body: Dict = None, fields: Optional[str] = None, media_body=None, **kw):
+        body = body or {}
+        return self.emu._req("files.create", lambda: self.emu._file_create(body, media_body), body)
+
+    def get(self, fileId: str, fields: Optional[str] = None, **kw):
+        return self.emu._req("files.get", lambda: self.emu._file_get(fileId, fields), {"fileId": fileId})
+
+    def list(self, q: str = "", fields: Optional[str] = None, pageSize: int = 100,
+             pageToken: Optional[str] = None, **kw):
+        return self.emu._req("files.list", lambda: self.emu._file_list(q, pageSize, pageToken), {"q": q})
+
+    def update(self, fileId: str, body: Dict = None, fields: Optional[str] = None, **kw):
+        body = body or {}
+        return self.emu._req("files.update", lambda: self.emu._file_update(fileId, body), body)
+
+    def delete(self, fileId: str, **kw):
+        return self.emu._req("files.delete", lambda: self.emu._file_delete(fileId), {"fileId": fileId})
+
+
+class _Permissions:
+    def __init__(self, emu: "GoogleEmulator"):
+        self.emu = emu
+
+    def list(self, fileId: str, fields: Optional[str] = None, **kw):
+        return self.emu._req("permissions.list",
+                             lambda: {"permissions": [dict(p) for p in self.emu._file(fileId)["permissions"]]},
+                             {"fileId": fileId})
+
+    def create(self, fileId: str, body: Dict = None, fields: Optional[str] = None, **kw):
+        body = body or {}
+
+        def fn():
+            p = dict(body)
+            p["id"] = uuid.uuid4().hex[:12]
+            self.emu._file(fileId)["permissions"].append(p)
+            return {"id": p["id"]}
+        return self.emu._req("permissions.create", fn, body)
+
+    def update(self, fileId: str, permissionId: str, body: Dict = None, fields: Optional[str] = None, **kw):
+        body = body or {}
+
+        def fn():
+            for p in self.emu._file(fileId)["permissions"]:
+                if p["id"] == permissionId:
+                    p.update(body)
+                    return {"id": permissionId}
+            raise _http_error(404, f"Permission not found: {permissionId}.")
+        return self.emu._req("permissions.update", fn, body)
+
+    def delete(self, fileId: str, permissionId: str, **kw):
+        def fn():
+            f = self.emu._file(fileId)
+            f["permissions"] = [p for p in f["permissions"] if p["id"] != permissionId]
+            return {}
+        return self.emu._req("permissions.delete", fn, {"fileId": fileId})
+
+
+class _Batch:
+    """Equivalente de googleapiclient.http.BatchHttpRequest: un round-trip para varios requests."""
+
+    def __init__(self, emu: "GoogleEmulator", callback: Optional[Callable] = None):
+        self.emu = emu
+        self.callback = callback
+        self._reqs: List[Tuple[str, EmulatedRequest, Optional[Callable]]] = []
+
+    def add(self, request: EmulatedRequest, callback: Optional[Callable] = None, request_id: Optional[str] = None):
+        self._reqs.append((request_id or str(len(self._reqs) + 1), request, callback))
+
+    def execute(self, http=None):
+        def fn():
+            out = []
+            for rid, r, cb in self._reqs:
+                try:
+                    out.append((rid, r.fn(), None, cb))
+                except HttpError as ex:
+                    out.append((rid, None, ex, cb))
+            return out
+
+        payload = {"requests": [r.method for _, r, _ in self._reqs]}
+        results = self.emu._run(self.emu._req("batch", fn, payload))
+        for rid, resp, exc, cb in results:
+            cb = cb or self.callback
+            if cb is not None:
+                cb(rid, resp, exc)
+
+
+class SheetsService:
+    def __init__(self, emu: "GoogleEmulator"):
+        self.emu = emu
+
+    def spreadsheets(self) -> _Spreadsheets:
+        return _Spreadsheets(self.emu)
+
+
+class DriveService:
+    def __init__(self, emu: "GoogleEmulator"):
+        self.emu = emu
+
+    def files(self) -> _Files:
+        return _Files(self.emu)
+
+    def permissions(self) -> _Permissions:
+        return _Permissions(self.emu)
+
+    def new_batch_http_request(self, callback: Optional[Callable] = None) -> _Batch:
+        return _Batch(self.emu, callback)
+
+
+# ------------------------------------------------------------------
+#  Emulador
+# ------------------------------------------------------------------
+class GoogleEmulator:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, user_email: str = "emulador@local"):
+        self.latency = float(latency)
+        self.jitter = float(jitter)
+        self.user_email = user_email
+        self._lock = threading.RLock()
+        self._books: Dict[str, _Spreadsheet] = {}
+        self._files: Dict[str, Dict] = {}
+        self._faults: List[Tuple[Optional[str], int]] = []
+        self.sheets = SheetsService(self)
+        self.drive = DriveService(self)
+        self.reset_stats()
+
+    # --------- métricas ----------
+    def reset_stats(self):
+        with self._lock:
+            self.calls: List[Tuple[str, str]] = []
+            self.stats: Dict[str, Dict[str, int]] = {}
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requests": sum(s["requests"] for s in self.stats.values()),
+                "bytes_sent": sum(s["bytes_sent"] for s in self.stats.values()),
+                "bytes_received": sum(s["bytes_received"] for s in self.stats.values()),
+            }
+
+    def fail_next(self, status: int = 429, times: int = 1, method: Optional[str] = None):
+        """Los próximos `times` requests (de `method`, o cualquiera) fallan con `status`."""
+        with self._lock:
+            self._faults.extend([(method, int(status))] * int(times))
+
+    # --------- inyección ----------
+    def install(self):
+        """build_sheets_service / build_drive_service pasan a devolver este emulador."""
+        from back.drive.service_pool import SERVICE_POOL
+        SERVICE_POOL.overrides[("sheets", "v4")] = self.sheets
+        SERVICE_POOL.overrides[("drive", "v3")] = self.drive
+        return self
+
+    def uninstall(self):
+        from back.drive.service_pool import SERVICE_POOL
+        for key in (("sheets", "v4"), ("drive", "v3")):
+            SERVICE_POOL.overrides.pop(key, None)
+
+    # --------- ejecución ----------
+    def _req(self, method: str, fn: Callable[[], Any], payload: Any = None) -> EmulatedRequest:
+        return EmulatedRequest(self, method, fn, payload)
+
+    def _run(self, req: EmulatedRequest):
+        # Mismo registro que TrackedHttpRequest, para ver las métricas en bench / pruebas
+        t0 = time.perf_counter()
+        status = 200
+        try:
+            return self._run_locked(req)
+        except HttpError as ex:
+            status = int(getattr(ex.resp, "status", 0) or 0)
+            raise
+        except Exception:
+            status = 0
+            raise
+        finally:
+            p = req.payload if isinstance(req.payload, dict) else {}
+            rng = p.get("range") or p.get("ranges") or body_ranges(p)
+            METRICS.record_request(
+                req.method, sheet_id=str(p.get("fileId") or ""),
+                range_=",".join(rng) if isinstance(rng, list) else str(rng), status=status,
+                latency_s=time.perf_counter() - t0,
+                bytes_sent=req.sent, bytes_received=req.received,
+            )
+
+    def _run_locked(self, req: EmulatedRequest):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            st = self.stats.setdefault(req.method, {"requests": 0, "bytes_sent": 0, "bytes_received": 0})
+            st["requests"] += 1
+            req.sent = _size(req.payload)
+            st["bytes_sent"] += req.sent
+            detail = ""
+            if isinstance(req.payload, dict):
+                detail = str(req.payload.get("range") or req.payload.get("ranges") or req.payload.get("fileId") or "")
+            self.calls.append((req.method, detail))
+            for i, (m, status) in enumerate(self._faults):
+                if m is None or m == req.method:
+                    self._faults.pop(i)
+                    raise _http_error(status, "Emulated error")
+            resp = req.fn()
+            req.received = _size(resp)
+            st["bytes_received"] += req.received
+            return resp
+
+    # --------- Sheets: datos ----------
+    def create_spreadsheet(self, title: str, tabs: Optional[Dict[str, List[List[Any]]]] = None,
+                           parent_id: Optional[str] = None, spreadsheet_id: Optional[str] = None) -> str:
+        """Crea un spreadsheet (y su archivo en Drive). tabs: {título: filas}; sin tabs queda 'Sheet1'."""
+        with self._lock:
+            sid = spreadsheet_id or uuid.uuid4().hex
+            book = _Spreadsheet(sid, title)
+            for t, rows in (tabs or {"Sheet1": []}).items():
+                sh = book.add_sheet(t)
+                sh.rows = [[("" if v is None else str(v)) for v in r] for r in (rows or [])]
+            self._books[sid] = book
+            self._files[sid] = self._new_file(sid, title, SPREADSHEET_MIME, [parent_id] if parent_id else [])
+            return sid
+
+    def rows(self, spreadsheet_id: str, tab: str) -> List[List[str]]:
+        """Acceso directo (sin contar requests) a las filas de una pestaña."""
+        sh = self._book(spreadsheet_id).by_title(tab)
+        return sh.rows if sh else []
+
+    def edit_as(self, spreadsheet_id: str, a1: str, values: List[List[Any]],
+                user_email: str = "otra.persona@example.com"):
+        """Escritura directa (sin contar requests) hecha por otra cuenta: cambia version y
+        lastModifyingUser como lo vería Drive."""
+        with self._lock:
+            self._write(spreadsheet_id, a1, values)
+            self._touch(spreadsheet_id)
+            self._files[spreadsheet_id]["lastModifyingUser"] = {"emailAddress": user_email, "me": False}
+
+    def _book(self, spreadsheet_id: str) -> _Spreadsheet:
+        book = self._books.get(spreadsheet_id)
+        if book is None:
+            raise _http_error(404, f"Requested entity was not found: {spreadsheet_id}")
+        return book
+
+    def _touch(self, spreadsheet_id: str):
+        f = self._files.get(spreadsheet_id)
+        if f is not None:
+            f["version"] = str(int(f["version"]) + 1)
+            f["modifiedTime"] = _now_rfc3339()
+            f["lastModifyingUser"] = {"emailAddress": self.user_email, "me": True}
+
+    def _parse(self, spreadsheet_id: str, a1: str) -> _Range:
+        book = self._book(spreadsheet_id)
+        title, sep, cells = (a1 or "").rpartition("!")
+        if not sep:
+            # sin '!': puede ser sólo el nombre de la pestaña o sólo celdas (primera pestaña)
+            if book.by_title(a1.strip("'")):
+                title, cells = a1, ""
+            else:
+                title, cells = "", a1
+        title = title.strip()
+        if title.startswith("'") and title.endswith("'"):
+            title = title[1:-1].replace("''", "'")
+        sheet = book.by_title(title) if title else (book.sheets[0] if book.sheets else None)
+        if sheet is None:
+            raise _http_error(400, f"Unable to parse range: {a1}")
+        if not cells:
+            return _Range(sheet, 1, 1, None, None)
+        parts = cells.split(":")
+        if len(parts) > 2:
+            raise _http_error(400, f"Unable to parse range: {a1}")
+        m1 = _RX_CELL.match(parts[0].strip())
+        m2 = _RX_CELL.match(parts[1].strip()) if len(parts) > 1 else m1
+        if not m1 or not m2 or not (m1.group(1) or m1.group(2)):
+            raise _http_error(400, f"Unable to parse range: {a1}")
+        c1 = _col_to_num(m1.group(1)) if m1.group(1) else 1
+        r1 = int(m1.group(2)) if m1.group(2) else 1
+        c2 = _col_to_num(m2.group(1)) if m2.group(1) else None
+        r2 = int(m2.group(2)) if m2.group(2) else None
+        return _Range(sheet, c1, r1, c2, r2)
+
+    def _values_get(self, spreadsheet_id: str, a1: str) -> Dict:
+        rng = self._parse(spreadsheet_id, a1)
+        rows = rng.sheet.rows
+        last = min(rng.r2 or len(rows), len(rows))
+        out: List[List[str]] = []
+        for r in range(rng.r1, last + 1):
+            row = rows[r - 1]
+            vals = row[rng.c1 - 1:(rng.c2 or len(row))]
+            while vals and vals[-1] == "":
+                vals = vals[:-1]
+            out.append(list(vals))
+        while out and not out[-1]:
+            out.pop()
+        res = {"range": rng.a1(r2=rng.r2 or max(rng.r1, len(rows)), c2=rng.c2 or 26), "majorDimension": "ROWS"}
+        if out:
+            res["values"] = out
+        return res
+
+    def _write(self, spreadsheet_id: str, a1: str, values: List[List[Any]]) -> str:
+        rng = self._parse(spreadsheet_id, a1)
+        rows = rng.sheet.rows
+        width = 0
+        for i, vr in enumerate(values):
+            r = rng.r1 + i
+            while len(rows) < r:
+                rows.append([])
+            row = rows[r - 1]
+            need = rng.c1 - 1 + len(vr)
+            if len(row) < need:
+                row.extend([""] * (need - len(row)))
+            for j, v in enumerate(vr):
+                row[rng.c1 - 1 + j] = "" if v is None else str(v)
+            width = max(width, len(vr))
+        self._touch(spreadsheet_id)
+        return rng.a1(r2=rng.r1 + max(len(values), 1) - 1, c2=rng.c1 + max(width, 1) - 1)
+
+    def _append(self, spreadsheet_id: str, a1: str, values: List[List[Any]], insert: bool = True) -> Dict:
+        rng = self._parse(spreadsheet_id, a1)
+        rows = rng.sheet.rows
+        last = len(rows)
+        while last > 0 and not any(rows[last - 1]):
+            last -= 1
+        start = max(last + 1, rng.r1)
+        # INSERT_ROWS: las filas vacías que quedan debajo se corren, no se pisan
+        if start <= len(rows):
+            rows[start - 1:start - 1] = [[] for _ in values]
+        if insert:
+            rng.sheet.grid_rows += len(values)
+        target = _Range(rng.sheet, rng.c1, start, None, None)
+        updated = self._write(spreadsheet_id, target.a1(), values)
+        return {"spreadsheetId": spreadsheet_id, "tableRange": rng.a1(),
+                "updates": {"spreadsheetId": spreadsheet_id, "updatedRange": updated,
+                            "updatedRows": len(values)}}
+
+    def _clear(self, spreadsheet_id: str, a1: str) -> Dict:
+        rng = self._parse(spreadsheet_id, a1)
+        rows = rng.sheet.rows
+        last = min(rng.r2 or len(rows), len(rows))
+        for r in range(rng.r1, last + 1):
+            row = rows[r - 1]
+            for c in range(rng.c1, min(rng.c2 or len(row), len(row)) + 1):
+                row[c - 1] = ""
+        self._touch(spreadsheet_id)
+        return {"spreadsheetId": spreadsheet_id, "clearedRange": rng.a1()}
+
+    def _meta(self, spreadsheet_id: str) -> Dict:
+        book = self._book(spreadsheet_id)
+        return {
+            "spreadsheetId": book.id,
+            "properties": {"title": book.title},
+            "sheets": [{"properties": s.props()} for s in book.sheets],
+        }
+
+    def _batch_update(self, spreadsheet_id: str, requests: List[Dict]) -> Dict:
+        book = self._book(spreadsheet_id)
+        replies: List[Dict] = []
+        for rq in requests:
+            if "addSheet" in rq:
+                props = rq["addSheet"].get("properties") or {}
+                title = props.get("title") or f"Sheet{len(book.sheets) + 1}"
+                sh = book.add_sheet(title)
+                sh.grid_rows = int((props.get("gridProperties") or {}).get("rowCount") or sh.grid_rows)
+                replies.append({"addSheet": {"properties": sh.props()}})
+            elif "deleteSheet" in rq:
+                sh = book.by_id(rq["deleteSheet"].get("sheetId"))
+                if sh is None:
+                    raise _http_error(400, "Invalid requests.deleteSheet: No grid with id")
+                book.sheets.remove(sh)
+                for i, s in enumerate(book.sheets):
+                    s.index = i
+                replies.append({})
+            elif "deleteDimension" in rq:
+                r = rq["deleteDimension"]["range"]
+                sh = book.by_id(r.get("sheetId"))
+                if sh is None:
+                    raise _http_error(400, "Invalid requests.deleteDimension: No grid with id")
+                if r.get("dimension", "ROWS") == "ROWS":
+                    a = int(r.get("startIndex", 0))
+                    b = int(r.get("endIndex", max(sh.grid_rows, len(sh.rows))))
+                    del sh.rows[a:b]
+                    sh.grid_rows = max(1, sh.grid_rows - (b - a))
+                else:
+                    a, b = int(r.get("startIndex", 0)), r.get("endIndex")
+                    for row in sh.rows:
+                        del row[a:(int(b) if b is not None else len(row))]
+                replies.append({})
+            elif "updateCells" in rq:
+                uc = rq["updateCells"]
+                start = uc.get("start") or {}
+                sh = book.by_id(start.get("sheetId"))
+                if sh is None:
+                    raise _http_error(400, "Invalid requests.updateCells: No grid with id")
+                values = []
+                for row in uc.get("rows") or []:
+                    vr = []
+                    for cell in row.get("values") or []:
+                        ev = cell.get("userEnteredValue") or {}
+                        v = next(iter(ev.values()), "") if ev else ""
+                        vr.append("" if v is None else str(v))
+                    values.append(vr)
+                target = _Range(sh, int(start.get("columnIndex", 0)) + 1, int(start.get("rowIndex", 0)) + 1, None, None)
+                self._write(spreadsheet_id, target.a1(), values)
+                replies.append({})
+            else:
+                raise _http_error(400, f"Emulator: request no soportado: {list(rq)}")
+        self._touch(spreadsheet_id)
+        return {"spreadsheetId": spreadsheet_id, "replies": replies}
+
+    # --------- Drive ----------
+    def _new_file(self, file_id: str, name: str, mime: str, parents: List[str]) -> Dict:
+        return {
+            "id": file_id, "name": name, "mimeType": mime, "parents": list(parents),
+            "trashed": False, "version": "1", "modifiedTime": _now_rfc3339(),
+            "lastModifyingUser": {"emailAddress": self.user_email, "me": True},
+            "permissions": [{"id": "owner", "type": "user", "role": "owner", "emailAddress": self.user_email}],
+            "size": "0",
+            **({"thumbnailLink": f"https://lh3.googleusercontent.com/d/{file_id}=s220"}
+               if mime.startswith("image/") else {}),
+        }
+
+    def _file(self, file_id: str) -> Dict:
+        f = self._files.get(file_id)
+        if f is None:
+            raise _http_error(404, f"File not found: {file_id}.")
+        return f
+
+    def _public(self, f: Dict) -> Dict:
+        return {k: (list(v) if isinstance(v, list) else v) for k, v in f.items() if k != "permissions"}
+
+    def _file_create(self, body: Dict, media_body=None) -> Dict:
+        mime = body.get("mimeType") or "application/octet-stream"
+        parents = body.get("parents") or []
+        name = body.get("name") or "Untitled"
+        if mime == SPREADSHEET_MIME:
+            fid = self.create_spreadsheet(name, parent_id=parents[0] if parents else None)
+            return self._public(self._files[fid])
+        fid = uuid.uuid4().hex
+        f = self._new_file(fid, name, mime, parents)
+        size = getattr(media_body, "size", None)
+        if callable(size):
+            try:
+                f["size"] = str(size())
+            except Exception:
+                pass
+        self._files[fid] = f
+        return self._public(f)
+
+    def _file_get(self, file_id: str, fields: Optional[str] = None) -> Dict:
+        f = self._file(file_id)
+        out = self._public(f)
+        if fields and "permissions" in fields:
+            out["permissions"] = [dict(p) for p in f["permissions"]]
+        return out
+
+    def _file_update(self, file_id: str, body: Dict) -> Dict:
+        f = self._file(file_id)
+        for k in ("name", "trashed", "mimeType", "description"):
+            if k in body:
+                f[k] = body[k]
+        if f["mimeType"] == SPREADSHEET_MIME and "name" in body and file_id in self._books:
+            self._books[file_id].title = body["name"]
+        f["version"] = str(int(f["version"]) + 1)
+        f["modifiedTime"] = _now_rfc3339()
+        return self._public(f)
+
+    def _file_delete(self, file_id: str) -> Dict:
+        self._file(file_id)
+        self._files.pop(file_id, None)
+        self._books.pop(file_id, None)
+        return {}
+
+    _RX_Q = re.compile(
+        r"\s*(?:(name|mimeType)\s*(=|!=)\s*'((?:[^'\\]|\\.)*)'"
+        r"|trashed\s*=\s*(true|false)"
+        r"|'((?:[^'\\]|\\.)*)'\s+in\s+parents)\s*",
+        re.I,
+    )
+
+    def _match_q(self, f: Dict, q: str) -> bool:
+        for clause in [c for c in re.split(r"\s+and\s+", q or "", flags=re.I) if c.strip()]:
+            m = self._RX_Q.fullmatch(clause)
+            if not m:
+                raise _http_error(400, f"Emulator: consulta no soportada: {clause}")
+            field, op, value, trashed, parent = m.groups()
+            if field:
+                value = value.replace("\\'", "'")
+                ok = (f.get(field) == value)
+                if (op == "=") != ok:
+                    return False
+            elif trashed:
+                if bool(f.get("trashed")) != (trashed.lower() == "true"):
+                    return False
+            elif parent is not None:
+                if parent.replace("\\'", "'") not in (f.get("parents") or []):
+                    return False
+        return True
+
+    def _file_list(self, q: str, page_size: int, page_token: Optional[str]) -> Dict:
+        matches = [self._public(f) for f in self._files.values() if self._match_q(f, q)]
+        start = int(page_token or 0)
+        page = matches[start:start + int(page_size or 100)]
+        out: Dict[str, Any] = {"files": page}
+        if start + len(page) < len(matches):
+            out["nextPageToken"] = str(start + len(page))
+        return out
@@ -0,0 +1,149 @@
+# back/integrations/http_pool.py
+"""
+Transporte HTTP compartido por todo el proceso, con pool de conexiones (urllib3).
+
+- Un solo PoolManager: las conexiones (y el handshake TLS) se reutilizan entre
+  requests y entre sesiones (keep-alive).
+- Tamaño configurable: cantidad de hosts en el pool y conexiones vivas por host
+  (con block=True el máximo por host es un límite real: el resto espera).
+- PooledHttp: adaptador con la interfaz de httplib2.Http para los clientes de
+  Google API (Sheets/Drive). Es thread-safe.
+- fetch_bytes(): GET simple para las imágenes (Drive / URLs directas).
+
+Configuración por entorno: HTTP_POOL_HOSTS, HTTP_POOL_PER_HOST, HTTP_TIMEOUT.
+"""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import urllib.request
+from typing import Dict, Optional, Tuple
+
+try:
+    import urllib3
+except Exception:
+    urllib3 = None
+
+try:
+    import httplib2
+except Exception:
+    httplib2 = None
+
+POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "16"))         # hosts distintos en el pool
+POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "10"))   # conexiones vivas por host
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "*/*", "Connection": "keep-alive"}
+
+_lock = threading.Lock()
+_pool = None
+
+
+def configure(pool_hosts: Optional[int] = None, per_host: Optional[int] = None,
+              timeout: Optional[float] = None):
+    """Cambia el tamaño del pool / timeout. El pool se vuelve a crear en el próximo uso."""
+    global POOL_HOSTS, POOL_PER_HOST, HTTP_TIMEOUT, _pool
+    with _lock:
+        if pool_hosts:
+            POOL_HOSTS = int(pool_hosts)
+        if per_host:
+            POOL_PER_HOST = int(per_host)
+        if timeout:
+            HTTP_TIMEOUT = float(timeout)
+        old, _pool = _pool, None
+    if old is not None:
+        old.clear()
+
+
+def get_pool():
+    """PoolManager compartido (None si urllib3 no está instalado)."""
+    global _pool
+    if urllib3 is None:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = urllib3.PoolManager(
+                num_pools=POOL_HOSTS,
+                maxsize=POOL_PER_HOST,
+                block=True,
+                headers={"Connection": "keep-alive"},
+            )
+        return _pool
+
+
+def available() -> bool:
+    return urllib3 is not None
+
+
+def _retries(redirections: int):
+    # Sin reintentos propios: googleapiclient ya reintenta (num_retries) y las imágenes
+    # tienen su propio manejo. Sólo se siguen redirecciones (Drive uc?export=download).
+    return urllib3.Retry(total=None, connect=1, read=0, status=0, other=0,
+                         redirect=max(0, int(redirections)), raise_on_redirect=False)
+
+
+def _request(method: str, url: str, body=None, headers: Optional[Dict[str, str]] = None,
+             timeout: Optional[float] = None, redirections: int = 5):
+    """Request por el pool. Errores de red se traducen a los tipos que espera el resto."""
+    pool = get_pool()
+    try:
+        return pool.request(
+            method, url, body=body, headers=headers or {},
+            retries=_retries(redirections),
+            timeout=urllib3.Timeout(total=timeout or HTTP_TIMEOUT),
+            preload_content=True,
+        )
+    except urllib3.exceptions.TimeoutError as ex:
+        raise socket.timeout(str(ex)) from ex
+    except urllib3.exceptions.HTTPError as ex:
+        raise ConnectionError(str(ex)) from ex
+
+
+class _Response(dict):
+    """Mínimo equivalente de httplib2.Response (si httplib2 no está)."""
+    def __init__(self, info: Dict[str, str]):
+        super().__init__({k.lower(): v for k, v in info.items()})
+        self.status = int(self.get("status", 200))
+        self.reason = self.get("reason", "")
+
+
+class PooledHttp:
+    """Adaptador httplib2.Http -> pool urllib3 compartido (thread-safe)."""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.follow_redirects = True
+        self.redirect_codes = {300, 301, 302, 303, 307, 308}
+
+    def request(self, uri, method="GET", body=None, headers=None,
+                redirections=5, connection_type=None, **kwargs):
+        redir = redirections if self.follow_redirects else 0
+        r = _request(method, uri, body=body, headers=headers, timeout=self.timeout, redirections=redir)
+        info = dict(r.headers.items())
+        info["status"] = str(r.status)
+        info["reason"] = r.reason or ""
+        resp = httplib2.Response(info) if httplib2 else _Response(info)
+        return resp, r.data
+
+    def close(self):
+        # Las conexiones son del pool compartido: no se cierran por cliente
+        pass
+
+
+def fetch_bytes(url: str, headers: Optional[Dict[str, str]] = None,
+                timeout: float = 25) -> Tuple[bytes, str]:
+    """
+    GET de un recurso (imágenes). Devuelve (bytes, Content-Type).
+    Lanza IOError si la respuesta es >= 400 (igual que urlopen).
+    """
+    hdrs = dict(DEFAULT_HEADERS)
+    hdrs.update(headers or {})
+    if urllib3 is None:
+        req = urllib.request.Request(url, headers=hdrs)
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.read(), resp.headers.get("Content-Type", "")
+    r = _request("GET", url, headers=hdrs, timeout=timeout)
+    if r.status >= 400:
+        raise IOError(f"HTTP {r.status} {r.reason or ''}".strip())
+    return r.data, r.headers.get("Content-Type", "")
@@ -1,65 +1,346 @@
 from __future__ import annotations
-from typing import List, Dict, Optional
+import bisect
+import re
+import threading
+from typing import Iterable, List, Dict, Optional, Tuple
+from googleapiclient.errors import HttpError
 from back.drive.drive_check import build_sheets_service
+from back.drive.service_pool import page_identity
+from back.sheet.scheduler import SCHEDULER, INTERACTIVE, WRITE, READ, WRITE_KIND
+from back.sheet.change_tracker import CHANGE_TRACKER
+
+_RX_A1_CELL = re.compile(r"^\$?[A-Za-z]*\$?(\d*)$")
+
+
+class SchemaCache:
+    """
+    Pestañas y encabezados ya verificados por spreadsheet, compartidos por todas las APIs
+    del proceso durante la sesión. Solo se invalida cuando Sheets rechaza un rango/pestaña.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tabs: Dict[str, Dict[str, Dict]] = {}          # sheet_id -> {título: properties}
+        self._headers: Dict[str, Dict[str, List[str]]] = {}  # sheet_id -> {título: fila 1}
+
+    def tabs(self, sheet_id: str) -> Optional[Dict[str, Dict]]:
+        with self._lock:
+            t = self._tabs.get(sheet_id)
+            return dict(t) if t is not None else None
+
+    def set_tabs(self, sheet_id: str, props_by_title: Dict[str, Dict]):
+        with self._lock:
+            self._tabs[sheet_id] = dict(props_by_title)
+
+    def add_tab(self, sheet_id: str, title: str, props: Optional[Dict] = None):
+        with self._lock:
+            if sheet_id in self._tabs:
+                self._tabs[sheet_id][title] = dict(props or {"title": title})
+
+    def headers(self, sheet_id: str, tab: str) -> Optional[List[str]]:
+        with self._lock:
+            h = self._headers.get(sheet_id, {}).get(tab)
+            return list(h) if h is not None else None
+
+    def set_headers(self, sheet_id: str, tab: str, headers: List[str]):
+        with self._lock:
+            self._headers.setdefault(sheet_id, {})[tab] = list(headers)
+
+    def invalidate(self, sheet_id: str, tab: Optional[str] = None):
+        """Olvida una pestaña (o todo el spreadsheet si tab es None)."""
+        with self._lock:
+            if tab is None:
+                self._tabs.pop(sheet_id, None)
+                self._headers.pop(sheet_id, None)
+                return
+            self._tabs.pop(sheet_id, None)  # la lista de títulos ya no es confiable
+            self._headers.get(sheet_id, {}).pop(tab, None)
+
+
+SCHEMA_CACHE = SchemaCache()
+
+
+def is_range_error(ex: Exception) -> bool:
+    """True si Sheets rechazó el pedido por un rango/pestaña inexistente o inválido."""
+    if not isinstance(ex, HttpError):
+        return False
+    status = getattr(getattr(ex, "resp", None), "status", None)
+    if status not in (400, 404):
+        return False
+    msg = str(ex).lower()
+    return ("range" in msg) or ("sheet" in msg) or ("not found" in msg)
+
+
+class WriteBatch:
+    """
+    Unidad de trabajo sobre un spreadsheet: junta updates de celdas y appends y los
+    confirma juntos en commit():
+      - todos los updates en UN spreadsheets.values.batchUpdate (se aplican juntos),
+      - y, si hace falta, un append por rango destino.
+    Uso:
+        with api._write_batch() as wb:
+            wb.update("stock!A5:E5", [[...]])
+            wb.append("stock!A2", [[...]])
+    Si el bloque `with` lanza una excepción no se envía nada.
+    """
+    def __init__(self, base: "SheetsBase", input_opt: str = "USER_ENTERED"):
+        self.base = base
+        self.input_opt = input_opt
+        self._updates: List[Dict] = []
+        self._appends: List[Tuple[str, List[List[str]]]] = []
+
+    def update(self, a1_range: str, values: List[List[str]]) -> "WriteBatch":
+        self._updates.append({"range": a1_range, "values": values})
+        return self
+
+    def append(self, a1_range: str, values: List[List[str]]) -> "WriteBatch":
+        # appends consecutivos al mismo rango viajan en un solo request
+        if self._appends and self._appends[-1][0] == a1_range:
+            self._appends[-1][1].extend(values)
+        else:
+            self._appends.append((a1_range, list(values)))
+        return self
+
+    def __len__(self) -> int:
+        return len(self._updates) + len(self._appends)
+
+    def commit(self) -> Dict:
+        updates, appends = self._updates, self._appends
+        self._updates, self._appends = [], []
+        out: Dict = {"updates": None, "appends": []}
+        if updates:
+            out["updates"] = self.base._batch_set(updates, self.input_opt)
+        for rng, values in appends:
+            out["appends"].append(self.base._append(rng, values, self.input_opt))
+        return out
+
+    def __enter__(self) -> "WriteBatch":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        return False
 
 
 class SheetsBase:
     """
     Base con helpers comunes para Google Sheets.
     Subclases: ProductoAPI, DepositoAPI, StockAPI.
+
+    Índice RecID -> fila: se comparte entre todas las instancias (clave: sheet_id + pestaña),
+    se arma con cada list() y se mantiene en _append/_clear (y en los borrados físicos de
+    maintenance.py, vía _index_after_delete). Antes de escribir, la fila leída se compara
+    contra el RecID buscado; si no coincide, el índice se descarta y se rehace.
     """
-    def __init__(self, page, sheet_id: str):
+    # (sheet_id, pestaña) -> {RecID: fila 1-based}
+    _recid_index: Dict[Tuple[str, str], Dict[str, int]] = {}
+    # (sheet_id, pestaña) -> columna (1-based) donde está el RecID
+    _recid_col: Dict[Tuple[str, str], int] = {}
+
+    # Carriles del scheduler (ver back/sheet/scheduler.py)
+    READ_LANE = INTERACTIVE
+    WRITE_LANE = WRITE
+
+    def __init__(self, page, sheet_id: str, svc=None):
         self.page = page
         self.sheet_id = sheet_id
-        self.svc = build_sheets_service(page)
+        self.svc = svc or build_sheets_service(page)
+        self._user = page_identity(page)
+
+    def _exec(self, request, kind: str = READ, idempotent: bool = True):
+        """execute() a través del scheduler: cuota por spreadsheet/usuario, prioridad y reintentos."""
+        lane = self.WRITE_LANE if kind == WRITE_KIND else self.READ_LANE
+        return SCHEDULER.execute(request, sheet_id=self.sheet_id, user=self._user, lane=lane,
+                                 kind=kind, idempotent=idempotent)
 
     # --------- helpers de bajo nivel ----------
     def _get(self, a1_range: str) -> List[List[str]]:
-        resp = self.svc.spreadsheets().values().get(
-            spreadsheetId=self.sheet_id, range=a1_range
-        ).execute()
+        try:
+            resp = self._exec(self.svc.spreadsheets().values().get(
+                spreadsheetId=self.sheet_id, range=a1_range
+            ))
+        except Exception as ex:
+            self._on_range_error(a1_range, ex)
+            raise
         return resp.get("values", []) or []
 
+    def _batch_get(self, ranges: List[str]) -> List[List[List[str]]]:
+        """Lee varios rangos en un solo spreadsheets.values.batchGet (mismo orden que `ranges`)."""
+        if not ranges:
+            return []
+        try:
+            resp = self._exec(self.svc.spreadsheets().values().batchGet(
+                spreadsheetId=self.sheet_id, ranges=list(ranges)
+            ))
+        except Exception as ex:
+            for rng in ranges:
+                self._on_range_error(rng, ex)
+            raise
+        blocks = [(vr.get("values", []) or []) for vr in (resp.get("valueRanges") or [])]
+        return blocks + [[] for _ in range(len(ranges) - len(blocks))]
+
     def _set(self, a1_range: str, values: List[List[str]], input_opt: str = "USER_ENTERED"):
         body = {"values": values}
-        return self.svc.spreadsheets().values().update(
-            spreadsheetId=self.sheet_id,
-            range=a1_range,
-            valueInputOption=input_opt,
-            body=body,
-        ).execute()
+        self._mark_dirty(a1_range)
+        try:
+            return self._exec(self.svc.spreadsheets().values().update(
+                spreadsheetId=self.sheet_id,
+                range=a1_range,
+                valueInputOption=input_opt,
+                body=body,
+            ), WRITE_KIND)
+        except Exception as ex:
+            self._on_range_error(a1_range, ex)
+            raise
+
+    def _batch_set(self, data: List[Dict], input_opt: str = "USER_ENTERED"):
+        """Varios rangos en un solo spreadsheets.values.batchUpdate. data: [{range, values}, ...]"""
+        for d in data:
+            self._mark_dirty(d.get("range", ""))
+        try:
+            return self._exec(self.svc.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.sheet_id,
+                body={"valueInputOption": input_opt, "data": data},
+            ), WRITE_KIND)
+        except Exception as ex:
+            for d in data:
+                self._on_range_error(d.get("range", ""), ex)
+            raise
+
+    def _write_batch(self, input_opt: str = "USER_ENTERED") -> WriteBatch:
+        """Abre una unidad de trabajo (ver WriteBatch)."""
+        return WriteBatch(self, input_opt)
 
     def _append(self, a1_range: str, values: List[List[str]], input_opt: str = "USER_ENTERED"):
         body = {"values": values}
-        return self.svc.spreadsheets().values().append(
-            spreadsheetId=self.sheet_id,
-            range=a1_range,
-            valueInputOption=input_opt,
-            insertDataOption="INSERT_ROWS",
-            body=body,
-        ).execute()
+        self._mark_dirty(a1_range)
+        try:
+            resp = self._exec(self.svc.spreadsheets().values().append(
+                spreadsheetId=self.sheet_id,
+                range=a1_range,
+                valueInputOption=input_opt,
+                insertDataOption="INSERT_ROWS",
+                body=body,
+            ), WRITE_KIND, idempotent=False)
+        except Exception as ex:
+            self._on_range_error(a1_range, ex)
+            raise
+        self._index_after_append(a1_range, values, resp)
+        return resp
 
     def _clear(self, a1_range: str):
-        return self.svc.spreadsheets().values().clear(
-            spreadsheetId=self.sheet_id, range=a1_range, body={}
-        ).execute()
+        self._mark_dirty(a1_range)
+        try:
+            resp = self._exec(self.svc.spreadsheets().values().clear(
+                spreadsheetId=self.sheet_id, range=a1_range, body={}
+            ), WRITE_KIND)
+        except Exception as ex:
+            self._on_range_error(a1_range, ex)
+            raise
+        self._index_after_clear(a1_range)
+        return resp
+
+    # --------- borrado físico de filas ----------
+    def _sheet_gid(self, tab: str) -> Optional[int]:
+        """sheetId (gid) de la pestaña, desde SCHEMA_CACHE (se consulta si falta)."""
+        props = self._tab_props().get(tab) or {}
+        if props.get("sheetId") is None:
+            props = self._tab_props(refresh=True).get(tab) or {}
+        gid = props.get("sheetId")
+        return int(gid) if gid is not None else None
+
+    @staticmethod
+    def _row_runs(rows: Iterable[int]) -> List[Tuple[int, int]]:
+        """Filas 1-based -> tramos contiguos (primera, última), de abajo hacia arriba."""
+        runs: List[Tuple[int, int]] = []
+        for r in sorted({int(r) for r in rows if r and int(r) > 1}, reverse=True):
+            if runs and runs[-1][0] == r + 1:
+                runs[-1] = (r, runs[-1][1])
+            else:
+                runs.append((r, r))
+        return runs
+
+    def _delete_dimension_requests(self, tab: str, rows: Iterable[int]) -> List[Dict]:
+        """
+        deleteDimension de las filas (1-based; la fila 1 de encabezados nunca se borra).
+        Van de abajo hacia arriba: dentro del mismo batchUpdate cada borrado no corre
+        las filas de los borrados que siguen.
+        """
+        gid = self._sheet_gid(tab)
+        if gid is None:
+            raise ValueError(f"No existe la pestaña '{tab}'")
+        return [{"deleteDimension": {"range": {
+            "sheetId": gid, "dimension": "ROWS", "startIndex": first - 1, "endIndex": last,
+        }}} for first, last in self._row_runs(rows)]
+
+    def _batch_update(self, requests: List[Dict], tabs: Iterable[str] = ()):
+        """spreadsheets.batchUpdate (estructura). No se reintenta salvo 429: borrar dos veces corre filas."""
+        for t in tabs:
+            CHANGE_TRACKER.mark_dirty(self.sheet_id, t)
+        return self._exec(self.svc.spreadsheets().batchUpdate(
+            spreadsheetId=self.sheet_id, body={"requests": requests},
+        ), WRITE_KIND, idempotent=False)
+
+    def _mark_dirty(self, a1_range: str):
+        """La pestaña se escribió: el próximo refresco la vuelve a leer (ver change_tracker)."""
+        tab, _, _ = self._split_a1(a1_range)
+        CHANGE_TRACKER.mark_dirty(self.sheet_id, tab)
+
+    def _on_range_error(self, a1_range: str, ex: Exception):
+        """Si Sheets no reconoce el rango/pestaña, se olvida lo cacheado de esa pestaña."""
+        if is_range_error(ex):
+            tab, _, _ = self._split_a1(a1_range)
+            SCHEMA_CACHE.invalidate(self.sheet_id, tab or None)
+            self._drop_index(tab)
+
+    # --------- esquema (pestañas + encabezados) ----------
+    def _tab_props(self, refresh: bool = False) -> Dict[str, Dict]:
+        """Títulos -> properties de las pestañas (cacheado por spreadsheet)."""
+        tabs = None if refresh else SCHEMA_CACHE.tabs(self.sheet_id)
+        if tabs is None:
+            meta = self._exec(self.svc.spreadsheets().get(
+                spreadsheetId=self.sheet_id, fields="sheets.properties(sheetId,title)"
+            ))
+            tabs = {s["properties"]["title"]: s["properties"] for s in meta.get("sheets", [])}
+            SCHEMA_CACHE.set_tabs(self.sheet_id, tabs)
+        return tabs
+
+    def _read_headers(self, tab_name: str) -> List[str]:
+        """Fila 1 de la pestaña (cacheada una vez verificada)."""
+        hdrs = SCHEMA_CACHE.headers(self.sheet_id, tab_name)
+        if hdrs is not None:
+            return hdrs
+        row = (self._get(f"{tab_name}!1:1") or [[]])[0]
+        hdrs = [str(h).strip() for h in row]
+        if hdrs:
+            SCHEMA_CACHE.set_headers(self.sheet_id, tab_name, hdrs)
+        return hdrs
 
     def _ensure_tab_and_headers(self, tab_name: str, headers: List[str]):
         """
         Crea la pestaña si no existe y escribe encabezados en la fila 1 (idempotente).
+        Una vez verificada, la pestaña queda en SCHEMA_CACHE y no se vuelve a consultar.
         """
-        meta = self.svc.spreadsheets().get(
-            spreadsheetId=self.sheet_id, fields="sheets.properties.title"
-        ).execute()
-        titles = [s["properties"]["title"] for s in meta.get("sheets", [])]
-        if tab_name not in titles:
-            self.svc.spreadsheets().batchUpdate(
+        if SCHEMA_CACHE.headers(self.sheet_id, tab_name) is not None:
+            return
+        cached = SCHEMA_CACHE.tabs(self.sheet_id) is not None
+        tabs = self._tab_props()
+        if tab_name not in tabs and cached:
+            tabs = self._tab_props(refresh=True)  # pudo crearla otra sesión
+        if tab_name not in tabs:
+            CHANGE_TRACKER.mark_dirty(self.sheet_id, tab_name)
+            resp = self._exec(self.svc.spreadsheets().batchUpdate(
                 spreadsheetId=self.sheet_id,
                 body={"requests": [{"addSheet": {"properties": {"title": tab_name}}}]},
-            ).execute()
+            ), WRITE_KIND, idempotent=False)
+            reply = ((resp or {}).get("replies") or [{}])[0]
+            SCHEMA_CACHE.add_tab(self.sheet_id, tab_name, (reply.get("addSheet") or {}).get("properties"))
         existing = self._get(f"{tab_name}!1:1")
         if not existing or not existing[0]:
             self._set(f"{tab_name}!A1:{self._col_letter(len(headers))}1", [headers])
+            SCHEMA_CACHE.set_headers(self.sheet_id, tab_name, headers)
+        else:
+            SCHEMA_CACHE.set_headers(self.sheet_id, tab_name, [str(h).strip() for h in existing[0]])
 
     @staticmethod
     def _col_letter(n: int) -> str:
@@ -79,6 +360,121 @@ class SheetsBase:
                 return i
         return None
 
+    # --------- índice RecID -> fila ----------
+    @staticmethod
+    def _split_a1(a1_range: str) -> Tuple[str, Optional[int], Optional[int]]:
+        """'stock!A5:E7' -> ('stock', 5, 7). Las filas quedan en None si el rango no las trae."""
+        tab, _, cells = (a1_range or "").rpartition("!")
+        tab = tab.strip().strip("'")
+        parts = cells.split(":")
+        rows: List[Optional[int]] = []
+        for p in parts[:2]:
+            m = _RX_A1_CELL.match(p.strip())
+            rows.append(int(m.group(1)) if (m and m.group(1)) else None)
+        first = rows[0] if rows else None
+        last = rows[1] if len(rows) > 1 else first
+        return tab, first, last
+
+    def _index_rows(self, tab: str, rows: List[List[str]], recid_col: int = 2,
+                    first_col: int = 1, start_row: int = 2) -> Dict[str, int]:
+        """
+        (Re)arma el índice RecID -> fila de `tab` con filas leídas desde `start_row`.
+        `first_col` es la columna (1-based) en la que empieza cada fila leída.
+        """
+        pos = recid_col - first_col
+        idx: Dict[str, int] = {}
+        for i, r in enumerate(rows, start=start_row):
+            v = (r[pos].strip() if r and len(r) > pos else "")
+            if v and v not in idx:  # primera coincidencia, igual que el scan lineal
+                idx[v] = i
+        key = (self.sheet_id, tab)
+        self._recid_index[key] = idx
+        self._recid_col[key] = recid_col
+        return idx
+
+    def _drop_index(self, tab: str):
+        key = (self.sheet_id, tab)
+        self._recid_index.pop(key, None)
+        self._recid_col.pop(key, None)
+
+    def _row_by_recid(self, tab: str, recid: str, recid_col: int = 2) -> Optional[int]:
+        """
+        Fila (1-based) del RecID según el índice. Si no hay índice, o el RecID no figura
+        (p. ej. alta hecha desde otra sesión), se rehace leyendo solo la columna del RecID.
+        """
+        recid = (recid or "").strip()
+        if not recid:
+            return None
+        key = (self.sheet_id, tab)
+        idx = self._recid_index.get(key)
+        if idx is not None and self._recid_col.get(key) == recid_col and recid in idx:
+            return idx[recid]
+        col = self._col_letter(recid_col)
+        idx = self._index_rows(tab, self._get(f"{tab}!{col}2:{col}"), recid_col, first_col=recid_col)
+        return idx.get(recid)
+
+    def _read_row_by_recid(self, tab: str, recid: str, width: int,
+                           recid_col: int = 2) -> Tuple[Optional[int], List[str]]:
+        """
+        Lee la fila del RecID (A..width) y verifica que siga siendo la misma.
+        Devuelve (fila, valores normalizados a `width`) o (None, []).
+        """
+        recid = (recid or "").strip()
+        row = self._row_by_recid(tab, recid, recid_col)
+        for _ in range(2):
+            if not row:
+                return None, []
+            cur = (self._get(f"{tab}!A{row}:{self._col_letter(width)}{row}") or [[]])[0]
+            cur = (cur + [""] * width)[:width]
+            if cur[recid_col - 1].strip() == recid:
+                return row, cur
+            # índice viejo (la hoja cambió por fuera): se descarta y se vuelve a buscar
+            self._drop_index(tab)
+            row = self._row_by_recid(tab, recid, recid_col)
+        return None, []
+
+    def _index_after_append(self, a1_range: str, values: List[List[str]], resp: Dict):
+        tab, _, _ = self._split_a1(a1_range)
+        key = (self.sheet_id, tab)
+        idx = self._recid_index.get(key)
+        if idx is None:
+            return
+        updated = ((resp or {}).get("updates") or {}).get("updatedRange") or ""
+        _, first, _ = self._split_a1(updated)
+        if not first:
+            self._drop_index(tab)
+            return
+        pos = self._recid_col[key] - 1
+        for i, r in enumerate(values, start=first):
+            v = str(r[pos]).strip() if len(r) > pos else ""
+            if v:
+                idx[v] = i
+
+    def _index_after_delete(self, tab: str, rows: List[int]):
+        """Filas borradas (ordenadas): se quitan del índice y las de abajo suben."""
+        idx = self._recid_index.get((self.sheet_id, tab))
+        if idx is None:
+            return
+        gone = set(rows)
+        for k, r in list(idx.items()):
+            if r in gone:
+                idx.pop(k, None)
+            else:
+                shift = bisect.bisect_left(rows, r)
+                if shift:
+                    idx[k] = r - shift
+
+    def _index_after_clear(self, a1_range: str):
+        tab, first, last = self._split_a1(a1_range)
+        idx = self._recid_index.get((self.sheet_id, tab))
+        if idx is None:
+            return
+        if not first:
+            self._drop_index(tab)
+            return
+        for k in [k for k, r in idx.items() if r >= first and (last is None or r <= last)]:
+            idx.pop(k, None)
+
     def _find_row_by_two_cols(self, tab: str, col1_idx_1b: int, val1: str, col2_idx_1b: int, val2: str) -> Optional[int]:
         """
         Busca fila por coincidencia exacta en dos columnas (1-based).
@@ -95,7 +491,7 @@ class SheetsBase:
         return None
 
     def verify_access(self) -> Dict:
-        meta = self.svc.spreadsheets().get(
+        meta = self._exec(self.svc.spreadsheets().get(
             spreadsheetId=self.sheet_id, fields="properties(title)"
-        ).execute()
+        ))
         return meta.get("properties", {})
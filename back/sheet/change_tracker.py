@@ -0,0 +1,190 @@
+# back/sheet/change_tracker.py
+"""
+Detección de cambios del spreadsheet para refrescos incrementales.
+
+Antes de recargar pestañas se pide a Drive files.get(fields=version,modifiedTime,
+lastModifyingUser) del spreadsheet (un request chico) y se decide:
+
+  - version igual a la última vista        -> se usa el cache (0 lecturas de Sheets)
+  - version cambió y el último en modificar
+    es esta cuenta, sin escrituras de otros
+    posteriores a la última nuestra         -> se releen sólo las pestañas que esta
+                                               sesión marcó como escritas ("sucias")
+  - cualquier otro caso                     -> se releen todas las pestañas pedidas
+
+Las escrituras de SheetsBase / LogAPI marcan la pestaña con mark_dirty(). Como Drive no
+dice qué cambió, una escritura de la misma cuenta desde otro dispositivo justo antes de
+la nuestra no se distingue: por eso, pasado FULL_RELOAD_EVERY segundos desde la última
+lectura completa, se vuelve a leer todo igual.
+
+Si Drive no responde (sin scope, sin red) se lee todo, como antes.
+"""
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from back.sheet.scheduler import SCHEDULER, INTERACTIVE
+
+FULL_RELOAD_EVERY = float(os.getenv("SHEETS_FULL_RELOAD_EVERY", "120"))  # segundos
+# Tolerancia entre nuestro reloj y modifiedTime de Drive
+CLOCK_SLACK = 5.0
+
+CACHE, PARTIAL, FULL = "cache", "partial", "full"
+
+
+def _parse_rfc3339(value: str) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc).timestamp()
+    except Exception:
+        return None
+
+
+class _SheetState:
+    __slots__ = ("version", "tabs", "dirty", "last_write", "last_full", "disabled")
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.tabs: Dict[str, List[Dict]] = {}   # pestaña -> filas decodificadas
+        self.dirty: Dict[str, int] = {}         # pestaña -> seq de la última escritura
+        self.last_write = 0.0                   # time.time() de la última escritura nuestra
+        self.last_full = 0.0                    # time.monotonic() de la última lectura completa
+        self.disabled = False                   # Drive no disponible para este spreadsheet
+
+
+class Plan:
+    """Resultado de check(): qué leer y con qué versión quedar si la lectura sale bien."""
+    __slots__ = ("mode", "fetch", "version", "seq")
+
+    def __init__(self, mode: str, fetch: Tuple[str, ...], version: Optional[int], seq: int):
+        self.mode = mode
+        self.fetch = fetch
+        self.version = version
+        self.seq = seq
+
+    def __repr__(self):
+        return f"Plan({self.mode}, fetch={self.fetch}, version={self.version})"
+
+
+class ChangeTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, _SheetState] = {}
+        self._seq = itertools.count(1)
+        self._last_seq = 0
+        self.stats = {"checks": 0, CACHE: 0, PARTIAL: 0, FULL: 0, "errors": 0}
+
+    def _st(self, sheet_id: str) -> _SheetState:
+        st = self._state.get(sheet_id)
+        if st is None:
+            st = self._state[sheet_id] = _SheetState()
+        return st
+
+    # --------- escrituras ----------
+    def mark_dirty(self, sheet_id: str, tab: str):
+        """Esta sesión escribió (o intentó escribir) en `tab`."""
+        if not sheet_id:
+            return
+        with self._lock:
+            st = self._st(sheet_id)
+            self._last_seq = next(self._seq)
+            st.dirty[tab or ""] = self._last_seq
+            st.last_write = time.time()
+
+    # --------- lectura ----------
+    def _fetch_meta(self, page, sheet_id: str) -> Dict:
+        # corre en cada refresco: pasa por el scheduler (cuota por usuario, carril de la UI)
+        from back.drive.drive_check import build_drive_service
+        from back.drive.service_pool import page_identity
+        drive = build_drive_service(page)
+        request = drive.files().get(
+            fileId=sheet_id, fields="version,modifiedTime,lastModifyingUser(me,emailAddress)",
+            supportsAllDrives=True,
+        )
+        return SCHEDULER.execute(request, sheet_id=sheet_id, user=page_identity(page), lane=INTERACTIVE)
+
+    def check(self, page, sheet_id: str, tabs: Iterable[str]) -> Plan:
+        tabs = tuple(tabs)
+        with self._lock:
+            st = self._st(sheet_id)
+            seq = self._last_seq
+            disabled = st.disabled
+            missing = [t for t in tabs if t not in st.tabs]
+        self.stats["checks"] += 1
+        if disabled or not sheet_id:
+            return self._plan(FULL, tabs, None, seq)
+
+        try:
+            meta = self._fetch_meta(page, sheet_id)
+            version = int(meta.get("version") or 0)
+        except Exception as ex:
+            self.stats["errors"] += 1
+            if getattr(getattr(ex, "resp", None), "status", None) in (401, 403):
+                with self._lock:
+                    self._st(sheet_id).disabled = True
+            return self._plan(FULL, tabs, None, seq)
+
+        with self._lock:
+            st = self._st(sheet_id)
+            stale = (time.monotonic() - st.last_full) > FULL_RELOAD_EVERY
+            if st.version is None or stale:
+                return self._plan(FULL, tabs, version, seq)
+            if version == st.version:
+                fetch = tuple(t for t in tabs if t in st.dirty or t in missing)
+                return self._plan(PARTIAL if fetch else CACHE, fetch, version, seq)
+
+            who = meta.get("lastModifyingUser") or {}
+            modified = _parse_rfc3339(meta.get("modifiedTime") or "")
+            ours = bool(who.get("me")) and bool(st.dirty) and (
+                modified is None or modified <= st.last_write + CLOCK_SLACK
+            )
+            if not ours:
+                return self._plan(FULL, tabs, version, seq)
+            fetch = tuple(t for t in tabs if t in st.dirty or t in missing)
+            return self._plan(PARTIAL if fetch else CACHE, fetch, version, seq)
+
+    def _plan(self, mode: str, fetch: Tuple[str, ...], version: Optional[int], seq: int) -> Plan:
+        self.stats[mode] += 1
+        return Plan(mode, fetch, version, seq)
+
+    def commit(self, sheet_id: str, plan: Plan, data: Dict[str, List[Dict]]):
+        """Guarda lo leído según el plan y avanza la versión conocida."""
+        with self._lock:
+            st = self._st(sheet_id)
+            if plan.mode == FULL:
+                # la versión avanza: lo cacheado de otras pestañas ya no es confiable
+                st.tabs = {}
+            st.tabs.update(data)
+            if plan.mode == FULL:
+                st.last_full = time.monotonic()
+                # lo escrito antes del check ya está incluido en esta lectura
+                for t in [t for t, s in st.dirty.items() if s <= plan.seq]:
+                    st.dirty.pop(t, None)
+            else:
+                for t in plan.fetch:
+                    if st.dirty.get(t, 0) <= plan.seq:
+                        st.dirty.pop(t, None)
+                # pestañas sucias que no se pidieron siguen sucias para el próximo check
+            if plan.version is not None:
+                st.version = plan.version
+
+    def cached(self, sheet_id: str, tabs: Iterable[str]) -> Dict[str, List[Dict]]:
+        with self._lock:
+            st = self._st(sheet_id)
+            return {t: st.tabs.get(t, []) for t in tabs}
+
+    def forget(self, sheet_id: Optional[str] = None):
+        with self._lock:
+            if sheet_id is None:
+                self._state.clear()
+            else:
+                self._state.pop(sheet_id, None)
+
+
+CHANGE_TRACKER = ChangeTracker()
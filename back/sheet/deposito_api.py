@@ -19,7 +19,11 @@ class DepositoAPI(SheetsBase):
     def list(self) -> List[Dict]:
         self._ensure_tab_and_headers(self.TAB, self.HEADERS)
         rng = f"{self.TAB}!A2:{self._col_letter(len(self.HEADERS))}"
-        rows = self._get(rng)
+        return self._decode(self._get(rng))
+
+    def _decode(self, rows: List[List[str]], headers: Optional[List[str]] = None) -> List[Dict]:
+        """Filas crudas (desde la fila 2) -> dicts; de paso rearma el índice RecID -> fila."""
+        self._index_rows(self.TAB, rows)
         out = []
         for r in rows:
             r = (r + [""] * len(self.HEADERS))[:len(self.HEADERS)]
@@ -63,12 +67,10 @@ class DepositoAPI(SheetsBase):
         recid = (recid or "").strip()
         if not recid:
             return False
-        row = self._find_row_by_col_value(self.TAB, 2, recid)  # B=RecID
+        row, cur = self._read_row_by_recid(self.TAB, recid, len(self.HEADERS))  # B=RecID
         if not row:
             return False
         rng = f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
-        cur = (self._get(rng) or [[]])[0]
-        cur += [""] * (len(self.HEADERS) - len(cur))
         cur[0] = ""  # data_ini_prox
         if id_deposito is not None:      cur[2] = (id_deposito or "")
         if nombre_deposito is not None:  cur[3] = (nombre_deposito or "")
@@ -83,9 +85,12 @@ class DepositoAPI(SheetsBase):
         recid = (recid or "").strip()
         if not recid:
             return False
-        row = self._find_row_by_col_value(self.TAB, 2, recid)  # B=RecID
+        row, _cur = self._read_row_by_recid(self.TAB, recid, len(self.HEADERS))  # B=RecID
         if not row:
             return False
+        # se vacía la fila en lugar de borrarla: borrar corre las filas de abajo y otra
+        # sesión podría escribir sobre el registro equivocado. Los huecos los saca
+        # SheetMaintenance.compact, que se corre a mano.
         rng = f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
         self._clear(rng)
         return True
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from typing import List, Dict, Optional
 from .base import SheetsBase
+from .scheduler import BACKGROUND
 
 
 class ImagenAPI(SheetsBase):
@@ -11,6 +12,8 @@ class ImagenAPI(SheetsBase):
     """
     TAB = "imagen"
     HEADERS = ["data_ini_prox", "RecID", "ID_nombre"]
+    # Las búsquedas de links de imágenes no compiten con las lecturas de la UI
+    READ_LANE = BACKGROUND
     def add(self, recid: str, link: str) -> bool:
         self._ensure_tab_and_headers(self.TAB, self.HEADERS)
         recid = (recid or "").strip()
@@ -22,7 +25,11 @@ class ImagenAPI(SheetsBase):
     def list(self) -> List[Dict]:
         self._ensure_tab_and_headers(self.TAB, self.HEADERS)
         rng = f"{self.TAB}!A2:{self._col_letter(len(self.HEADERS))}"
-        rows = self._get(rng)
+        return self._decode(self._get(rng))
+
+    def _decode(self, rows: List[List[str]], headers: Optional[List[str]] = None) -> List[Dict]:
+        """Filas crudas (desde la fila 2) -> dicts; de paso rearma el índice RecID -> fila."""
+        self._index_rows(self.TAB, rows)
         out: List[Dict] = []
         for r in rows:
             r = (r + [""] * len(self.HEADERS))[:len(self.HEADERS)]
@@ -39,12 +46,9 @@ class ImagenAPI(SheetsBase):
         recid = (recid or "").strip()
         if not recid:
             return None
-        row = self._find_row_by_col_value(self.TAB, 2, recid)  # B=RecID
+        row, cur = self._read_row_by_recid(self.TAB, recid, len(self.HEADERS))  # B=RecID
         if not row:
             return None
-        rng = f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
-        cur = (self._get(rng) or [[]])[0]
-        cur += [""] * (len(self.HEADERS) - len(cur))
         return (cur[2] or "").strip()  # C = ID_nombre (link)
 
     def delete_by_recid(self, recid: str) -> bool:
@@ -52,9 +56,9 @@ class ImagenAPI(SheetsBase):
         recid = (recid or "").strip()
         if not recid:
             return False
-        row = self._find_row_by_col_value(self.TAB, 2, recid)  # B=RecID
+        row, _cur = self._read_row_by_recid(self.TAB, recid, len(self.HEADERS))  # B=RecID
         if not row:
             return False
         rng = f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
-        self._clear(rng)
+        self._clear(rng)     # en el lugar, sin correr filas (ver DepositoAPI.delete_by_recid)
         return True
@@ -1,14 +1,35 @@
 # back/sheet/log_api.py
 from __future__ import annotations
 
-import base64, json
-from datetime import datetime
-from typing import Optional
+import atexit, base64, json, os, re, threading, time
+from collections import deque
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Tuple
 
 import flet as ft
 from back.drive.drive_check import build_sheets_service
+from back.drive.service_pool import page_identity
+from back.sheet.scheduler import SCHEDULER, BACKGROUND, READ, WRITE_KIND, http_status
+from back.sheet.change_tracker import CHANGE_TRACKER
+from back.sheet.log_store import parse_ts
 
 LOG_SHEET = "logs"  # columnas: data_ini_prox | fecha | ID_usuario | Accion
+LOG_HEADERS = ["data_ini_prox", "fecha", "ID_usuario", "Accion"]
+
+# Particiones mensuales: cada fila va a logs_YYYY_MM según el mes en que se escribe; la
+# pestaña 'logs' queda como histórico (lo escrito antes de particionar) y se sigue leyendo.
+LOGS_PARTITIONED = os.getenv("LOGS_PARTITIONED", "1") != "0"
+_PARTITION_RE = re.compile(r"^logs_(\d{4})_(\d{2})$")
+
+# Modo buffer: append() encola y un hilo manda las filas en lotes (LOGS_BUFFERED=0 lo apaga)
+LOGS_BUFFERED = os.getenv("LOGS_BUFFERED", "1") != "0"
+FLUSH_ROWS = int(os.getenv("LOGS_FLUSH_ROWS", "20"))          # filas encoladas que disparan un envío
+FLUSH_SECONDS = float(os.getenv("LOGS_FLUSH_SECONDS", "5"))   # espera máxima de una fila en la cola
+MAX_BATCH = 500                                               # filas por values.append
+RETRY_CAP = 60.0                                              # backoff máximo entre intentos fallidos
+MAX_REJECTS = 5                                               # 4xx seguidos antes de descartar el lote
+
+PAGE_SIZE = 200   # filas por página del visor (LogPager)
 
 
 # ------------------ identidad (idéntica a la que venís usando) ------------------
@@ -62,65 +83,131 @@ def _get_identity(page: ft.Page) -> tuple[str, str]:
     return display_name, (uid or email or "1")
 
 
+# ------------------ particiones ------------------
+def partition_for(when: Optional[datetime] = None) -> str:
+    """Pestaña de log para el momento dado (ahora por defecto)."""
+    if not LOGS_PARTITIONED:
+        return LOG_SHEET
+    when = when or datetime.now()
+    return f"{LOG_SHEET}_{when.year:04d}_{when.month:02d}"
+
+
+def partition_month(title: str) -> Optional[Tuple[int, int]]:
+    """(año, mes) de una pestaña logs_YYYY_MM; None si no es una partición."""
+    m = _PARTITION_RE.match(title or "")
+    if not m or not (1 <= int(m.group(2)) <= 12):
+        return None
+    return int(m.group(1)), int(m.group(2))
+
+
+def tabs_for_range(titles: List[str], since: Optional[date] = None,
+                   until: Optional[date] = None) -> List[str]:
+    """
+    Pestañas de log que se solapan con [since, until] (fechas inclusive, None = abierto),
+    de la más nueva a la más vieja. 'logs' (histórico) va al final, y sólo si el rango
+    arranca antes de que terminara el mes de la partición más vieja.
+    """
+    parts = sorted(((partition_month(t), t) for t in titles if partition_month(t)), reverse=True)
+    lo = (since.year, since.month) if since else None
+    hi = (until.year, until.month) if until else None
+    out = [t for ym, t in parts if (lo is None or ym >= lo) and (hi is None or ym <= hi)]
+    if LOG_SHEET in titles:
+        oldest = parts[-1][0] if parts else None
+        if oldest is None or lo is None or lo <= oldest:
+            out.append(LOG_SHEET)
+    return out
+
+
 # ------------------ API de Log ------------------
 class LogAPI:
     """
-    Escribe filas en la hoja 'logs' con el formato:
+    Escribe filas en la hoja de logs del mes (logs_YYYY_MM) con el formato:
     [ "", fecha, ID_usuario, Accion ]
     - ID_usuario: **nombre del usuario** (display_name), como pediste.
-    - Auto-crea la pestaña 'logs' y siembra encabezados si faltan.
+    - Auto-crea la pestaña del mes y siembra encabezados si faltan (el primer log de
+      cada mes abre la partición nueva).
+    - buffered (por defecto LOGS_BUFFERED): append() no toca la red; la fila va a la
+      cola del spreadsheet (_LogBuffer) y se manda en lote. flush_logs() la vacía.
     """
 
-    _ensured = False
-
-    def __init__(self, page: ft.Page, sheet_id: str):
+    def __init__(self, page: ft.Page, sheet_id: str, buffered: Optional[bool] = None):
         self.page = page
         self.sheet_id = sheet_id
         self.sheets = build_sheets_service(page)
+        self._user = page_identity(page)
+        self.buffered = LOGS_BUFFERED if buffered is None else bool(buffered)
+        self._ensured: set = set()      # pestañas de log ya verificadas por esta instancia
+
+    def _exec(self, request, kind: str = READ, idempotent: bool = True, tab: str = LOG_SHEET):
+        # Los logs van por el carril de fondo: nunca le ganan a la UI ni al stock
+        if kind == WRITE_KIND:
+            CHANGE_TRACKER.mark_dirty(self.sheet_id, tab)
+        return SCHEDULER.execute(request, sheet_id=self.sheet_id, user=self._user,
+                                 lane=BACKGROUND, kind=kind, idempotent=idempotent)
+
+    def _titles(self) -> List[str]:
+        meta = self._exec(self.sheets.spreadsheets().get(
+            spreadsheetId=self.sheet_id,
+            fields="sheets.properties.title",
+        ))
+        return [s["properties"]["title"] for s in meta.get("sheets", [])]
+
+    def row_counts(self) -> Dict[str, int]:
+        """{pestaña: rowCount de la grilla} de todo el spreadsheet, en un solo request."""
+        meta = self._exec(self.sheets.spreadsheets().get(
+            spreadsheetId=self.sheet_id,
+            fields="sheets.properties(title,gridProperties.rowCount)",
+        ))
+        return {
+            s["properties"]["title"]: int((s["properties"].get("gridProperties") or {}).get("rowCount") or 0)
+            for s in meta.get("sheets", [])
+        }
+
+    def _write_headers(self, tab: str):
+        self._exec(self.sheets.spreadsheets().values().update(
+            spreadsheetId=self.sheet_id,
+            range=f"{tab}!A1:D1",
+            valueInputOption="RAW",
+            body={"values": [LOG_HEADERS]},
+        ), WRITE_KIND, tab=tab)
 
     # Garantiza que exista la hoja y los encabezados
-    def _ensure_logs_sheet(self):
-        if self._ensured:
-            return
+    def _ensure_logs_sheet(self, tab: Optional[str] = None) -> bool:
+        tab = tab or partition_for()
+        if tab in self._ensured:
+            return True
         try:
-            meta = self.sheets.spreadsheets().get(
-                spreadsheetId=self.sheet_id,
-                fields="sheets.properties.title",
-            ).execute()
-            titles = [s["properties"]["title"] for s in meta.get("sheets", [])]
-            if LOG_SHEET not in titles:
-                # crear pestaña logs
-                self.sheets.spreadsheets().batchUpdate(
-                    spreadsheetId=self.sheet_id,
-                    body={"requests": [{"addSheet": {"properties": {"title": LOG_SHEET}}}]},
-                ).execute()
-                # encabezados
-                headers = [["data_ini_prox", "fecha", "ID_usuario", "Accion"]]
-                self.sheets.spreadsheets().values().update(
-                    spreadsheetId=self.sheet_id,
-                    range=f"{LOG_SHEET}!A1:D1",
-                    valueInputOption="RAW",
-                    body={"values": headers},
-                ).execute()
+            if tab not in self._titles():
+                # crear la pestaña (la del mes nuevo, o 'logs' si no se particiona)
+                try:
+                    self._exec(self.sheets.spreadsheets().batchUpdate(
+                        spreadsheetId=self.sheet_id,
+                        # grilla de 1 fila (encabezados): cada append INSERT_ROWS la agranda,
+                        # así rowCount es la última fila con datos (ver LogPager)
+                        body={"requests": [{"addSheet": {"properties": {
+                            "title": tab, "gridProperties": {"rowCount": 1, "columnCount": len(LOG_HEADERS)},
+                        }}}]},
+                    ), WRITE_KIND, idempotent=False, tab=tab)
+                except Exception:
+                    # otra sesión pudo haberla creado entre la consulta y el addSheet
+                    if tab not in self._titles():
+                        raise
+                self._write_headers(tab)
             else:
                 # asegurar encabezados si están vacíos
-                resp = self.sheets.spreadsheets().values().get(
+                resp = self._exec(self.sheets.spreadsheets().values().get(
                     spreadsheetId=self.sheet_id,
-                    range=f"{LOG_SHEET}!A1:D1",
-                ).execute()
+                    range=f"{tab}!A1:D1",
+                ))
                 vals = resp.get("values", []) or []
                 if not vals or len(vals[0]) < 4:
-                    headers = [["data_ini_prox", "fecha", "ID_usuario", "Accion"]]
-                    self.sheets.spreadsheets().values().update(
-                        spreadsheetId=self.sheet_id,
-                        range=f"{LOG_SHEET}!A1:D1",
-                        valueInputOption="RAW",
-                        body={"values": headers},
-                    ).execute()
-            self._ensured = True
+                    self._write_headers(tab)
+            self._ensured.add(tab)
+            return True
         except Exception as e:
             # No levantamos excepción para no romper el flujo visual, pero lo dejamos en consola
-            print("[WARN][logs] No se pudo asegurar la hoja 'logs':", e)
+            print(f"[WARN][logs] No se pudo asegurar la hoja '{tab}':", e)
+            return False
 
     def append(
         self,
@@ -135,28 +222,433 @@ class LogAPI:
         - accion: texto de la acción, personalizado por el módulo.
         - id_usuario: si querés forzar; si no, guardamos el **nombre** del usuario actual.
         - fecha: si no se pasa, se usa ahora.
+        En modo buffer devuelve True apenas la fila queda encolada.
         """
-        self._ensure_logs_sheet()
-
         display_name, _uid = _get_identity(self.page)
-        ts = fecha or datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        # ISO 8601 local, sin ambigüedad día/mes (el visor lo parsea con fromisoformat)
+        ts = fecha or datetime.now().isoformat(sep=" ", timespec="seconds")
         action_text = f"{display_name} — {accion}" if include_user_name_in_action else accion
 
         # 👇 Guardamos el **NOMBRE** en ID_usuario
         row = ["", ts, (id_usuario or display_name), action_text]
+        tab = partition_for()
+        if self.buffered and self.sheet_id:
+            _buffer_for(self.sheet_id, self._user).put(self, tab, row)
+            return True
+
+        self._ensure_logs_sheet(tab)
         try:
-            self.sheets.spreadsheets().values().append(
-                spreadsheetId=self.sheet_id,
-                range=f"{LOG_SHEET}!A1",
-                valueInputOption="RAW",
-                insertDataOption="INSERT_ROWS",
-                body={"values": [row]},
-            ).execute()
+            self._append_rows([row], tab)
             return True
         except Exception as e:
             print("[WARN][logs] No se pudo insertar la fila de log:", e)
             return False
 
+    def _append_rows(self, rows: List[List[str]], tab: str = LOG_SHEET) -> int:
+        """Un values.append con todas las filas. Devuelve la última fila escrita (0 si no se sabe)."""
+        resp = self._exec(self.sheets.spreadsheets().values().append(
+            spreadsheetId=self.sheet_id,
+            range=f"{tab}!A1",
+            valueInputOption="RAW",
+            insertDataOption="INSERT_ROWS",
+            body={"values": rows},
+        ), WRITE_KIND, idempotent=False, tab=tab)
+        m = re.search(r"!\$?[A-Z]+\$?(\d+)(?::\$?[A-Z]+\$?(\d+))?$",
+                      ((resp or {}).get("updates") or {}).get("updatedRange") or "")
+        return int(m.group(2) or m.group(1)) if m else 0
+
+    def _tail(self, after_row: int, tab: str = LOG_SHEET) -> List[List[str]]:
+        """Filas de logs (B:D) debajo de `after_row` (o toda la pestaña si no se conoce)."""
+        start = after_row + 1 if after_row > 0 else 2
+        resp = self._exec(self.sheets.spreadsheets().values().get(
+            spreadsheetId=self.sheet_id,
+            range=f"{tab}!B{start}:D",
+        ))
+        return resp.get("values", []) or []
+
+    # --------- lectura ----------
+    def log_tabs(self, since: Optional[date] = None, until: Optional[date] = None) -> List[str]:
+        """Pestañas de log que cubren el rango, la más nueva primero (ver tabs_for_range)."""
+        return tabs_for_range(self._titles(), since, until)
+
+    def read_rows(self, tab: str, first: int, last: Optional[int] = None) -> List[List[str]]:
+        """Filas [fecha, ID_usuario, Accion] de B{first}:D{last} (hasta el final si last es None)."""
+        resp = self._exec(self.sheets.spreadsheets().values().get(
+            spreadsheetId=self.sheet_id,
+            range="'" + tab.replace("'", "''") + f"'!B{first}:D{last or ''}",
+        ))
+        return resp.get("values", []) or []
+
+    def read_tabs(self, tabs: List[str]) -> Dict[str, List[List[str]]]:
+        """{pestaña: filas [fecha, ID_usuario, Accion]} en un solo batchGet."""
+        if not tabs:
+            return {}
+        resp = self._exec(self.sheets.spreadsheets().values().batchGet(
+            spreadsheetId=self.sheet_id,
+            ranges=["'" + t.replace("'", "''") + "'!B2:D" for t in tabs],
+        ))
+        blocks = [vr.get("values", []) or [] for vr in resp.get("valueRanges", [])]
+        return dict(zip(tabs, blocks + [[]] * (len(tabs) - len(blocks))))
+
+
+# ------------------ lectura paginada ------------------
+class LogPager:
+    """
+    Lectura del log desde el final, por páginas (lo más nuevo primero).
+
+    open():  un spreadsheets.get (títulos + rowCount de cada pestaña) y la última página
+             de la pestaña más nueva del rango: B{n-k+1}:D{n}.
+    older(): la página anterior; al terminar una pestaña sigue con el mes anterior (una
+             página no junta filas de dos pestañas).
+    newer(): sólo lo escrito debajo de la última fila leída (B{n+1}:D), o en una
+             partición de mes que apareció después de open().
+
+    En las particiones que crea LogAPI rowCount es exactamente la última fila. En 'logs'
+    puede sobrar grilla vacía: values.get recorta las filas vacías del final y, si una
+    ventana vino vacía, se sigue subiendo con ventanas cada vez más grandes.
+    Las entradas son (pestaña, fila, [fecha, ID_usuario, Accion]) en orden de escritura.
+    """
+
+    def __init__(self, api: LogAPI, since: Optional[date] = None, until: Optional[date] = None,
+                 page_size: int = PAGE_SIZE, parse_ts: Callable[[str], Optional[float]] = parse_ts):
+        self.api = api
+        self.since = since
+        self.until = until
+        self.page_size = max(1, int(page_size))
+        self.parse_ts = parse_ts
+        self.tabs: List[str] = []
+        self.counts: Dict[str, int] = {}
+        self.exhausted = False
+        self._idx = 0            # pestaña que se está paginando hacia atrás
+        self._hi = 0             # próxima fila (inclusive) a leer hacia arriba en esa pestaña
+        self.head_tab = ""       # pestaña más nueva y su última fila leída (para newer())
+        self.head_row = 0
+        self._since_ts = datetime(since.year, since.month, since.day).timestamp() if since else None
+
+    def total_hint(self) -> Optional[int]:
+        """Filas de log del rango según rowCount (None si entra 'logs', cuya grilla no es exacta)."""
+        if LOG_SHEET in self.tabs:
+            return None
+        return sum(max(0, self.counts.get(t, 0) - 1) for t in self.tabs)
+
+    def open(self) -> List[Tuple[str, int, List[str]]]:
+        counts = self.api.row_counts()
+        self.tabs = tabs_for_range(list(counts), self.since, self.until)
+        self.counts = {t: counts[t] for t in self.tabs}
+        self.exhausted = not self.tabs
+        if self.exhausted:
+            return []
+        self._idx, self._hi = 0, self.counts[self.tabs[0]]
+        self.head_tab, self.head_row = self.tabs[0], 0
+        return self.older()
+
+    def older(self) -> List[Tuple[str, int, List[str]]]:
+        out: List[Tuple[str, int, List[str]]] = []
+        span = self.page_size
+        while len(out) < self.page_size and not self.exhausted:
+            tab = self.tabs[self._idx]
+            if self._hi < 2:
+                self._idx += 1
+                if self._idx >= len(self.tabs):
+                    self.exhausted = True
+                    break
+                self._hi, span = self.counts[self.tabs[self._idx]], self.page_size
+                if out:
+                    break       # una página no mezcla meses: el anterior queda para el próximo older()
+                continue
+            lo = max(2, self._hi - span + 1)
+            vals = self.api.read_rows(tab, lo, self._hi)
+            if tab == self.head_tab and not self.head_row and vals:
+                self.head_row = lo + len(vals) - 1
+            chunk: List[Tuple[str, int, List[str]]] = []
+            cut = False
+            for i, r in enumerate(vals):
+                if not any(str(c).strip() for c in r):
+                    continue
+                if self._since_ts is not None and tab == LOG_SHEET:
+                    ts = self.parse_ts(r[0] if r else "")
+                    if ts is not None and ts < self._since_ts:
+                        cut = True      # 'logs' no está partido por mes: lo anterior queda afuera
+                        continue
+                chunk.append((tab, lo + i, r))
+            out[:0] = chunk
+            self._hi = lo - 1
+            if cut:
+                self.exhausted = True
+            # ventana vacía (grilla sobrante): la próxima, más grande
+            span = self.page_size if chunk else min(span * 4, 20_000)
+        if self.tabs and self._hi < 2 and self._idx >= len(self.tabs) - 1:
+            self.exhausted = True
+        return out
+
+    def newer(self) -> List[Tuple[str, int, List[str]]]:
+        if not self.tabs or self.until is not None:
+            return []
+        out: List[Tuple[str, int, List[str]]] = []
+        current = partition_for()
+        if current != self.head_tab and current not in self.counts:
+            # cambió el mes: lo que quedara en la partición anterior y la nueva
+            counts = self.api.row_counts()
+            if current in counts:
+                out.extend(self._read_below(self.head_tab, self.head_row))
+                self.tabs.insert(0, current)
+                self._idx += 1
+                self.counts[current] = counts[current]
+                self.head_tab, self.head_row = current, 1
+        out.extend(self._read_below(self.head_tab, self.head_row))
+        return out
+
+    def _read_below(self, tab: str, row: int) -> List[Tuple[str, int, List[str]]]:
+        first = max(2, row + 1)
+        vals = self.api.read_rows(tab, first)
+        if vals and tab == self.head_tab:
+            self.head_row = first + len(vals) - 1
+        return [(tab, first + i, r) for i, r in enumerate(vals) if any(str(c).strip() for c in r)]
+
+
+# ------------------ cola de logs por spreadsheet ------------------
+def _ambiguous(ex: Exception) -> bool:
+    """El append falló pero pudo haberse aplicado (5xx, timeout, corte de red)."""
+    st = http_status(ex)
+    if st is None:
+        # errores de transporte (ConnectionError / timeout); uno nuestro no llegó a salir
+        return isinstance(ex, OSError)
+    return st >= 500 or st == 408
+
+
+def _rejected(ex: Exception) -> bool:
+    """4xx que reintentar no arregla (408 y 429 se siguen reintentando)."""
+    st = http_status(ex)
+    return st is not None and 400 <= st < 500 and st not in (408, 429)
+
+
+def _contains_run(haystack: List[List[str]], needle: List[List[str]]) -> bool:
+    if not needle:
+        return False
+    key = lambda r: tuple(str(c).strip() for c in (list(r) + ["", "", ""])[:3])
+    hay = [key(r) for r in haystack]
+    want = [key(r[1:]) for r in needle]
+    n = len(want)
+    return any(hay[i:i + n] == want for i in range(len(hay) - n + 1))
+
+
+class _LogBuffer:
+    """
+    Filas de log pendientes de un spreadsheet y un usuario + hilo que las manda en lotes.
+    Hay una cola por (spreadsheet, identidad): cada usuario escribe sus filas con sus
+    propias credenciales, y el logout vacía la suya antes de soltarlas.
+
+    Se manda cuando hay FLUSH_ROWS filas o cuando la más vieja esperó FLUSH_SECONDS.
+    Cada entrada es (pestaña, fila): un lote son las filas seguidas de la misma pestaña
+    (al cambiar de mes el lote se corta y la partición nueva se crea antes de escribir).
+    Las filas salen de la cola recién cuando el append respondió OK: si falla quedan y se
+    reintenta con backoff. Si el fallo fue ambiguo (5xx / red), antes del reintento se
+    leen las filas de logs escritas después del último append confirmado; si el lote ya
+    está ahí, no se vuelve a mandar (y sale de la cola aunque falle lo que sigue).
+    Un rechazo definitivo (4xx que no sea 408/429: credenciales revocadas, rango inválido)
+    no se arregla reintentando: tras MAX_REJECTS seguidos el lote se descarta y se avisa.
+    """
+
+    def __init__(self, sheet_id: str, user: str = ""):
+        self.sheet_id = sheet_id
+        self.user = user
+        self.rows: deque = deque()
+        self.writer: Optional[LogAPI] = None
+        self.cond = threading.Condition()
+        self.send_lock = threading.Lock()     # un solo lote en vuelo (hilo o flush explícito)
+        self.thread: Optional[threading.Thread] = None
+        self.oldest = 0.0                     # time.monotonic() de la fila más vieja en cola
+        self.retry_at = 0.0
+        self.failures = 0
+        self.rejects = 0                      # 4xx seguidos sobre el lote de la cabeza
+        self.unsure = 0                       # filas del último lote que pudo haberse escrito
+        self.end_row: Dict[str, int] = {}     # pestaña -> última fila confirmada por un append
+        self.ensured: set = set()
+        self.stats = {"queued": 0, "sent": 0, "batches": 0, "failures": 0, "deduped": 0,
+                      "dropped": 0}
+
+    def put(self, writer: LogAPI, tab: str, row: List[str]):
+        with self.cond:
+            self.writer = writer              # la instancia más nueva del usuario (token vigente)
+            if not self.rows:
+                self.oldest = time.monotonic()
+            self.rows.append((tab, row))
+            self.stats["queued"] += 1
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name=f"logs-{self.sheet_id[:8]}",
+                                               daemon=True)
+                self.thread.start()
+            if len(self.rows) == 1 or len(self.rows) >= FLUSH_ROWS:
+                self.cond.notify()
+
+    def pending(self) -> int:
+        with self.cond:
+            return len(self.rows)
+
+    # --------- hilo ----------
+    def _due(self) -> float:
+        """Segundos hasta el próximo envío (0 = ya)."""
+        if not self.rows:
+            return FLUSH_SECONDS
+        now = time.monotonic()
+        if now < self.retry_at:
+            return self.retry_at - now
+        if len(self.rows) >= FLUSH_ROWS:
+            return 0.0
+        return max(0.0, self.oldest + FLUSH_SECONDS - now)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                wait = self._due()
+                while wait > 0:
+                    self.cond.wait(wait)
+                    wait = self._due()
+            self.flush_once()
+
+    # --------- envío ----------
+    def flush_once(self) -> bool:
+        """Manda un lote. True si la cola quedó vacía."""
+        with self.send_lock:
+            with self.cond:
+                writer = self.writer
+                tab = self.rows[0][0] if self.rows else ""
+                batch: List[List[str]] = []
+                for t, row in self.rows:
+                    if t != tab or len(batch) >= MAX_BATCH:
+                        break
+                    batch.append(row)
+            if not batch or writer is None:
+                return True
+            try:
+                if tab not in self.ensured and writer._ensure_logs_sheet(tab):
+                    self.ensured.add(tab)
+                if self.unsure:
+                    done = self.unsure
+                    if not _contains_run(writer._tail(self.end_row.get(tab, 0), tab), batch[:done]):
+                        done = 0
+                    self.unsure = 0
+                    if done:
+                        # ya escritas: salen de la cola ya, así un fallo del append de abajo
+                        # no las vuelve a meter en el próximo intento
+                        self.stats["deduped"] += done
+                        self._confirm(done)
+                        batch = batch[done:]
+                if batch:
+                    end = writer._append_rows(batch, tab)
+                    if end:
+                        self.end_row[tab] = end
+                    self.stats["batches"] += 1
+                    self.stats["sent"] += len(batch)
+            except Exception as e:
+                self.failures += 1
+                self.stats["failures"] += 1
+                if _ambiguous(e) and not self.unsure:
+                    self.unsure = len(batch)
+                if not _ambiguous(e):
+                    self.ensured.discard(tab)  # p. ej. borraron la pestaña: se vuelve a asegurar
+                    writer._ensured.discard(tab)
+                if _rejected(e):
+                    self.rejects += 1
+                    if self.rejects >= MAX_REJECTS:
+                        self._drop(len(batch), e)
+                        with self.cond:
+                            return not self.rows
+                else:
+                    self.rejects = 0
+                self.retry_at = time.monotonic() + min(RETRY_CAP, 2 ** self.failures)
+                print("[WARN][logs] No se pudo insertar el lote de logs (se reintenta):", e)
+                return False
+
+            self._confirm(len(batch))
+            with self.cond:
+                self.failures = 0
+                self.rejects = 0
+                self.retry_at = 0.0
+                return not self.rows
+
+    def _drop(self, n: int, ex: Exception):
+        """Descarta las primeras n filas tras un rechazo definitivo (ya no se reintentan)."""
+        print(f"[ERROR][logs] Se descartan {n} filas de log de {self.user or '?'} "
+              f"tras {self.rejects} rechazos seguidos:", ex)
+        self.stats["dropped"] += n
+        self._confirm(n)
+        self.unsure = 0
+        self.failures = 0
+        self.rejects = 0
+        self.retry_at = 0.0
+
+    def _confirm(self, n: int):
+        """Las primeras n filas de la cola ya están en la hoja."""
+        with self.cond:
+            for _ in range(n):
+                self.rows.popleft()
+            if self.rows:
+                self.oldest = time.monotonic()
+
+    def flush(self, timeout: float) -> bool:
+        """Vacía la cola desde el hilo llamador (ignora el backoff). False si no llegó."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            if self.flush_once():
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+
+
+_BUFFERS: Dict[Tuple[str, str], _LogBuffer] = {}     # (sheet_id, identidad) -> cola
+_BUFFERS_LOCK = threading.Lock()
+
+
+def _buffer_for(sheet_id: str, user: str) -> _LogBuffer:
+    with _BUFFERS_LOCK:
+        buf = _BUFFERS.get((sheet_id, user))
+        if buf is None:
+            buf = _BUFFERS[(sheet_id, user)] = _LogBuffer(sheet_id, user)
+        return buf
+
+
+def _buffers(sheet_id: Optional[str], user: Optional[str]) -> List[_LogBuffer]:
+    with _BUFFERS_LOCK:
+        return [b for (sid, u), b in _BUFFERS.items()
+                if (sheet_id is None or sid == sheet_id) and (user is None or u == user)]
+
+
+def flush_logs(sheet_id: Optional[str] = None, timeout: float = 10.0,
+               user: Optional[str] = None) -> bool:
+    """
+    Manda lo encolado (de un spreadsheet y/o de una identidad, o de todos).
+    True si no quedó nada pendiente.
+    """
+    bufs = _buffers(sheet_id, user)
+    ok = True
+    for b in bufs:
+        if b.pending():
+            ok = b.flush(timeout) and ok
+    return ok
+
+
+def pending_logs(sheet_id: Optional[str] = None, user: Optional[str] = None) -> int:
+    return sum(b.pending() for b in _buffers(sheet_id, user))
+
+
+def configure_log_buffer(flush_rows: Optional[int] = None, flush_seconds: Optional[float] = None):
+    """Ajusta los umbrales de envío (los hilos los toman en su próxima espera)."""
+    global FLUSH_ROWS, FLUSH_SECONDS
+    if flush_rows is not None:
+        FLUSH_ROWS = max(1, int(flush_rows))
+    if flush_seconds is not None:
+        FLUSH_SECONDS = max(0.0, float(flush_seconds))
+    with _BUFFERS_LOCK:
+        bufs = list(_BUFFERS.values())
+    for b in bufs:
+        with b.cond:
+            b.cond.notify()
+
+
+atexit.register(flush_logs, None, 5.0)
+
 
 # ------------------ formateadores opcionales ------------------
 def fmt_stock_add(cantidad: int | str, producto: str, deposito: str) -> str:
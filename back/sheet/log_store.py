@@ -0,0 +1,267 @@
+# back/sheet/log_store.py
+"""
+Logs decodificados una sola vez, para el visor.
+
+Cada fila [fecha, ID_usuario, Accion] se convierte en un LogEntry con el timestamp ya
+parseado (epoch) y el texto en minúsculas para buscar. El store mantiene las entradas
+ordenadas por (timestamp, orden de escritura):
+  - filtro por rango de fechas  -> dos bisect sobre la lista de timestamps
+  - ordenar por fecha           -> recorrer el índice hacia adelante o hacia atrás
+Las páginas llegan de a poco (LogPager): las más viejas se agregan con older=True.
+
+Búsqueda: índice invertido token -> entradas sobre acción y responsable, armado a medida
+que se cargan filas. Los tokens se pliegan (minúsculas y sin tildes: "Descargó" y
+"descargo" son lo mismo). search() hace AND entre términos, el último por prefijo
+(para buscar mientras se escribe), y filtra por responsable y rango de fechas.
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import itertools
+import operator
+import re
+import time
+import unicodedata
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Formatos de la columna fecha anteriores al ISO (se prueban sólo si fromisoformat falla)
+LEGACY_FORMATS = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y")
+DISPLAY_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+_TOKEN_RE = re.compile(r"\w+")
+_ORDER = operator.attrgetter("ts", "seq")
+
+
+def _strip_marks(s: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
+
+
+# Letras latinas con tilde -> sin tilde (cubre el español; el resto cae en NFKD)
+_FOLD_TABLE = {cp: _strip_marks(chr(cp)) for cp in range(0xC0, 0x250)
+               if chr(cp).isalpha() and _strip_marks(chr(cp)).isascii()}
+
+
+def fold(s: str) -> str:
+    """Minúsculas y sin tildes/diéresis ("Descargó" -> "descargo", "Ñandú" -> "nandu")."""
+    s = (s or "").lower()
+    if s.isascii():
+        return s
+    s = s.translate(_FOLD_TABLE)
+    return s if s.isascii() else _strip_marks(s)
+
+
+def tokens(s: str) -> List[str]:
+    return _TOKEN_RE.findall(fold(s))
+
+
+def parse_ts(s: str) -> Optional[float]:
+    """Epoch de la columna fecha: ISO 8601 (lo que escribe LogAPI) o los formatos viejos."""
+    s = (s or "").strip()
+    if not s:
+        return None
+    try:
+        return datetime.fromisoformat(s).timestamp()
+    except ValueError:
+        pass
+    for fmt in LEGACY_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+class LogEntry:
+    __slots__ = ("seq", "ts", "fecha", "user", "action", "user_key", "action_key")
+
+    def __init__(self, seq: int, ts: Optional[float], fecha: str, user: str, action: str):
+        self.seq = seq              # orden de escritura (para desempatar a igual timestamp)
+        self.ts = ts                # None si la fecha no se pudo leer
+        self.fecha = fecha
+        self.user = user
+        self.action = action
+        self.user_key = fold(user)
+        self.action_key = fold(action)
+
+    @property
+    def display_date(self) -> str:
+        if self.ts is None:
+            return self.fecha
+        return time.strftime(DISPLAY_FORMAT, time.localtime(self.ts))
+
+    def __repr__(self):
+        return f"LogEntry({self.fecha!r}, {self.user!r}, {self.action[:30]!r})"
+
+
+class LogStore:
+    def __init__(self):
+        self._ts: List[float] = []            # timestamps ordenados (para bisect)
+        self._sorted: List[LogEntry] = []     # entradas en el mismo orden que _ts
+        self._undated: List[LogEntry] = []    # fechas ilegibles: van al final
+        self._new = itertools.count(1)        # seq de lo que llega al final
+        self._old = itertools.count(-1, -1)   # seq de lo que llega de páginas anteriores
+        self._postings: Dict[str, Set[LogEntry]] = {}   # token -> entradas (acción + responsable)
+        self._users: Dict[str, Set[LogEntry]] = {}      # responsable plegado -> entradas
+        self._user_names: Dict[str, str] = {}           # responsable plegado -> como se escribió
+        self._vocab: List[str] = []           # tokens ordenados, para buscar por prefijo
+        self._vocab_dirty = False
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._undated)
+
+    def clear(self):
+        self._ts.clear()
+        self._sorted.clear()
+        self._undated.clear()
+        self._postings.clear()
+        self._users.clear()
+        self._user_names.clear()
+        self._vocab.clear()
+        self._vocab_dirty = False
+
+    # --------- carga ----------
+    def add(self, rows: Iterable[Sequence[str]], older: bool = False) -> List[LogEntry]:
+        """
+        Decodifica filas [fecha, ID_usuario, Accion] (en orden de escritura) y las indexa.
+        older=True: la página es anterior a todo lo cargado.
+        """
+        rows = [r for r in rows if any(str(c).strip() for c in r)]
+        if older:
+            seqs = sorted((next(self._old) for _ in rows))
+        else:
+            seqs = [next(self._new) for _ in rows]
+        fresh: List[LogEntry] = []
+        for seq, r in zip(seqs, rows):
+            fecha = str(r[0]).strip() if len(r) > 0 else ""
+            e = LogEntry(seq, parse_ts(fecha), fecha,
+                         str(r[1]).strip() if len(r) > 1 else "",
+                         str(r[2]).strip() if len(r) > 2 else "")
+            (self._undated if e.ts is None else fresh).append(e)
+            self._index(e)
+        self._insert(fresh)
+        return fresh
+
+    def _insert(self, fresh: List[LogEntry]):
+        if not fresh:
+            return
+        key = _ORDER
+        fresh.sort(key=key)
+        if not self._sorted or key(fresh[0]) >= key(self._sorted[-1]):
+            self._sorted.extend(fresh)
+            self._ts.extend(e.ts for e in fresh)
+        elif key(fresh[-1]) <= key(self._sorted[0]):
+            self._sorted[:0] = fresh
+            self._ts[:0] = [e.ts for e in fresh]
+        else:
+            self._sorted = list(heapq.merge(self._sorted, fresh, key=key))
+            self._ts = [e.ts for e in self._sorted]
+
+    def _index(self, e: LogEntry):
+        for tok in set(_TOKEN_RE.findall(e.action_key + " " + e.user_key)):
+            bucket = self._postings.get(tok)
+            if bucket is None:
+                bucket = self._postings[tok] = set()
+                self._vocab_dirty = True
+            bucket.add(e)
+        if e.user_key:
+            self._users.setdefault(e.user_key, set()).add(e)
+            self._user_names.setdefault(e.user_key, e.user)
+
+    # --------- consultas ----------
+    def bounds(self, since: Optional[float] = None, until: Optional[float] = None) -> Tuple[int, int]:
+        """Posiciones [i, j) del índice con since <= ts <= until."""
+        i = bisect.bisect_left(self._ts, since) if since is not None else 0
+        j = bisect.bisect_right(self._ts, until) if until is not None else len(self._ts)
+        return i, max(i, j)
+
+    def query(
+        self,
+        *,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        desc: bool = True,
+        where: Optional[Callable[[LogEntry], bool]] = None,
+    ) -> List[LogEntry]:
+        """Entradas del rango ordenadas por fecha (las sin fecha al final, sólo sin rango)."""
+        i, j = self.bounds(since, until)
+        span = self._sorted[i:j]
+        if desc:
+            span.reverse()
+        if since is None and until is None:
+            span.extend(self._undated)
+        if where is not None:
+            span = [e for e in span if where(e)]
+        return span
+
+    def by_user(self, entries: List[LogEntry], desc: bool = False) -> List[LogEntry]:
+        """Orden por responsable (estable: dentro de cada uno queda el orden recibido)."""
+        return sorted(entries, key=lambda e: e.user_key, reverse=desc)
+
+    def users(self) -> List[str]:
+        """Responsables cargados (como aparecen en la hoja), en orden alfabético."""
+        return sorted(self._user_names.values(), key=fold)
+
+    def _prefixed(self, prefix: str) -> List[Set[LogEntry]]:
+        """Listas de entradas de cada token que empieza con `prefix`."""
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        i = bisect.bisect_left(self._vocab, prefix)
+        j = bisect.bisect_left(self._vocab, prefix + "\uffff")
+        return [self._postings[tok] for tok in self._vocab[i:j]]
+
+    def search(
+        self,
+        text: str = "",
+        *,
+        user: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        desc: bool = True,
+    ) -> List[LogEntry]:
+        """
+        Entradas que tienen todos los términos de `text` (el último como prefijo), del
+        responsable `user` y dentro del rango, de la más reciente a la más vieja (desc).
+        """
+        terms = tokens(text)
+        if not terms and not user:
+            return self.query(since=since, until=until, desc=desc)
+
+        sets: List[Set[LogEntry]] = [self._postings.get(t, set()) for t in terms[:-1]]
+        if user:
+            sets.append(self._users.get(fold(user), set()))
+        sets.sort(key=len)
+        hits: Optional[Set[LogEntry]] = None
+        if sets:
+            if not sets[0]:
+                return []
+            hits = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+        if terms:
+            last = terms[-1]
+            parts = self._prefixed(last)
+            if hits is not None and len(hits) < sum(len(p) for p in parts):
+                # pocos candidatos: se revisan sus tokens en vez de unir listas grandes
+                hits = {e for e in hits
+                        if any(t.startswith(last) for t in _TOKEN_RE.findall(e.action_key + " " + e.user_key))}
+            else:
+                union = parts[0] if len(parts) == 1 else set().union(*parts)
+                hits = union if hits is None else union & hits
+        if not hits:
+            return []
+
+        i, j = self.bounds(since, until)
+        if len(hits) * 4 > j - i:
+            # muchos resultados: sale más barato recorrer el índice (ya ordenado)
+            out = [e for e in self._sorted[i:j] if e in hits]
+            if desc:
+                out.reverse()
+        else:
+            lo = self._ts[i] if i < j else None
+            hi = self._ts[j - 1] if i < j else None
+            out = [e for e in hits if e.ts is not None and lo is not None and lo <= e.ts <= hi]
+            out.sort(key=_ORDER, reverse=desc)
+        if since is None and until is None:
+            out.extend(e for e in self._undated if e in hits)
+        return out
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import List, Dict
+from typing import List, Dict, Optional
 from uuid import uuid4
 from .base import SheetsBase
 
@@ -20,7 +20,11 @@ class LogsAcnAPI(SheetsBase):
     def list(self) -> List[Dict]:
         self._ensure_tab_and_headers(self.TAB, self.HEADERS)
         rng = f"{self.TAB}!A2:{self._col_letter(len(self.HEADERS))}"
-        rows = self._get(rng)
+        return self._decode(self._get(rng))
+
+    def _decode(self, rows: List[List[str]], headers: Optional[List[str]] = None) -> List[Dict]:
+        """Filas crudas (desde la fila 2) -> dicts; de paso rearma el índice RecID -> fila."""
+        self._index_rows(self.TAB, rows)
 
         out = []
         for r in rows:
@@ -40,11 +44,11 @@ class LogsAcnAPI(SheetsBase):
 
     def delete_by_recid(self, recid: str) -> bool:
         self._ensure_tab_and_headers(self.TAB, self.HEADERS)
-        row = self._find_row_by_col_value(self.TAB, 2, recid)  # columna B=RecID
+        row, _cur = self._read_row_by_recid(self.TAB, recid, len(self.HEADERS))  # columna B=RecID
         if not row:
             return False
         rng = f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
-        self._clear(rng)
+        self._clear(rng)     # en el lugar, sin correr filas (ver DepositoAPI.delete_by_recid)
         return True
     def add(
         self,
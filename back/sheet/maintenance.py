@@ -0,0 +1,237 @@
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .base import SheetsBase
+from .stock_api import StockAPI
+from .logsAcn_api import LogsAcnAPI
+from .scheduler import BACKGROUND
+
+
+class SheetMaintenance(SheetsBase):
+    """
+    Tareas de mantenimiento sobre un spreadsheet.
+
+    compact(): las bajas (delete_by_recid vacía la fila con values.clear) dejan filas vacías
+    en el medio de las pestañas, que cada list() / búsqueda vuelve a bajar y saltear. Se leen todas las
+    pestañas en un batchGet y se borran las filas vacías de todas en UN solo
+    spreadsheets.batchUpdate (deleteDimension, de abajo hacia arriba). Después se corrigen
+    los índices RecID -> fila que haya en memoria.
+
+    Conviene correrlo cuando nadie está editando: si otra sesión inserta o borra filas
+    entre la lectura y el batchUpdate, los números de fila ya no coinciden.
+    """
+
+    @staticmethod
+    def _quoted(tab: str) -> str:
+        return "'" + tab.replace("'", "''") + "'"
+
+    def find_holes(self, tabs: Optional[Iterable[str]] = None) -> Dict[str, List[int]]:
+        """{pestaña: [filas 1-based completamente vacías, debajo de los encabezados]}"""
+        props = self._tab_props(refresh=True)
+        names = [t for t in (tabs or props.keys()) if t in props]
+        if not names:
+            return {}
+        blocks = self._batch_get([self._quoted(t) for t in names])
+        out: Dict[str, List[int]] = {}
+        for tab, rows in zip(names, blocks):
+            # values.get no devuelve las filas vacías del final: sólo quedan los huecos
+            holes = [i for i, r in enumerate(rows, start=1)
+                     if i > 1 and not any(str(c).strip() for c in (r or []))]
+            if holes:
+                out[tab] = holes
+        return out
+
+    def compact(self, tabs: Optional[Iterable[str]] = None, dry_run: bool = False) -> Dict[str, int]:
+        """Borra los huecos de las pestañas. Devuelve {pestaña: filas borradas}."""
+        holes = self.find_holes(tabs)
+        if dry_run or not holes:
+            return {t: len(rows) for t, rows in holes.items()}
+
+        requests: List[Dict] = []
+        for tab, rows in holes.items():
+            requests.extend(self._delete_dimension_requests(tab, rows))
+        try:
+            self._batch_update(requests, tabs=holes.keys())
+        except Exception:
+            for tab in holes:
+                self._drop_index(tab)
+            raise
+        for tab, rows in holes.items():
+            self._index_after_delete(tab, rows)
+        return {t: len(rows) for t, rows in holes.items()}
+
+
+def compact_spreadsheet(page, sheet_id: str, tabs: Optional[Iterable[str]] = None,
+                        dry_run: bool = False) -> Dict[str, int]:
+    return SheetMaintenance(page, sheet_id).compact(tabs, dry_run=dry_run)
+
+
+class StockMaintenance(StockAPI):
+    """
+    Limpieza de la pestaña stock (corre por el carril de fondo del scheduler).
+
+    descargar / move_add_row dejan filas en cantidad 0, y altas concurrentes pueden dejar
+    dos filas para el mismo (ID_producto, ID_deposito). collect():
+      1. Lee stock y logsAcn en un batchGet.
+      2. Duplicados: la cantidad se suma en una sola fila (la referenciada por logsAcn si
+         la hay, si no la primera) y las demás se borran.
+      3. Filas en 0 (y filas vacías) se borran.
+      4. Todo va en UN spreadsheets.batchUpdate: primero los updateCells con las cantidades
+         sumadas y después los deleteDimension de abajo hacia arriba.
+    No se borran filas referenciadas por logsAcn: si su RecID aparece en un pendiente
+    quedan (en 0 si eran duplicadas), y el último par producto/depósito de un pendiente
+    se conserva aunque esté en 0.
+
+    Antes de escribir se vuelven a leer las filas afectadas: si alguna cambió desde la
+    lectura (otra sesión escribió) no se aplica nada. Eso achica la ventana pero no la
+    cierra: Sheets no tiene escrituras condicionales, y un add_qty o una baja entre esa
+    verificación y el batchUpdate se pisa o corre las filas. Por eso no corre sola: se
+    lanza a mano desde el panel de métricas, con la planilla sin nadie editando.
+    """
+    READ_LANE = BACKGROUND
+    WRITE_LANE = BACKGROUND
+
+    # Hasta cuántas filas afectadas se verifican con rangos sueltos (si no, se relee la pestaña)
+    VERIFY_RANGES_MAX = 200
+
+    @staticmethod
+    def _qty(v) -> Optional[int]:
+        try:
+            return int(str(v).strip() or "0")
+        except (TypeError, ValueError):
+            return None
+
+    def _references(self, stock_rows: List[List[str]],
+                    logs_rows: List[List[str]]) -> Tuple[Set[str], Set[Tuple[str, str]]]:
+        """(RecIDs de stock que aparecen en logsAcn, pares producto/depósito con pendientes)."""
+        recids = {str(r[1]).strip() for r in stock_rows if len(r) > 1 and str(r[1]).strip()}
+        width = len(LogsAcnAPI.HEADERS)
+        cited: Set[str] = set()
+        pairs: Set[Tuple[str, str]] = set()
+        for raw in logs_rows:
+            r = [str(c).strip() for c in (list(raw) + [""] * width)[:width]]
+            if not r[1]:
+                continue
+            pairs.add((r[2], r[3]))
+            cited.update(c for c in r if c in recids)
+        return cited, pairs
+
+    def plan(self) -> Dict:
+        """Qué haría collect(): filas a reescribir ({fila: cantidad}) y filas a borrar."""
+        self._ensure()
+        width = self._col_letter(len(self.HEADERS))
+        stock_rows, logs_rows = self._batch_get([
+            f"{self.TAB}!A2:{width}",
+            f"{LogsAcnAPI.TAB}!A2:{self._col_letter(len(LogsAcnAPI.HEADERS))}",
+        ])
+        cited, pairs = self._references(stock_rows, logs_rows)
+
+        groups: Dict[Tuple[str, str], List[Tuple[int, str, int]]] = {}
+        deletes: List[int] = []
+        snapshot: Dict[int, List[str]] = {}
+        for i, raw in enumerate(stock_rows, start=2):
+            r = [str(c).strip() for c in (list(raw) + [""] * 5)[:5]]
+            if not any(r):
+                deletes.append(i)        # hueco: ya que se borra, se borra junto
+                snapshot[i] = r
+                continue
+            qty = self._qty(r[4])
+            if not (r[1] and r[2] and r[3]) or qty is None:
+                continue                  # fila incompleta o cantidad no numérica: no se toca
+            groups.setdefault((r[2], r[3]), []).append((i, r[1], qty))
+            snapshot[i] = r
+
+        updates: Dict[int, int] = {}
+        merged: Dict[str, str] = {}       # RecID borrado -> RecID que se queda con su cantidad
+        kept = 0
+        for pair, rows in groups.items():
+            keep = next((x for x in rows if x[1] in cited), rows[0])
+            total = sum(q for _, _, q in rows)
+            for row, recid, _q in rows:
+                if row == keep[0]:
+                    continue
+                if recid in cited:
+                    kept += 1
+                    if _q:
+                        updates[row] = 0  # citada en logsAcn: queda en 0, su cantidad pasa a `keep`
+                else:
+                    deletes.append(row)
+                    merged[recid] = keep[1]
+            if total != keep[2]:
+                updates[keep[0]] = total
+            if total == 0:
+                if keep[1] in cited or pair in pairs:
+                    kept += 1
+                else:
+                    deletes.append(keep[0])
+                    updates.pop(keep[0], None)
+        return {
+            "updates": updates,
+            "deletes": sorted(set(deletes)),
+            "merged": merged,
+            "kept": kept,
+            "snapshot": {i: snapshot[i] for i in set(deletes) | set(updates)},
+            "rows": len(stock_rows),
+        }
+
+    def _unchanged(self, snapshot: Dict[int, List[str]]) -> bool:
+        if not snapshot:
+            return True
+        width = self._col_letter(len(self.HEADERS))
+        rows = sorted(snapshot)
+        if len(rows) <= self.VERIFY_RANGES_MAX:
+            blocks = self._batch_get([f"{self.TAB}!A{r}:{width}{r}" for r in rows])
+            current = {r: (b[0] if b else []) for r, b in zip(rows, blocks)}
+        else:
+            all_rows = self._get(f"{self.TAB}!A2:{width}")
+            current = {r: (all_rows[r - 2] if r - 2 < len(all_rows) else []) for r in rows}
+        for r in rows:
+            cur = [str(c).strip() for c in (list(current[r]) + [""] * 5)[:5]]
+            if cur != snapshot[r]:
+                return False
+        return True
+
+    def collect(self, dry_run: bool = False) -> Dict[str, int]:
+        """Aplica el plan. Devuelve contadores (rows_before, merged, deleted, updated, kept, skipped)."""
+        p = self.plan()
+        res = {
+            "rows_before": p["rows"],
+            "merged": len(p["merged"]),
+            "deleted": len(p["deletes"]),
+            "updated": len(p["updates"]),
+            "kept": p["kept"],
+            "skipped": 0,
+        }
+        if dry_run or not (p["updates"] or p["deletes"]):
+            return res
+        if not self._unchanged(p["snapshot"]):
+            # otra sesión tocó alguna fila entre la lectura y ahora: se deja para la próxima
+            res.update(merged=0, deleted=0, updated=0, skipped=1)
+            return res
+
+        gid = self._sheet_gid(self.TAB)
+        qty_col = self.HEADERS.index("cantidad")
+        requests: List[Dict] = [{"updateCells": {
+            "start": {"sheetId": gid, "rowIndex": row - 1, "columnIndex": qty_col},
+            "rows": [{"values": [{"userEnteredValue": {"numberValue": qty}}]}],
+            "fields": "userEnteredValue",
+        }} for row, qty in sorted(p["updates"].items())]
+        requests.extend(self._delete_dimension_requests(self.TAB, p["deletes"]))
+        try:
+            self._batch_update(requests, tabs=(self.TAB,))
+        except Exception:
+            self._drop_index(self.TAB)
+            self._pair_index.pop(self.sheet_id, None)
+            raise
+
+        gone = {p["snapshot"][r][1]: p["snapshot"][r] for r in p["deletes"] if p["snapshot"][r][1]}
+        self._index_after_delete(self.TAB, p["deletes"])
+        for recid in gone:
+            self._pair_forget(recid)
+        for recid, keep in p["merged"].items():
+            self._pair_put(keep, gone[recid][2], gone[recid][3])
+        return res
+
+
+def collect_stock_garbage(page, sheet_id: str, dry_run: bool = False) -> Dict[str, int]:
+    return StockMaintenance(page, sheet_id).collect(dry_run=dry_run)
@@ -39,8 +39,8 @@ class ProductoAPI(SheetsBase):
         "ID_Imagen",
     ]
 
-    def __init__(self, page, sheet_id: Optional[str] = None):
-        super().__init__(page, sheet_id)
+    def __init__(self, page, sheet_id: Optional[str] = None, svc=None):
+        super().__init__(page, sheet_id, svc=svc)
         self._img_hdr: Optional[str] = None  # nombre EXACTO detectado en la hoja
 
     # ---------- internos: headers / detección de imagen ----------
@@ -92,7 +92,20 @@ class ProductoAPI(SheetsBase):
         headers = self._read_or_bootstrap_headers()
         # Rango hasta la última columna realmente presente en la hoja
         rng = f"{self.TAB}!A2:{self._col_letter(len(headers))}"
-        rows = self._get(rng) or []
+        return self._decode(self._get(rng) or [], headers)
+
+    def _decode(self, rows: List[List[str]], headers: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Filas crudas (desde la fila 2) -> dicts normalizados, usando los headers reales.
+        De paso rearma el índice RecID -> fila.
+        """
+        if headers:
+            self._img_hdr = self._detect_img_header(headers)
+        else:
+            headers = self._read_or_bootstrap_headers()
+        recid_col = self._col_index(headers, "RecID")
+        if recid_col is not None:
+            self._index_rows(self.TAB, rows, recid_col + 1)
 
         out: List[Dict] = []
         for r in rows:
@@ -185,13 +198,11 @@ class ProductoAPI(SheetsBase):
             return False
 
         # Buscar fila por RecID (columna B si el orden es estándar, pero mejor por índice detectado)
-        row_idx = self._find_row_by_col_value(self.TAB, recid_col + 1, recid)  # +1 porque API usa 1-based
+        row_idx, cur = self._read_row_by_recid(self.TAB, recid, len(headers), recid_col + 1)  # +1 porque API usa 1-based
         if not row_idx:
             return False
 
         rng = f"{self.TAB}!A{row_idx}:{self._col_letter(len(headers))}{row_idx}"
-        cur = (self._get(rng) or [[]])[0]
-        cur += [""] * (len(headers) - len(cur))
 
         # Helper para asignar por nombre de columna real
         def set_if(col: str, value: Optional[str]):
@@ -225,10 +236,10 @@ class ProductoAPI(SheetsBase):
         if recid_col is None:
             return False
 
-        row_idx = self._find_row_by_col_value(self.TAB, recid_col + 1, recid)
+        row_idx, _cur = self._read_row_by_recid(self.TAB, recid, len(headers), recid_col + 1)
         if not row_idx:
             return False
 
         rng = f"{self.TAB}!A{row_idx}:{self._col_letter(len(headers))}{row_idx}"
-        self._clear(rng)
+        self._clear(rng)     # en el lugar, sin correr filas (ver DepositoAPI.delete_by_recid)
         return True
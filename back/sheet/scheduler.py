@@ -0,0 +1,242 @@
+"""
+Planificador de requests a Google Sheets.
+
+Sheets limita lecturas y escrituras por minuto (por usuario y por proyecto). Todo
+execute() de SheetsBase / LogAPI pasa por acá:
+  - Token buckets por spreadsheet y por usuario (separados para lectura y escritura).
+  - Carriles de prioridad: cuando hay que esperar tokens, las lecturas de la UI pasan
+    antes que las escrituras normales, y éstas antes que lo de fondo (logs, imágenes).
+  - Reintento con backoff exponencial + jitter ante 429 / 5xx / errores de red.
+  - Contadores (profundidad de cola, esperas, reintentos) para monitoreo: stats().
+
+Límites por entorno (requests por minuto): SHEETS_RPM_READ, SHEETS_RPM_WRITE.
+"""
+from __future__ import annotations
+
+import itertools
+import os
+import random
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+from back.integrations.api_metrics import request_context
+
+# Carriles (menor número = más prioridad)
+INTERACTIVE = 0   # lecturas de la UI
+WRITE = 1         # escrituras de stock / ABM
+BACKGROUND = 2    # logs, búsqueda de links de imágenes
+
+LANE_NAMES = {INTERACTIVE: "interactive", WRITE: "write", BACKGROUND: "background"}
+
+READ, WRITE_KIND = "read", "write"
+
+RPM_READ = float(os.getenv("SHEETS_RPM_READ", "60"))
+RPM_WRITE = float(os.getenv("SHEETS_RPM_WRITE", "60"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5   # segundos
+BACKOFF_CAP = 32.0
+
+
+def http_status(ex: Exception) -> Optional[int]:
+    if isinstance(ex, HttpError):
+        try:
+            return int(getattr(ex.resp, "status", 0) or 0)
+        except Exception:
+            return None
+    return None
+
+
+def is_retryable(ex: Exception) -> bool:
+    st = http_status(ex)
+    if st is not None:
+        return st in RETRY_STATUSES
+    return isinstance(ex, (ConnectionError, socket.timeout, TimeoutError))
+
+
+class TokenBucket:
+    """capacity tokens, se recargan a `rate` por segundo. No es thread-safe (lo protege el scheduler)."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.stamp:
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def wait_time(self, now: float) -> float:
+        """Segundos hasta que haya 1 token (0 si ya hay)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def drain(self, now: float):
+        """Tras un 429: se vacía el bucket para que el resto también frene."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _Ticket:
+    __slots__ = ("lane", "seq", "keys")
+
+    def __init__(self, lane: int, seq: int, keys: Tuple[Tuple, ...]):
+        self.lane = lane
+        self.seq = seq
+        self.keys = keys
+
+    def before(self, other: "_Ticket") -> bool:
+        return (self.lane, self.seq) < (other.lane, other.seq)
+
+
+class RequestScheduler:
+    def __init__(self, rpm_read: float = RPM_READ, rpm_write: float = RPM_WRITE,
+                 max_retries: int = MAX_RETRIES, sleep: Callable[[float], None] = time.sleep):
+        self.rpm = {READ: float(rpm_read), WRITE_KIND: float(rpm_write)}
+        self.max_retries = max_retries
+        self._sleep = sleep
+        self._cond = threading.Condition()
+        self._buckets: Dict[Tuple, TokenBucket] = {}
+        self._waiting: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._stats = {
+            lane: {"queued": 0, "requests": 0, "waited": 0, "wait_total": 0.0,
+                   "wait_max": 0.0, "retries": 0, "throttled": 0, "errors": 0}
+            for lane in LANE_NAMES
+        }
+
+    def configure(self, rpm_read: Optional[float] = None, rpm_write: Optional[float] = None,
+                  max_retries: Optional[int] = None):
+        """Cambia límites / reintentos; los buckets se vuelven a crear con los valores nuevos."""
+        with self._cond:
+            if rpm_read:
+                self.rpm[READ] = float(rpm_read)
+            if rpm_write:
+                self.rpm[WRITE_KIND] = float(rpm_write)
+            if max_retries is not None:
+                self.max_retries = int(max_retries)
+            self._buckets.clear()
+            self._cond.notify_all()
+
+    # --------- buckets ----------
+    def _bucket(self, key: Tuple) -> TokenBucket:
+        b = self._buckets.get(key)
+        if b is None:
+            rpm = self.rpm[key[-1]]
+            # capacidad = la cuota de un minuto (la ventana que usa Google)
+            b = self._buckets[key] = TokenBucket(rpm / 60.0, max(1.0, rpm))
+        return b
+
+    @staticmethod
+    def _keys(sheet_id: str, user: str, kind: str) -> Tuple[Tuple, ...]:
+        return (("sheet", sheet_id or "", kind), ("user", user or "", kind))
+
+    # --------- cola ----------
+    def acquire(self, sheet_id: str, user: str, lane: int = INTERACTIVE, kind: str = READ) -> float:
+        """Bloquea hasta tener token en los buckets del spreadsheet y del usuario. Devuelve la espera."""
+        t0 = time.monotonic()
+        ticket = _Ticket(lane, next(self._seq), self._keys(sheet_id, user, kind))
+        st = self._stats[lane]
+        with self._cond:
+            self._waiting.append(ticket)
+            st["queued"] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    # Cede el paso a pedidos de más prioridad (o anteriores) que compiten por
+                    # los mismos buckets
+                    blocked = any(o.before(ticket) and (set(o.keys) & set(ticket.keys))
+                                  for o in self._waiting if o is not ticket)
+                    if not blocked:
+                        wait = max(self._bucket(k).wait_time(now) for k in ticket.keys)
+                        if wait <= 0:
+                            for k in ticket.keys:
+                                self._bucket(k).take(now)
+                            break
+                        self._cond.wait(timeout=wait)
+                    else:
+                        self._cond.wait(timeout=0.5)
+            finally:
+                self._waiting.remove(ticket)
+                st["queued"] -= 1
+                self._cond.notify_all()
+            waited = time.monotonic() - t0
+            st["requests"] += 1
+            if waited > 0.001:
+                st["waited"] += 1
+                st["wait_total"] += waited
+                st["wait_max"] = max(st["wait_max"], waited)
+        return waited
+
+    def _count(self, lane: int, field: str):
+        with self._cond:
+            self._stats[lane][field] += 1
+
+    def _throttled(self, sheet_id: str, user: str, kind: str):
+        now = time.monotonic()
+        with self._cond:
+            for k in self._keys(sheet_id, user, kind):
+                self._bucket(k).drain(now)
+
+    # --------- ejecución ----------
+    def run(self, fn: Callable, *, sheet_id: str, user: str = "",
+            lane: int = INTERACTIVE, kind: str = READ, idempotent: bool = True):
+        """
+        Ejecuta fn() respetando cuota y prioridad; reintenta 429/5xx con backoff + jitter.
+        Si el pedido no es idempotente (append) sólo se reintenta el 429: ahí Google no
+        aplicó nada; un 5xx o un corte pudo haber escrito igual.
+        """
+        attempt = 0
+        while True:
+            self.acquire(sheet_id, user, lane, kind)
+            try:
+                with request_context(sheet_id, attempt):
+                    return fn()
+            except Exception as ex:
+                if http_status(ex) == 429:
+                    self._count(lane, "throttled")
+                    self._throttled(sheet_id, user, kind)
+                retry = is_retryable(ex) if idempotent else http_status(ex) == 429
+                if attempt >= self.max_retries or not retry:
+                    self._count(lane, "errors")
+                    raise
+                attempt += 1
+                self._count(lane, "retries")
+                # full jitter: uniforme entre 0 y el backoff exponencial
+                self._sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt))))
+
+    def execute(self, request, *, sheet_id: str, user: str = "",
+                lane: int = INTERACTIVE, kind: str = READ, idempotent: bool = True):
+        """Atajo para un request de googleapiclient (se re-ejecuta igual en cada reintento)."""
+        return self.run(request.execute, sheet_id=sheet_id, user=user, lane=lane,
+                        kind=kind, idempotent=idempotent)
+
+    # --------- monitoreo ----------
+    def stats(self) -> Dict[str, Dict]:
+        with self._cond:
+            out = {}
+            for lane, s in self._stats.items():
+                d = dict(s)
+                d["wait_avg"] = (s["wait_total"] / s["waited"]) if s["waited"] else 0.0
+                out[LANE_NAMES[lane]] = d
+            return out
+
+    def queue_depth(self) -> Dict[str, int]:
+        with self._cond:
+            return {LANE_NAMES[l]: s["queued"] for l, s in self._stats.items()}
+
+
+SCHEDULER = RequestScheduler()
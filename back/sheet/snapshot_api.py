@@ -0,0 +1,83 @@
+from __future__ import annotations
+from typing import List, Dict, Tuple
+
+from .base import SheetsBase, SCHEMA_CACHE
+from .change_tracker import CHANGE_TRACKER, CACHE
+from .producto_api import ProductoAPI
+from .deposito_api import DepositoAPI
+from .stock_api import StockAPI
+from .logsAcn_api import LogsAcnAPI
+from .imagen_api import ImagenAPI
+
+
+class SnapshotAPI(SheetsBase):
+    """
+    Lee varias pestañas en UN solo spreadsheets.values.batchGet.
+    load() devuelve {pestaña: filas ya decodificadas por la API de esa pestaña}, con las
+    mismas claves que devolvería cada list():
+      producto | deposito | stock | logsAcn | imagen
+    Cada rango se pide desde la fila 1, así los encabezados quedan verificados en el
+    mismo viaje (y se guardan en SCHEMA_CACHE).
+
+    load_cached() consulta antes la versión del archivo en Drive (change_tracker) y sólo
+    lee las pestañas que pudieron cambiar; el resto sale del cache de la sesión.
+    """
+
+    APIS = {
+        ProductoAPI.TAB: ProductoAPI,
+        DepositoAPI.TAB: DepositoAPI,
+        StockAPI.TAB: StockAPI,
+        LogsAcnAPI.TAB: LogsAcnAPI,
+        ImagenAPI.TAB: ImagenAPI,
+    }
+    DEFAULT_TABS: Tuple[str, ...] = ("producto", "deposito", "stock", "logsAcn", "imagen")
+
+    def _api_for(self, tab: str) -> SheetsBase:
+        # Comparten el servicio ya construido: decodificar no cuesta requests extra
+        return self.APIS[tab](self.page, self.sheet_id, svc=self.svc)
+
+    @staticmethod
+    def _ensure_api(api: SheetsBase) -> List[str]:
+        """Crea pestaña/encabezados si faltan y devuelve los encabezados vigentes."""
+        if isinstance(api, ProductoAPI):
+            return api._read_or_bootstrap_headers()
+        api._ensure_tab_and_headers(api.TAB, api.HEADERS)
+        return list(api.HEADERS)
+
+    def _range_for(self, api: SheetsBase) -> str:
+        if isinstance(api, ProductoAPI):
+            # La hoja producto puede tener columnas de más (alias de imagen): hasta la última conocida
+            hdrs = SCHEMA_CACHE.headers(self.sheet_id, api.TAB) or []
+            last = self._col_letter(len(hdrs)) if hdrs else "Z"
+        else:
+            last = self._col_letter(len(api.HEADERS))
+        return f"{api.TAB}!A1:{last}"
+
+    def load(self, tabs: Tuple[str, ...] = DEFAULT_TABS) -> Dict[str, List[Dict]]:
+        apis = {t: self._api_for(t) for t in tabs}
+
+        # Pestañas inexistentes: se crean antes (batchGet falla entero si falta una)
+        existing = self._tab_props()
+        for t, api in apis.items():
+            if t not in existing:
+                self._ensure_api(api)
+
+        blocks = self._batch_get([self._range_for(api) for api in apis.values()])
+
+        out: Dict[str, List[Dict]] = {}
+        for (t, api), rows in zip(apis.items(), blocks):
+            headers = [str(h).strip() for h in (rows[0] if rows else [])]
+            if headers:
+                SCHEMA_CACHE.set_headers(self.sheet_id, t, headers)
+            else:
+                headers = self._ensure_api(api)
+            out[t] = api._decode(rows[1:], headers)
+        return out
+
+    def load_cached(self, tabs: Tuple[str, ...] = DEFAULT_TABS) -> Dict[str, List[Dict]]:
+        plan = CHANGE_TRACKER.check(self.page, self.sheet_id, tabs)
+        if plan.mode != CACHE and plan.fetch:
+            CHANGE_TRACKER.commit(self.sheet_id, plan, self.load(plan.fetch))
+        else:
+            CHANGE_TRACKER.commit(self.sheet_id, plan, {})
+        return CHANGE_TRACKER.cached(self.sheet_id, tabs)
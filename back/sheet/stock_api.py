@@ -1,8 +1,9 @@
 from __future__ import annotations
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from uuid import uuid4
 
-from .base import SheetsBase
+from .base import SheetsBase, is_range_error
+from back.sheet.change_tracker import CHANGE_TRACKER, FULL
 
 
 class StockAPI(SheetsBase):
@@ -14,6 +15,11 @@ class StockAPI(SheetsBase):
     TAB = "stock"
     HEADERS = ["data_ini_prox", "RecID", "ID_producto", "ID_deposito", "cantidad"]
 
+    # Índice compuesto por spreadsheet (compartido entre instancias, como el de RecID):
+    #   by_pair : (ID_producto, ID_deposito) -> RecID de la fila de stock
+    #   by_recid: RecID de la fila -> (ID_producto, ID_deposito)
+    _pair_index: Dict[str, Dict[str, Dict]] = {}
+
     def _ensure(self):
         self._ensure_tab_and_headers(self.TAB, self.HEADERS)
 
@@ -21,7 +27,12 @@ class StockAPI(SheetsBase):
 
         self._ensure()
         rng = f"{self.TAB}!A2:{self._col_letter(len(self.HEADERS))}"
-        rows = self._get(rng)
+        return self._decode(self._get(rng))
+
+    def _decode(self, rows: List[List[str]], headers: Optional[List[str]] = None) -> List[Dict]:
+        """Filas crudas (desde la fila 2) -> dicts; de paso rearma el índice RecID -> fila."""
+        self._index_rows(self.TAB, rows)
+        self._index_pairs(rows)
         out: List[Dict] = []
         for r in rows:
             r = (r + [""] * len(self.HEADERS))[:len(self.HEADERS)]
@@ -65,36 +76,90 @@ class StockAPI(SheetsBase):
         )
         return recid
 
-    # ---------- Helpers lectura ----------
-    def _find_row_by_prod_and_depo(self, prod_recid: str, depo_recid: str) -> Optional[int]:
-        """Devuelve la fila (1-based) donde C=ID_producto y D=ID_deposito coinciden."""
-        self._ensure()
+    # ---------- Índice compuesto (producto, depósito) ----------
+    def _index_pairs(self, rows: List[List[str]]) -> Dict[str, Dict]:
+        """Rearma el índice compuesto desde filas crudas (desde la fila 2)."""
+        by_pair: Dict[Tuple[str, str], str] = {}
+        by_recid: Dict[str, Tuple[str, str]] = {}
+        for r in rows:
+            r = (r + [""] * len(self.HEADERS))[:len(self.HEADERS)]
+            recid, prod, depo = r[1].strip(), r[2].strip(), r[3].strip()
+            if not (recid and prod and depo):
+                continue
+            by_recid[recid] = (prod, depo)
+            # ante duplicados gana la primera fila (igual que la búsqueda lineal anterior)
+            by_pair.setdefault((prod, depo), recid)
+        idx = {"by_pair": by_pair, "by_recid": by_recid}
+        self._pair_index[self.sheet_id] = idx
+        return idx
+
+    def _pairs(self) -> Dict[str, Dict]:
+        idx = self._pair_index.get(self.sheet_id)
+        if idx is None:
+            # Primera consulta de la sesión: se arma desde una lectura del snapshot
+            self.list()
+            idx = self._pair_index.get(self.sheet_id) or self._index_pairs([])
+        return idx
+
+    def _pair_put(self, recid: str, prod: str, depo: str):
+        idx = self._pair_index.get(self.sheet_id)
+        if idx is None or not (recid and prod and depo):
+            return
+        old = idx["by_recid"].get(recid)
+        if old and old != (prod, depo) and idx["by_pair"].get(old) == recid:
+            idx["by_pair"].pop(old, None)
+        idx["by_recid"][recid] = (prod, depo)
+        idx["by_pair"].setdefault((prod, depo), recid)
+
+    def _pair_forget(self, recid: str):
+        idx = self._pair_index.get(self.sheet_id)
+        if idx is None:
+            return
+        old = idx["by_recid"].pop(recid, None)
+        if old and idx["by_pair"].get(old) == recid:
+            idx["by_pair"].pop(old, None)
+
+    def find_by_prod_and_depo(self, prod_recid: str, depo_recid: str) -> Optional[str]:
+        """
+        RecID de la fila de stock para (producto, depósito), o None si no existe.
+        Búsqueda O(1) sobre el índice compuesto (no descarga la pestaña).
+        """
+        prod_recid = (prod_recid or "").strip()
+        depo_recid = (depo_recid or "").strip()
         if not prod_recid or not depo_recid:
             return None
-        rng = f"{self.TAB}!A2:{self._col_letter(len(self.HEADERS))}"
-        rows = self._get(rng)
-        for idx, r in enumerate(rows, start=2):
-            r = (r + [""] * len(self.HEADERS))[:len(self.HEADERS)]
-            if (r[2].strip() == prod_recid) and (r[3].strip() == depo_recid):
-                return idx
-        return None
+        return self._pairs()["by_pair"].get((prod_recid, depo_recid))
+
+    def _index_after_append(self, a1_range: str, values: List[List[str]], resp: Dict):
+        super()._index_after_append(a1_range, values, resp)
+        for r in values:
+            r = [str(v).strip() for v in (list(r) + [""] * len(self.HEADERS))[:len(self.HEADERS)]]
+            self._pair_put(r[1], r[2], r[3])
+
+    def _on_range_error(self, a1_range: str, ex: Exception):
+        super()._on_range_error(a1_range, ex)
+        if is_range_error(ex):
+            self._pair_index.pop(self.sheet_id, None)
+
+    # ---------- Helpers lectura ----------
     def _find_row_by_recid(self, recid_stock: str) -> Optional[int]:
         """Devuelve el número de fila (1-based) donde columna B == recid_stock."""
         recid_stock = (recid_stock or "").strip()
         if not recid_stock:
             return None
         # Columna B = 2
-        return self._find_row_by_col_value(self.TAB, 2, recid_stock)
+        return self._row_by_recid(self.TAB, recid_stock, 2)
+
+    def _read_row(self, recid_stock: str):
+        """(fila, valores A..E) de la fila de stock, verificada contra el índice."""
+        return self._read_row_by_recid(self.TAB, recid_stock, len(self.HEADERS), 2)
 
     def get_by_recid(self, recid_stock: str) -> Optional[Dict]:
         """Lee una fila de stock por RecID de la fila."""
         self._ensure()
-        row = self._find_row_by_recid(recid_stock)
+        row, cur = self._read_row(recid_stock)
         if not row:
             return None
-        rng = f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
-        cur = (self._get(rng) or [[]])[0]
-        cur += [""] * (len(self.HEADERS) - len(cur))
         return {
             "RecID": cur[1],
             "ID_producto": cur[2],
@@ -111,13 +176,10 @@ class StockAPI(SheetsBase):
         Si 'ID_deposito' es None => no cambia.
         """
         self._ensure()
-        row = self._find_row_by_recid(recid_stock)
+        row, cur = self._read_row(recid_stock)
         if not row:
             return False
-
         rng = f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
-        cur = (self._get(rng) or [[]])[0]
-        cur += [""] * (len(self.HEADERS) - len(cur))
 
         cur_data_ini = ""      # A siempre vacío
         cur_recid = cur[1]     # B
@@ -138,6 +200,7 @@ class StockAPI(SheetsBase):
             new_qty = str(cantidad)
 
         self._set(rng, [[cur_data_ini, cur_recid, cur_prod, new_depo, new_qty]])
+        self._pair_put(cur_recid.strip(), cur_prod.strip(), new_depo.strip())
         return True
 
     def add_qty(self, recid_stock: str, delta: int) -> bool:
@@ -145,15 +208,13 @@ class StockAPI(SheetsBase):
         self._ensure()
         if not isinstance(delta, int) or delta < 1:
             return False
-        row = self._find_row_by_recid(recid_stock)
+        row, cur = self._read_row(recid_stock)
         if not row:
             return False
-        rng = f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
-        cur = (self._get(rng) or [[]])[0]
-        cur += [""] * (len(self.HEADERS) - len(cur))
         qty = int((cur[4] or "0"))
         qty += delta
-        self._set(rng, [["", cur[1], cur[2], cur[3], str(qty)]])
+        with self._write_batch() as wb:
+            wb.update(self._row_range(row), [["", cur[1], cur[2], cur[3], str(qty)]])
         return True
 
     def descargar(self, recid_stock: str, n: int) -> bool:
@@ -161,19 +222,71 @@ class StockAPI(SheetsBase):
         self._ensure()
         if not isinstance(n, int) or n < 1:
             return False
-        row = self._find_row_by_recid(recid_stock)
+        row, cur = self._read_row(recid_stock)
         if not row:
             return False
-        rng = f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
-        cur = (self._get(rng) or [[]])[0]
-        cur += [""] * (len(self.HEADERS) - len(cur))
         qty = int((cur[4] or "0"))
         if qty < n:
             return False
         qty -= n
-        self._set(rng, [["", cur[1], cur[2], cur[3], str(qty)]])
+        with self._write_batch() as wb:
+            wb.update(self._row_range(row), [["", cur[1], cur[2], cur[3], str(qty)]])
         return True
 
+    def _keys_may_be_stale(self) -> bool:
+        """
+        ¿Pudo cambiar la pestaña por fuera de esta sesión desde la última lectura?
+        Lo decide el change tracker con un files.get de Drive (sin leer la hoja).
+        """
+        return CHANGE_TRACKER.check(self.page, self.sheet_id, (self.TAB,)).mode == FULL
+
+    def _reindex_keys(self):
+        """
+        Rehace los índices leyendo sólo B:D (RecID, producto, depósito) de la pestaña.
+        Más liviano que list(): no trae cantidades ni decodifica filas.
+        """
+        rows = self._get(f"{self.TAB}!B2:D")
+        self._index_rows(self.TAB, rows, recid_col=2, first_col=2)
+        self._index_pairs([[""] + list(r) for r in rows])
+
+    def _row_range(self, row: int) -> str:
+        return f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
+
+    def _plan_move(self, recid_src: str, depo_dest: str):
+        """
+        (fila_src, valores_src, fila_dest | None, valores_dest | None) a partir de los índices.
+        Devuelve None si falta algún índice, si el origen no figura o si lo leído no
+        coincide con la hoja (índice viejo).
+        """
+        pairs = self._pair_index.get(self.sheet_id)
+        rows_idx = self._recid_index.get((self.sheet_id, self.TAB))
+        if pairs is None or rows_idx is None:
+            return None
+        pair = pairs["by_recid"].get(recid_src)
+        row_src = rows_idx.get(recid_src)
+        if not pair or not row_src:
+            return None
+        recid_dest = pairs["by_pair"].get((pair[0], depo_dest))
+        row_dest = rows_idx.get(recid_dest) if recid_dest else None
+        if recid_dest and not row_dest:
+            return None
+
+        width = len(self.HEADERS)
+        ranges = [self._row_range(row_src)] + ([self._row_range(row_dest)] if row_dest else [])
+        blocks = self._batch_get(ranges)
+        vals = [((b[0] if b else []) + [""] * width)[:width] for b in blocks]
+
+        cur = vals[0]
+        if cur[1].strip() != recid_src or cur[2].strip() != pair[0]:
+            return None
+        dest = None
+        if row_dest:
+            dest = vals[1]
+            if (dest[1].strip() != recid_dest or dest[2].strip() != pair[0]
+                    or dest[3].strip() != depo_dest):
+                return None
+        return row_src, cur, row_dest, dest
+
     # ---------- Mover con nueva fila ----------
     def move_add_row(self, recid_stock_src: str, recid_deposito_dest: str, n: int) -> bool:
         """
@@ -185,10 +298,22 @@ class StockAPI(SheetsBase):
         Reglas:
           - n entero >= 1 y <= cantidad fuente
           - recid_deposito_dest no vacío
+
+        Costo: una lectura de las filas actuales + una escritura (batchUpdate con origen y
+        destino juntos). Si el destino es nuevo, antes se agrega su fila con cantidad 0:
+        si ese append falla no se movió nada, y el movimiento en sí sigue siendo un
+        único batchUpdate (nunca queda descontado el origen sin sumar en el destino).
+
+        Que el índice no tenga el par (producto, destino) no alcanza para crearlo: pudo
+        crearlo otra sesión o alguien editando la hoja. Antes del append se consulta la
+        versión en Drive y, si hubo cambios ajenos, se relee B:D; si el par apareció, se
+        suma en esa fila. Dos movimientos simultáneos al mismo
+        destino nuevo todavía pueden dejar dos filas: las fusiona collect_stock_garbage.
         """
         self._ensure()
+        recid_stock_src = (recid_stock_src or "").strip()
         recid_deposito_dest = (recid_deposito_dest or "").strip()
-        if not recid_deposito_dest:
+        if not recid_stock_src or not recid_deposito_dest:
             return False
         try:
             n = int(n)
@@ -197,14 +322,24 @@ class StockAPI(SheetsBase):
         if n < 1:
             return False
 
-        # 1) Fila origen por RecID (col B)
-        row_src = self._find_row_by_recid(recid_stock_src)
-        if not row_src:
+        # 1) Filas origen y destino según los índices, leídas juntas en un batchGet.
+        #    Si los índices no alcanzan o no coinciden con la hoja: una lectura completa
+        #    los rehace y se resuelve desde ella.
+        plan = self._plan_move(recid_stock_src, recid_deposito_dest)
+        fresh = plan is None
+        if fresh:
+            self._decode(self._get(f"{self.TAB}!A2:{self._col_letter(len(self.HEADERS))}"))
+            plan = self._plan_move(recid_stock_src, recid_deposito_dest)
+        if plan and not plan[2] and not fresh and self._keys_may_be_stale():
+            # destino nuevo según un índice que puede estar viejo: confirmar contra la hoja
+            self._reindex_keys()
+            rows_idx = self._recid_index.get((self.sheet_id, self.TAB)) or {}
+            if ((plan[1][2].strip(), recid_deposito_dest) in self._pairs()["by_pair"]
+                    or rows_idx.get(recid_stock_src) != plan[0]):
+                plan = self._plan_move(recid_stock_src, recid_deposito_dest)
+        if not plan:
             return False
-
-        rng_src = f"{self.TAB}!A{row_src}:{self._col_letter(len(self.HEADERS))}{row_src}"
-        cur = (self._get(rng_src) or [[]])[0]
-        cur += [""] * (len(self.HEADERS) - len(cur))
+        row_src, cur, row_dest, dest = plan
 
         prod_src = cur[2].strip()  # C = ID_producto
         depo_src = cur[3].strip()  # D = ID_deposito
@@ -216,23 +351,20 @@ class StockAPI(SheetsBase):
             # (el front ya lo evita, pero por seguridad)
             return False
 
-        # 2) Descontar del origen
-        qty_src_after = qty_src - n
-        self._set(rng_src, [["", cur[1], prod_src, depo_src, str(qty_src_after)]])
+        # 2) Destino nuevo: se crea la fila vacía (cantidad 0) antes de mover nada
+        if not row_dest:
+            dest = ["", uuid4().hex[:10], prod_src, recid_deposito_dest, "0"]
+            resp = self._append(f"{self.TAB}!A2", [dest])
+            _, row_dest, _ = self._split_a1(((resp or {}).get("updates") or {}).get("updatedRange") or "")
+            row_dest = row_dest or self._find_row_by_recid(dest[1])
+            if not row_dest:
+                return False
 
-        # 3) Buscar si ya existe fila destino para (producto, depósito destino)
-        row_dest = self._find_row_by_prod_and_depo(prod_src, recid_deposito_dest)
-        if row_dest:
-            # Sumar a esa fila (no crear otra)
-            rng_dest = f"{self.TAB}!A{row_dest}:{self._col_letter(len(self.HEADERS))}{row_dest}"
-            dest = (self._get(rng_dest) or [[]])[0]
-            dest += [""] * (len(self.HEADERS) - len(dest))
-            qty_dest = int((dest[4] or "0"))
-            qty_dest_after = qty_dest + n
-            self._set(rng_dest, [["", dest[1], prod_src, recid_deposito_dest, str(qty_dest_after)]])
-        else:
-            # Crear NUEVA fila destino
-            recid_new = uuid4().hex[:10]
-            self._append(f"{self.TAB}!A2", [["", recid_new, prod_src, recid_deposito_dest, str(n)]])
+        # 3) Origen y destino en un solo batchUpdate
+        qty_dest = int((dest[4] or "0"))
+        with self._write_batch() as wb:
+            wb.update(self._row_range(row_src), [["", cur[1], prod_src, depo_src, str(qty_src - n)]])
+            wb.update(self._row_range(row_dest),
+                      [["", dest[1], prod_src, recid_deposito_dest, str(qty_dest + n)]])
 
-        return True
\ No newline at end of file
+        return True
@@ -1,8 +1,11 @@
 from __future__ import annotations
 import flet as ft
-import base64, os, time, re, asyncio, urllib.request
+import os, time, re, asyncio
 from datetime import datetime
 
+from back.image.image_service import get_image_service, page_of, session_of
+from back.image.image_service import extract_drive_id, drive_download_url  # noqa: F401 (compat)
+
 DEBUG_IMAGES = True
 
 # Carpeta local de cache opcional (si la usás)
@@ -18,25 +21,6 @@ def _dprint(*a, **k):
     if DEBUG_IMAGES:
         print(*a, **k, flush=True)
 
-def _guess_mime(b: bytes) -> str:
-    if not b or len(b) < 12:
-        return "image/jpeg"
-    if b.startswith(b"\xff\xd8"):
-        return "image/jpeg"
-    if b.startswith(b"\x89PNG"):
-        return "image/png"
-    if b.startswith(b"GIF8"):
-        return "image/gif"
-    if b[:4] == b"RIFF" and b[8:12] == b"WEBP":
-        return "image/webp"
-    return "image/jpeg"
-
-def _to_b64(b: bytes) -> str:
-    return base64.b64encode(b).decode("utf-8")
-
-def _make_data_url(b: bytes) -> str:
-    return f"data:{_guess_mime(b)};base64,{_to_b64(b)}"
-
 def _safe_update(ctrl: ft.Control):
     try:
         if getattr(ctrl, "page", None):
@@ -45,29 +29,6 @@ def _safe_update(ctrl: ft.Control):
         pass
         _dprint(f"[IMG] safe_update skip: {ex}")
 
-_RX_FILE_D = re.compile(r"/file/d/([^/]+)")
-_RX_Q_ID   = re.compile(r"[?&]id=([a-zA-Z0-9_-]+)")
-
-def extract_drive_id(url_or_id: str) -> str:
-    if not url_or_id: return ""
-    m = _RX_FILE_D.search(url_or_id)
-    if m: return m.group(1)
-    m = _RX_Q_ID.search(url_or_id)
-    if m: return m.group(1)
-    return (url_or_id or "").strip()
-
-def drive_download_url(fid: str) -> str:
-    return f"https://drive.google.com/uc?export=download&id={fid}"
-
-def fetch_bytes_sync(url: str) -> bytes | None:
-    try:
-        req = urllib.request.Request(url, headers={"User-Agent":"Mozilla/5.0","Accept":"*/*"})
-        with urllib.request.urlopen(req, timeout=25) as resp:
-            return resp.read()
-    except Exception as ex:
-        _dprint(f"[fetch] ERROR url={url} ex={ex}")
-        return None
-
 def cargar_imagen_data_url_local(recid_imagen: str) -> tuple[str | None, list[str]]:
     tried = []
     if not recid_imagen: return None, tried
@@ -77,7 +38,8 @@ def cargar_imagen_data_url_local(recid_imagen: str) -> tuple[str | None, list[st
         if os.path.isfile(p):
             try:
                 with open(p,"rb") as f: b = f.read()
-                return _make_data_url(b), tried
+                # URL de assets (o data: URL si están desactivadas), ver image_service
+                return get_image_service().src_for(b, key=f"file:{p}"), tried
             except Exception as ex:
                 _dprint(f"[IMG/LOCAL] error leyendo {p}: {ex}")
                 return None, tried
@@ -119,20 +81,23 @@ def _set_busy(meta: dict, on: bool):
         except Exception:
             pass
 
-async def ensure_image_for_container_async(container: ft.Container):
+async def ensure_image_for_container_async(container: ft.Container) -> bool:
     """
     Espera que el container tenga en .data:
       - recid_imagen: str (data:, url http(s) o id local/código)
       - img_control:  ft.Image
+      - variant:      "list" / "detail" (opcional): miniatura en lugar de la original
       - busy:         ft.ProgressBar (opcional)
       - error_label:  ft.Text (opcional)
       - disable_on_busy: list[Control] (opcional)
+    Devuelve True si la fila quedó resuelta (imagen puesta, o nada que cargar) y False si
+    falló (LazyImages la vuelve a intentar cuando la fila se vuelve a ver).
     """
     meta = getattr(container, "data", None)
     cid = hex(id(container))
     if not isinstance(meta, dict):
         _dprint(f"[IMG] {cid} sin meta; skip"); 
-        return
+        return True
 
     recid_imagen: str = meta.get("recid_imagen") or ""
     img_control: ft.Image | None = meta.get("img_control")
@@ -145,11 +110,11 @@ async def ensure_image_for_container_async(container: ft.Container):
         if not img_control:
             _set_busy(meta, False)
             dur = int((time.perf_counter()-t0)*1000)
-            _dprint(f"[IMG] END   {_now_str()} cid={cid} -> SIN_CONTROL duration={dur}ms"); return
+            _dprint(f"[IMG] END   {_now_str()} cid={cid} -> SIN_CONTROL duration={dur}ms"); return True
         if not recid_imagen:
             _set_busy(meta, False)
             dur = int((time.perf_counter()-t0)*1000)
-            _dprint(f"[IMG] END   {_now_str()} cid={cid} -> SIN_DATO duration={dur}ms"); return
+            _dprint(f"[IMG] END   {_now_str()} cid={cid} -> SIN_DATO duration={dur}ms"); return True
 
         # encender busy + bloquear
         _set_busy(meta, True)
@@ -159,21 +124,18 @@ async def ensure_image_for_container_async(container: ft.Container):
             res = _set_img_src(img_control, recid_imagen)
             _set_busy(meta, False)
             dur = int((time.perf_counter()-t0)*1000)
-            _dprint(f"[IMG] END   {_now_str()} cid={cid} -> OK(DATA-URL) {res} duration={dur}ms"); return
+            _dprint(f"[IMG] END   {_now_str()} cid={cid} -> OK(DATA-URL) {res} duration={dur}ms"); return True
 
-        # 2) si es http(s)
+        # 2) si es http(s): ImageService (cache memoria/disco, single-flight, límite de descargas)
         if recid_imagen.startswith(("http://","https://")):
-            url = recid_imagen
-            if "drive.google.com" in url:
-                fid = extract_drive_id(url)
-                url = drive_download_url(fid)
-            b = await asyncio.to_thread(fetch_bytes_sync, url)
-            if b:
-                data_url = _make_data_url(b)
-                res = _set_img_src(img_control, data_url)
+            src = await get_image_service().get_src(
+                recid_imagen, session=session_of(container), variant=meta.get("variant"),
+                page=page_of(container))
+            if src:
+                res = _set_img_src(img_control, src)
                 _set_busy(meta, False)
                 dur = int((time.perf_counter()-t0)*1000)
-                _dprint(f"[IMG] END   {_now_str()} cid={cid} -> OK(URL->DATA-URL) {res} bytes={len(b)} duration={dur}ms"); return
+                _dprint(f"[IMG] END   {_now_str()} cid={cid} -> OK(URL->{src[:40]}) {res} duration={dur}ms"); return True
             # Fallback: setear src directo (puede fallar en web por CSP)
             res = _set_img_src(img_control, recid_imagen)
             # mostrar error para dejar rastro
@@ -183,7 +145,7 @@ async def ensure_image_for_container_async(container: ft.Container):
                 _safe_update(err_lbl)
             _set_busy(meta, False)
             dur = int((time.perf_counter()-t0)*1000)
-            _dprint(f"[IMG] END   {_now_str()} cid={cid} -> FALLBACK(URL) {res} duration={dur}ms"); return
+            _dprint(f"[IMG] END   {_now_str()} cid={cid} -> FALLBACK(URL) {res} duration={dur}ms"); return False
 
         # 3) intentar cache local por ID
         data_url, tried = cargar_imagen_data_url_local(recid_imagen)
@@ -191,7 +153,7 @@ async def ensure_image_for_container_async(container: ft.Container):
             res = _set_img_src(img_control, data_url)
             _set_busy(meta, False)
             dur = int((time.perf_counter()-t0)*1000)
-            _dprint(f"[IMG] END   {_now_str()} cid={cid} -> OK(LOCAL) {res} duration={dur}ms"); return
+            _dprint(f"[IMG] END   {_now_str()} cid={cid} -> OK(LOCAL) {res} duration={dur}ms"); return True
 
         # Sin resultados
         if err_lbl:
@@ -202,6 +164,7 @@ async def ensure_image_for_container_async(container: ft.Container):
         _set_busy(meta, False)
         dur = int((time.perf_counter()-t0)*1000)
         _dprint(f"[IMG] END   {_now_str()} cid={cid} -> NO_ENCONTRADA duration={dur}ms IMAGES_DIR={IMAGES_DIR} tried={tried if recid_imagen else []}")
+        return False
 
     except Exception as ex:
         if err_lbl:
@@ -211,6 +174,7 @@ async def ensure_image_for_container_async(container: ft.Container):
         _set_busy(meta, False)
         dur = int((time.perf_counter()-t0)*1000)
         _dprint(f"[IMG] END   {_now_str()} cid={cid} -> ERROR: {ex} duration={dur}ms")
+        return False
 
 # ---- Wrapper compat: agenda la tarea async si hay loop, o la corre si no.
 def renderizar_imagen_asinc(container: ft.Container):
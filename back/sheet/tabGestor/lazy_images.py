@@ -0,0 +1,129 @@
+# ./back/sheet/tabGestor/lazy_images.py
+"""
+Carga de imágenes de las listas (Depósitos / Ítems) sólo para las filas visibles.
+
+Antes render_list lanzaba ensure_image_for_container_async para TODAS las filas en cada
+render: escribir en el buscador dejaba cientos de descargas superpuestas de filas que ya
+no estaban. LazyImages:
+  - calcula las filas visibles con los eventos de scroll del ListView (las filas tienen
+    alto fijo ROW_HEIGHT, así que fila = offset // (ROW_HEIGHT + espaciado)), más
+    OVERSCAN filas arriba y abajo;
+  - cancela las cargas de filas que salieron de esa ventana y todas las de un render
+    anterior (cada attach() es una generación nueva);
+  - limita las cargas en curso de todo el proceso con un semáforo (MAX_LOADS).
+
+Configuración por entorno: LAZY_IMAGES_MAX.
+"""
+from __future__ import annotations
+import asyncio, itertools, os, threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import flet as ft
+
+from back.sheet.tabGestor.imagen_asinc import ensure_image_for_container_async
+
+ROW_HEIGHT = 104        # alto fijo de cada fila de las listas con imagen
+OVERSCAN = 3            # filas de más arriba/abajo de lo visible
+MAX_LOADS = int(os.getenv("LAZY_IMAGES_MAX", "8"))
+SCROLL_INTERVAL_MS = 60
+
+_sem: Optional[asyncio.Semaphore] = None
+
+
+def _slots() -> asyncio.Semaphore:
+    # global: todas las listas de todas las sesiones comparten el mismo event loop de Flet
+    global _sem
+    if _sem is None:
+        _sem = asyncio.Semaphore(max(1, MAX_LOADS))
+    return _sem
+
+
+class LazyImages:
+    def __init__(self, run_task: Callable, row_extent: float):
+        self._run_task = run_task        # page.run_task (devuelve un Future cancelable)
+        self.row_extent = float(row_extent)
+        self.gen = 0
+        self._rows: List[ft.Control] = []
+        self._tasks: Dict[int, Tuple[int, object]] = {}     # fila -> (token, Future)
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()      # on_scroll llega desde hilos de Flet; las cargas, del loop
+        self._done: Set[int] = set()
+        self._offset = 0.0
+        self._viewport = 0.0
+
+    def attach(self, lv: ft.ListView, viewport_height: float):
+        """Nueva lista (render nuevo): cancela lo pendiente y carga lo que se ve."""
+        self.cancel()
+        self.gen += 1
+        self._rows = list(getattr(lv, "controls", None) or [])
+        self._done = set()
+        self._offset = 0.0
+        self._viewport = float(viewport_height or 0)
+        lv.on_scroll = self._on_scroll
+        lv.on_scroll_interval = SCROLL_INTERVAL_MS
+        # onScroll recién llega al cliente con un update del ListView: si ya estaba en la
+        # página (render_list hizo page.update antes), se manda ahora
+        if getattr(lv, "page", None) is not None:
+            try:
+                lv.update()
+            except Exception as ex:
+                print(f"[lazy_images] no se pudo activar el scroll: {ex}", flush=True)
+        self._schedule()
+
+    def cancel(self):
+        with self._lock:
+            futs = [fut for _tok, fut in self._tasks.values()]
+            self._tasks.clear()
+        for fut in futs:
+            try:
+                fut.cancel()
+            except Exception:
+                pass
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        self._offset = float(getattr(e, "pixels", 0) or 0)
+        vd = getattr(e, "viewport_dimension", None)
+        if vd:
+            self._viewport = float(vd)
+        self._schedule()
+
+    def visible_range(self):
+        """(primera, última) fila a cargar, inclusive."""
+        if not self._rows:
+            return 0, -1
+        first = int(self._offset // self.row_extent) - OVERSCAN
+        last = int((self._offset + self._viewport) // self.row_extent) + OVERSCAN
+        return max(0, first), min(len(self._rows) - 1, last)
+
+    def _schedule(self):
+        lo, hi = self.visible_range()
+        with self._lock:
+            # salieron de la ventana: si todavía no arrancaron (o están bajando) se cancelan
+            gone = [self._tasks.pop(i)[1] for i in [i for i in self._tasks if not lo <= i <= hi]]
+            todo = [i for i in range(lo, hi + 1) if i not in self._done and i not in self._tasks]
+            gen = self.gen
+            for i in todo:
+                tok = next(self._tokens)
+                try:
+                    self._tasks[i] = (tok, self._run_task(self._load, gen, i, tok))
+                except Exception as ex:
+                    print(f"[lazy_images] no se pudo agendar fila {i}: {ex}", flush=True)
+        for fut in gone:
+            try:
+                fut.cancel()
+            except Exception:
+                pass
+
+    async def _load(self, gen: int, i: int, tok: int):
+        try:
+            async with _slots():
+                if gen != self.gen:
+                    return               # render viejo: la fila ya no existe
+                ok = await ensure_image_for_container_async(self._rows[i])
+            if ok and gen == self.gen:
+                self._done.add(i)        # si falló, se reintenta cuando la fila se vuelva a ver
+        finally:
+            with self._lock:
+                cur = self._tasks.get(i)
+                if cur is not None and cur[0] == tok:
+                    del self._tasks[i]
@@ -3,8 +3,9 @@
 from __future__ import annotations
 import flet as ft
 
+from back.sheet.tabGestor.lazy_images import ROW_HEIGHT
+
 # Constantes de layout
-ROW_HEIGHT = 96
 ROW_SPACING = 8
 MAX_ROWS_VISIBLE = 7
 
@@ -49,8 +50,9 @@ def crear_lista_depositos(backend, search_value, sort_mode, open_edit_panel):
         def on_click_row(_=None, recid=d.get("RecID", "")):
             open_edit_panel(recid)
 
-        # Placeholder inicial (o URL/data-url directa si ya vino)
-        if recid_imagen and isinstance(recid_imagen, str) and recid_imagen.startswith(("http", "data:")):
+        # Placeholder inicial (o data-url directa si ya vino). Las URLs no se ponen directo:
+        # imagen_asinc trae la miniatura "list" en vez de la foto original
+        if recid_imagen and isinstance(recid_imagen, str) and recid_imagen.startswith("data:"):
             imagen_src = recid_imagen
         else:
             # PNG transparente 1x1
@@ -108,8 +110,9 @@ def crear_lista_depositos(backend, search_value, sort_mode, open_edit_panel):
                 bgcolor=ft.Colors.WHITE,
                 border_radius=10,
                 padding=12,
-                # imagen_asinc leerá desde acá
-                data={"recid_imagen": recid_imagen, "img_control": imagen_placeholder},
+                height=ROW_HEIGHT,      # alto fijo: lazy_images calcula la fila visible por offset
+                # imagen_asinc leerá desde acá (variant: miniatura para la fila)
+                data={"recid_imagen": recid_imagen, "img_control": imagen_placeholder, "variant": "list"},
                 content=ft.Row(
                     spacing=12,
                     vertical_alignment=ft.CrossAxisAlignment.CENTER,
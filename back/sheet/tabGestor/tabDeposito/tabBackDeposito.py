@@ -4,6 +4,7 @@ from typing import List, Dict, Optional
 from uuid import uuid4
 import os
 from back.integrations.drive_user_uploader import DriveUserUploader
+from back.integrations.api_metrics import track_operation
 try:
     from back.sheet.deposito_api import DepositoAPI
 except Exception:
@@ -14,6 +15,11 @@ try:
 except Exception:
     ImagenAPI = None
 
+try:
+    from back.sheet.snapshot_api import SnapshotAPI
+except Exception:
+    SnapshotAPI = None
+
 
 class DepositoBackend:
     """
@@ -42,6 +48,7 @@ class DepositoBackend:
 
         self.api = DepositoAPI(page, self.sheet_id) if (DepositoAPI and page is not None) else None
         self.api_img = ImagenAPI(page, self.sheet_id) if (ImagenAPI and page is not None) else None
+        self.api_snap = SnapshotAPI(page, self.sheet_id, svc=self.api.svc) if (SnapshotAPI and self.api) else None
 
         self.depositos: List[Dict] = []
         self.depo_by_recid: Dict[str, Dict] = {}
@@ -59,8 +66,10 @@ class DepositoBackend:
         )
         self.api = DepositoAPI(page, self.sheet_id) if DepositoAPI else None
         self.api_img = ImagenAPI(page, self.sheet_id) if ImagenAPI else None
+        self.api_snap = SnapshotAPI(page, self.sheet_id, svc=self.api.svc) if (SnapshotAPI and self.api) else None
 
     # -------- Refresh ----------
+    @track_operation("DepositoBackend.refresh_imagenes")
     def refresh_imagenes(self):
         """Carga hoja 'imagen' y construye el mapa RecID -> link."""
         if not self.api_img:
@@ -70,6 +79,7 @@ class DepositoBackend:
         self.imagenes = self.api_img.list()
         self.img_by_recid = {(i.get("RecID") or ""): (i.get("ID_nombre") or "") for i in self.imagenes}
 
+    @track_operation("DepositoBackend.refresh_depositos")
     def refresh_depositos(self):
         """Carga hoja 'deposito' y resuelve imagen_url desde img_by_recid."""
         self.refresh_imagenes()
@@ -80,8 +90,13 @@ class DepositoBackend:
             return
 
         self.depositos = self.api.list()
+        self._link_images()
 
-        # Resolver RecID_imagen -> imagen_url (sin perder el RecID original)
+    def _link_images(self):
+        # Resolver RecID_imagen -> imagen_url (sin perder el RecID original).
+        # Las filas vienen del cache de snapshots compartido por todas las sesiones:
+        # se copian antes de agregarles campos propios.
+        self.depositos = [dict(d) for d in self.depositos]
         for d in self.depositos:
             rid = (d.get("RecID_imagen") or "").strip()
             link = self.img_by_recid.get(rid, "").strip()
@@ -90,7 +105,23 @@ class DepositoBackend:
 
         self.depo_by_recid = {d.get("RecID", ""): d for d in self.depositos}
 
-    def refresh_all(self):
+    def apply_snapshot(self, snap: Dict[str, List[Dict]]):
+        """Consume un snapshot ya leído (SnapshotAPI.load) sin volver a la red."""
+        self.imagenes = list(snap.get("imagen") or [])
+        self.img_by_recid = {(i.get("RecID") or ""): (i.get("ID_nombre") or "") for i in self.imagenes}
+        self.depositos = list(snap.get("deposito") or [])
+        self._link_images()
+
+    @track_operation("DepositoBackend.refresh_all")
+    def refresh_all(self, snapshot: Optional[Dict[str, List[Dict]]] = None):
+        if snapshot is None and self.api_snap:
+            try:
+                snapshot = self.api_snap.load_cached(("deposito", "imagen"))
+            except Exception as e:
+                print("[ERROR] DepositoBackend.refresh_all snapshot:", e)
+        if snapshot is not None:
+            self.apply_snapshot(snapshot)
+            return
         self.refresh_depositos()  # ya refresca imágenes adentro
 
     # -------- Query helpers ----------
@@ -122,6 +153,7 @@ class DepositoBackend:
             pass
 
     # -------- CRUD ----------
+    @track_operation("DepositoBackend.add")
     def add(self, *, id_deposito: str, nombre_deposito: str,
             direccion_deposito: str = "", descripcion_deposito: str = "",
             RecID_imagen: str = "") -> Optional[str]:
@@ -137,6 +169,7 @@ class DepositoBackend:
         self._publish()
         return recid
 
+    @track_operation("DepositoBackend.update")
     def update(self, recid: str, *, id_deposito: Optional[str] = None,
                nombre_deposito: Optional[str] = None,
                direccion_deposito: Optional[str] = None,
@@ -168,6 +201,7 @@ class DepositoBackend:
                 return (d.get("RecID") or "").strip()
         return ""
 
+    @track_operation("DepositoBackend.delete")
     def delete(self, recid_or_id: str) -> bool:
         """
         Borra el depósito.
@@ -227,6 +261,7 @@ class DepositoBackend:
         return ok
 
     # -------- Imagen: remover vínculo en hojas (no borra archivo en Drive) ----------
+    @track_operation("DepositoBackend.remove_image_for_deposito")
     def remove_image_for_deposito(self, recid_deposito: str) -> bool:
         """
         1) Lee RecID_imagen del depósito (si existe).
@@ -257,6 +292,7 @@ class DepositoBackend:
         return bool(ok_upd and ok_img)
 
     # -------- Subida + attach (EDIT) ----------
+    @track_operation("DepositoBackend.upload_and_attach_image")
     def upload_and_attach_image(
         self,
         recid_deposito: str,
@@ -4,7 +4,8 @@ import asyncio
 import os
 import flet as ft
 
-from back.sheet.tabGestor.tabDeposito.listaDeposito import crear_lista_depositos
+from back.sheet.tabGestor.tabDeposito.listaDeposito import crear_lista_depositos, ROW_HEIGHT, ROW_SPACING
+from back.sheet.tabGestor.lazy_images import LazyImages
 
 PRIMARY = "#4B39EF"
 WHITE = ft.Colors.WHITE
@@ -124,6 +125,8 @@ def build_deposito_tab(page: ft.Page, backend, bus=None) -> ft.Control:
     )
 
     lv_holder = ft.Container()
+    # imágenes de la lista: sólo filas visibles (+ margen); un render nuevo cancela lo anterior
+    lazy = LazyImages(_run_task, ROW_HEIGHT + ROW_SPACING)
 
     # ----------------- FilePicker global (para EDIT) -----------------
     pending_upload = {"recid": None, "preview": None, "upload_name": None}
@@ -276,8 +279,6 @@ def build_deposito_tab(page: ft.Page, backend, bus=None) -> ft.Control:
 
     # ----------------- render de la lista -----------------
     def render_list():
-        from back.sheet.tabGestor.imagen_asinc import ensure_image_for_container_async
-
         search_value = (search.value or "").strip()
         sort_value = sort_mode["value"]
 
@@ -296,18 +297,7 @@ def build_deposito_tab(page: ft.Page, backend, bus=None) -> ft.Control:
 
         page.update()
 
-        async def _render_images_async():
-            await asyncio.sleep(0)
-            conts = getattr(lv_holder.content, "controls", []) or []
-            for c in conts:
-                try:
-                    _run_task(ensure_image_for_container_async, c)
-                except:
-                    pass
-            await asyncio.sleep(0.05)
-            page.update()
-
-        _run_task(_render_images_async)
+        lazy.attach(lv_holder.content, lv_holder.height)
 
     # ----------------- panel agregar -----------------
     def open_add_panel(_=None):
@@ -2,7 +2,8 @@
 from __future__ import annotations
 import flet as ft
 
-ROW_HEIGHT = 96
+from back.sheet.tabGestor.lazy_images import ROW_HEIGHT
+
 ROW_SPACING = 8
 MAX_ROWS_VISIBLE = 7
 
@@ -43,7 +44,7 @@ def crear_lista_items(backend, search_value, sort_mode, open_edit_panel):
         def on_click_row(_=None, recid=r.get("RecID", "")):
             open_edit_panel(recid)
 
-        if recid_imagen and isinstance(recid_imagen, str) and recid_imagen.startswith(("http", "data:")):
+        if recid_imagen and isinstance(recid_imagen, str) and recid_imagen.startswith("data:"):
             imagen_src = recid_imagen
         else:
             imagen_src = (
@@ -74,7 +75,8 @@ def crear_lista_items(backend, search_value, sort_mode, open_edit_panel):
                 bgcolor=ft.Colors.WHITE,
                 border_radius=10,
                 padding=12,
-                data={"recid_imagen": recid_imagen, "img_control": imagen_placeholder},
+                height=ROW_HEIGHT,      # alto fijo: lazy_images calcula la fila visible por offset
+                data={"recid_imagen": recid_imagen, "img_control": imagen_placeholder, "variant": "list"},
                 content=ft.Row(
                     spacing=12,
                     vertical_alignment=ft.CrossAxisAlignment.CENTER,
@@ -4,6 +4,8 @@ from typing import List, Dict, Optional
 from uuid import uuid4
 import os
 
+from back.integrations.api_metrics import track_operation
+
 try:
     from back.sheet.producto_api import ProductoAPI  # API equivalente a DepositoAPI
 except Exception:
@@ -14,6 +16,11 @@ try:
 except Exception:
     ImagenAPI = None
 
+try:
+    from back.sheet.snapshot_api import SnapshotAPI
+except Exception:
+    SnapshotAPI = None
+
 class ItemsBackend:
     """
     Backend para Items (productos).
@@ -41,6 +48,7 @@ class ItemsBackend:
 
         self.api = ProductoAPI(page, self.sheet_id) if (ProductoAPI and page is not None) else None
         self.api_img = ImagenAPI(page, self.sheet_id) if (ImagenAPI and page is not None) else None
+        self.api_snap = SnapshotAPI(page, self.sheet_id, svc=self.api.svc) if (SnapshotAPI and self.api) else None
 
         self.items: List[Dict] = []
         self.item_by_recid: Dict[str, Dict] = {}
@@ -57,8 +65,10 @@ class ItemsBackend:
         )
         self.api = ProductoAPI(page, self.sheet_id) if ProductoAPI else None
         self.api_img = ImagenAPI(page, self.sheet_id) if ImagenAPI else None
+        self.api_snap = SnapshotAPI(page, self.sheet_id, svc=self.api.svc) if (SnapshotAPI and self.api) else None
 
     # ---- Refresh ----
+    @track_operation("ItemsBackend.refresh_imagenes")
     def refresh_imagenes(self):
         if not self.api_img:
             self.imagenes = []
@@ -67,6 +77,7 @@ class ItemsBackend:
         self.imagenes = self.api_img.list()
         self.img_by_recid = {(i.get("RecID") or ""): (i.get("ID_nombre") or "") for i in self.imagenes}
 
+    @track_operation("ItemsBackend.refresh_items")
     def refresh_items(self):
         self.refresh_imagenes()
         if not self.api:
@@ -74,6 +85,10 @@ class ItemsBackend:
             self.item_by_recid = {}
             return
         self.items = self.api.list()
+        self._link_images()
+
+    def _link_images(self):
+        self.items = [dict(r) for r in self.items]   # no tocar las filas del cache compartido
         for r in self.items:
             rid = (r.get("RecID_imagen") or r.get("ID_Imagen") or "").strip()
             link = self.img_by_recid.get(rid, "").strip()
@@ -81,7 +96,23 @@ class ItemsBackend:
                 r["imagen_url"] = link
         self.item_by_recid = {r.get("RecID", ""): r for r in self.items}
 
-    def refresh_all(self):
+    def apply_snapshot(self, snap: Dict[str, List[Dict]]):
+        """Consume un snapshot ya leído (SnapshotAPI.load) sin volver a la red."""
+        self.imagenes = list(snap.get("imagen") or [])
+        self.img_by_recid = {(i.get("RecID") or ""): (i.get("ID_nombre") or "") for i in self.imagenes}
+        self.items = list(snap.get("producto") or [])
+        self._link_images()
+
+    @track_operation("ItemsBackend.refresh_all")
+    def refresh_all(self, snapshot: Optional[Dict[str, List[Dict]]] = None):
+        if snapshot is None and self.api_snap:
+            try:
+                snapshot = self.api_snap.load_cached(("producto", "imagen"))
+            except Exception as e:
+                print("[ERROR] ItemsBackend.refresh_all snapshot:", e)
+        if snapshot is not None:
+            self.apply_snapshot(snapshot)
+            return
         self.refresh_items()
 
     # ---- Query helper ----
@@ -113,6 +144,7 @@ class ItemsBackend:
             pass
 
     # ---- CRUD ----
+    @track_operation("ItemsBackend.add")
     def add(self, *, codigo_producto: str, nombre_producto: str,
             descripcion_producto: str = "", RecID_imagen: str = "") -> Optional[str]:
         if not self.api:
@@ -126,6 +158,7 @@ class ItemsBackend:
         self._publish()
         return recid
 
+    @track_operation("ItemsBackend.update")
     def update(self, recid: str, *, codigo_producto: Optional[str] = None,
                nombre_producto: Optional[str] = None,
                descripcion_producto: Optional[str] = None,
@@ -154,6 +187,7 @@ class ItemsBackend:
                 return (r.get("RecID") or "").strip()
         return ""
 
+    @track_operation("ItemsBackend.delete")
     def delete(self, recid_or_code: str) -> bool:
         if not self.api:
             return False
@@ -194,6 +228,7 @@ class ItemsBackend:
             self.refresh_all(); self._publish()
         return ok
 
+    @track_operation("ItemsBackend.remove_image_for_item")
     def remove_image_for_item(self, recid_item: str) -> bool:
         if not self.api:
             return False
@@ -218,6 +253,7 @@ class ItemsBackend:
         return bool(ok_upd and ok_img)
 
     # ---- Upload + attach (igual a Depósito) ----
+    @track_operation("ItemsBackend.upload_and_attach_image")
     def upload_and_attach_image(self, recid_item: str, local_path: str,
                                 folder_path: str = "TacticaGestorSheet/ImagenGestor") -> dict:
         out = {"ok": False, "recid_imagen": "", "imagen_url": "", "error": ""}
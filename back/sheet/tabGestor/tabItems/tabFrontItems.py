@@ -4,7 +4,8 @@ import asyncio
 import os
 import flet as ft
 
-from .listaItems import crear_lista_items
+from .listaItems import crear_lista_items, ROW_HEIGHT, ROW_SPACING
+from back.sheet.tabGestor.lazy_images import LazyImages
 
 PRIMARY = "#4B39EF"
 WHITE = ft.Colors.WHITE
@@ -86,6 +87,7 @@ def build_items_tab(page: ft.Page, backend, bus=None) -> ft.Control:
     )
 
     lv_holder = ft.Container()
+    lazy = LazyImages(_run_task, ROW_HEIGHT + ROW_SPACING)   # imágenes sólo de las filas visibles
 
     # ----- FilePicker global (EDIT imagen) -----
     pending_upload = {"recid": None, "preview": None, "upload_name": None}
@@ -170,7 +172,6 @@ def build_items_tab(page: ft.Page, backend, bus=None) -> ft.Control:
 
     # ----- render list -----
     def render_list():
-        from back.sheet.tabGestor.imagen_asinc import ensure_image_for_container_async
         search_value = (search.value or "").strip()
         sort_value = sort_mode["value"]
         new_lv_holder, new_status = crear_lista_items(backend, search_value, sort_value, open_edit_panel)
@@ -182,14 +183,7 @@ def build_items_tab(page: ft.Page, backend, bus=None) -> ft.Control:
         total_label.value = f"Total: {numero}"
         page.update()
 
-        async def _render_images_async():
-            await asyncio.sleep(0)
-            conts = getattr(lv_holder.content, "controls", []) or []
-            for c in conts:
-                try: _run_task(ensure_image_for_container_async, c)
-                except Exception: pass
-            await asyncio.sleep(0.05); page.update()
-        _run_task(_render_images_async)
+        lazy.attach(lv_holder.content, lv_holder.height)
 
     # ----- panel agregar -----
     def open_add_panel(_=None):
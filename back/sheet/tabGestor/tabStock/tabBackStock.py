@@ -2,6 +2,7 @@
 from __future__ import annotations
 from typing import List, Dict, Optional
 
+from back.integrations.api_metrics import track_operation
 from back.sheet.logsAcn_api import LogsAcnAPI
 
 try:
@@ -10,9 +11,11 @@ try:
     from back.sheet.producto_api import ProductoAPI
     from back.sheet.deposito_api import DepositoAPI
     from back.sheet.log_api import LogAPI, fmt_stock_move, fmt_stock_out, fmt_stock_add
+    from back.sheet.snapshot_api import SnapshotAPI
+    from back.sheet.maintenance import StockMaintenance
 except Exception:
     # fallback para desarrollo
-    StockAPI = ProductoAPI = DepositoAPI = LogAPI = None
+    StockAPI = ProductoAPI = DepositoAPI = LogAPI = SnapshotAPI = StockMaintenance = None
     def fmt_stock_move(n, p, o, d): return f"[MOVE] {n} {p} {o}->{d}"
     def fmt_stock_out(n, p, d):     return f"[OUT]  {n} {p} {d}"
     def fmt_stock_add(n, p, d):     return f"[ADD]  {n} {p} {d}"
@@ -42,6 +45,10 @@ class StockBackend:
         self.api_depo  = DepositoAPI(page, self.sheet_id) if DepositoAPI else None
         self.api_logsAcn = LogsAcnAPI(page, self.sheet_id)
         self.logger    = LogAPI(page, self.sheet_id) if LogAPI else None
+        self.api_snap  = (
+            SnapshotAPI(page, self.sheet_id, svc=self.api_stock.svc)
+            if (SnapshotAPI and self.api_stock) else None
+        )
 
         # caches
         self.productos: List[Dict] = []
@@ -69,6 +76,7 @@ class StockBackend:
     # -------------------------------------------------
     # REFRESH
     # -------------------------------------------------
+    @track_operation("StockBackend.refresh_products")
     def refresh_products(self):
         if self.items_backend and getattr(self.items_backend, "productos", None):
             self.productos = list(self.items_backend.productos or [])
@@ -83,6 +91,7 @@ class StockBackend:
         self.productos = self.api_prod.list() or []
         self.prod_by_recid = {p["RecID"]: p for p in self.productos}
 
+    @track_operation("StockBackend.refresh_depositos")
     def refresh_depositos(self):
         if self.depo_backend and getattr(self.depo_backend, "depositos", None):
             self.depositos = list(self.depo_backend.depositos or [])
@@ -97,6 +106,7 @@ class StockBackend:
         self.depositos = self.api_depo.list() or []
         self.depo_by_recid = {d["RecID"]: d for d in self.depositos}
 
+    @track_operation("StockBackend.refresh_stock")
     def refresh_stock(self):
         if not self.api_stock:
             self.stock_rows = []
@@ -112,6 +122,7 @@ class StockBackend:
             if r.get("RecID")
         }
 
+    @track_operation("StockBackend.refresh_pending")
     def refresh_pending(self):
         """Carga todos los pendientes desde logsAcn_api."""
         try:
@@ -121,7 +132,48 @@ class StockBackend:
             print("[ERROR] refresh_pending:", e)
             self.pending_rows = []
 
+    @track_operation("StockBackend.load_snapshot")
+    def load_snapshot(self) -> Optional[Dict[str, List[Dict]]]:
+        """producto/deposito/stock/logsAcn/imagen en un solo batchGet (None si falla)."""
+        if not self.api_snap:
+            return None
+        try:
+            return self.api_snap.load_cached()
+        except Exception as e:
+            print("[ERROR] load_snapshot:", e)
+            return None
+
+    def apply_snapshot(self, snap: Dict[str, List[Dict]]):
+        """Vuelca un snapshot en los caches (y en los backends de Items/Depósito si están)."""
+        for other in (self.items_backend, self.depo_backend):
+            if other is not None and hasattr(other, "apply_snapshot"):
+                try:
+                    other.apply_snapshot(snap)
+                except Exception as e:
+                    print("[ERROR] apply_snapshot:", e)
+
+        self.productos = list(snap.get("producto") or [])
+        self.prod_by_recid = {p["RecID"]: p for p in self.productos}
+
+        self.depositos = list(snap.get("deposito") or [])
+        self.depo_by_recid = {d["RecID"]: d for d in self.depositos}
+
+        self.stock_rows = list(snap.get("stock") or [])
+        self.stock_rows_by_recid = {
+            r.get("RecID", ""): r
+            for r in self.stock_rows
+            if r.get("RecID")
+        }
+
+        self.pending_rows = list(snap.get("logsAcn") or [])
+
+    @track_operation("StockBackend.refresh_all")
     def refresh_all(self):
+        snap = self.load_snapshot()
+        if snap is not None:
+            self.apply_snapshot(snap)
+            return
+        # fallback: lectura pestaña por pestaña
         self.refresh_products()
         self.refresh_depositos()
         self.refresh_stock()
@@ -199,9 +251,23 @@ class StockBackend:
         except:
             pass
 
+    # -------------------------------------------------
+    # LIMPIEZA (filas en 0 / duplicadas)
+    # -------------------------------------------------
+    @track_operation("StockBackend.gc_stock")
+    def gc_stock(self, dry_run: bool = False) -> Dict[str, int]:
+        """Fusiona duplicados y borra filas en 0 de la pestaña stock (ver StockMaintenance)."""
+        if not (StockMaintenance and self.sheet_id):
+            return {}
+        res = StockMaintenance(self.page, self.sheet_id).collect(dry_run=dry_run)
+        if not dry_run and (res.get("deleted") or res.get("updated")):
+            self._publish("stock_changed", {"op": "gc_stock", **res})
+        return res
+
     # -------------------------------------------------
     # STOCK
     # -------------------------------------------------
+    @track_operation("StockBackend.add_new_stock")
     def add_new_stock(self, item_recid, depo_recid, qty, product_name="", depo_name=""):
         if not self.api_stock:
             return None
@@ -214,6 +280,7 @@ class StockBackend:
         self._publish("stock_changed", {"op": "add_new", "recid": recid})
         return recid
 
+    @track_operation("StockBackend.add_qty")
     def add_qty(self, recid_stock, delta, product_name="", depo_name=""):
         if not self.api_stock:
             return False
@@ -225,6 +292,7 @@ class StockBackend:
         self._publish("stock_changed", {"op": "add_qty", "recid": recid_stock})
         return ok
 
+    @track_operation("StockBackend.descargar")
     def descargar(self, recid_stock, n, product_name="", depo_name=""):
         if not self.api_stock:
             return False
@@ -236,6 +304,7 @@ class StockBackend:
         self._publish("stock_changed", {"op": "descargar", "recid": recid_stock})
         return ok
 
+    @track_operation("StockBackend.move_add_row")
     def move_add_row(self, recid_stock_src, recid_deposito_dest, n,
                      product_name="", origin_name="", dest_name=""):
         if not self.api_stock:
@@ -267,6 +336,7 @@ class StockBackend:
     # -------------------------------------------------------
     # RESTAURAR PENDIENTE
     # -------------------------------------------------------
+    @track_operation("StockBackend.restore_pending")
     def restore_pending(self, recid_log: str, depo_dest_recid: str):
         row = next((r for r in self.pending_rows if r["RecID"] == recid_log), None)
         if not row:
@@ -275,15 +345,11 @@ class StockBackend:
         pid = row["ID_producto"]
         qty = self.safe_int(row.get("cantidad", 0))
 
-        # buscar stock existente
-        existente = next(
-            (s for s in self.stock_rows
-             if s.get("ID_producto") == pid and s.get("ID_deposito") == depo_dest_recid),
-            None
-        )
+        # buscar stock existente (índice compuesto de la capa de datos, O(1))
+        existente = self.api_stock.find_by_prod_and_depo(pid, depo_dest_recid) if self.api_stock else None
 
         if existente:
-            self.add_qty(existente["RecID"], qty)
+            self.add_qty(existente, qty)
         else:
             self.add_new_stock(pid, depo_dest_recid, qty)
 
@@ -296,6 +362,7 @@ class StockBackend:
     # -------------------------------------------------------
     # BORRAR PENDIENTE CON MOTIVO
     # -------------------------------------------------------
+    @track_operation("StockBackend.delete_pending")
     def delete_pending(self, recid_log: str, motivo: str):
         row = next((r for r in self.pending_rows if r["RecID"] == recid_log), None)
         if not row:
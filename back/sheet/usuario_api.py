@@ -74,6 +74,20 @@ class UsuarioAPI(SheetsBase):
         )
         return recid
 
+    def current_rango(self) -> str:
+        """
+        Rango del usuario logueado en esta planilla ("" si no figura). El correo sale del
+        token de page.auth, no de client_storage (que el navegador puede cambiar).
+        """
+        info = self._auth_user_info()
+        email = (info or {}).get("email", "").lower()
+        if not email:
+            return ""
+        for u in self.list():
+            if u["correo_usuario"].lower() == email:
+                return u["rango_usuario"]
+        return ""
+
     # -------------------------- CRUD --------------------------
 
     def list(self) -> List[Dict]:
@@ -81,6 +95,7 @@ class UsuarioAPI(SheetsBase):
         self._ensure()
         rng = f"{self.TAB}!A2:{self._col_letter(len(self.HEADERS))}"
         rows = self._get(rng)
+        self._index_rows(self.TAB, rows)
         out: List[Dict] = []
         for r in rows:
             r = (r + [""] * len(self.HEADERS))[:len(self.HEADERS)]
@@ -99,7 +114,7 @@ class UsuarioAPI(SheetsBase):
         recid = (recid or "").strip()
         if not recid:
             return None
-        return self._find_row_by_col_value(self.TAB, 2, recid)
+        return self._row_by_recid(self.TAB, recid, 2)
 
     def add(self, *, ID_usuario: str, nombre_usuario: str, correo_usuario: str, rango_usuario: str) -> str:
         """
@@ -137,13 +152,10 @@ class UsuarioAPI(SheetsBase):
     ) -> bool:
         """Actualiza campos indicados (None = no cambia)."""
         self._ensure()
-        row = self._find_row_by_recid(recid)
+        row, cur = self._read_row_by_recid(self.TAB, recid, len(self.HEADERS))
         if not row:
             return False
-
         rng = f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
-        cur = (self._get(rng) or [[]])[0]
-        cur += [""] * (len(self.HEADERS) - len(cur))
 
         new_idusr = cur[2] if ID_usuario is None else ID_usuario
         new_nombre = cur[3] if nombre_usuario is None else nombre_usuario
@@ -160,9 +172,9 @@ class UsuarioAPI(SheetsBase):
     def delete_by_recid(self, recid: str) -> bool:
         """Elimina por RecID (col B)."""
         self._ensure()
-        row = self._find_row_by_recid(recid)
+        row, _cur = self._read_row_by_recid(self.TAB, recid, len(self.HEADERS))
         if not row:
             return False
         rng = f"{self.TAB}!A{row}:{self._col_letter(len(self.HEADERS))}{row}"
-        self._clear(rng)
+        self._clear(rng)     # en el lugar, sin correr filas (ver DepositoAPI.delete_by_recid)
         return True
@@ -5,6 +5,7 @@ from datetime import datetime
 from uuid import uuid4
 
 from back.drive.drive_check import build_sheets_service
+from back.sheet.base import SCHEMA_CACHE, SheetsBase, is_range_error
 
 
 class SheetsAPI:
@@ -82,37 +83,61 @@ class SheetsAPI:
 
     def _set(self, a1_range: str, values: List[List[str]], input_opt: str = "USER_ENTERED"):
         body = {"values": values}
-        return self.svc.spreadsheets().values().update(
-            spreadsheetId=self.sheet_id,
-            range=a1_range,
-            valueInputOption=input_opt,
-            body=body,
-        ).execute()
+        try:
+            return self.svc.spreadsheets().values().update(
+                spreadsheetId=self.sheet_id,
+                range=a1_range,
+                valueInputOption=input_opt,
+                body=body,
+            ).execute()
+        except Exception as ex:
+            self._on_range_error(a1_range, ex)
+            raise
 
     def _append(self, a1_range: str, values: List[List[str]], input_opt: str = "USER_ENTERED"):
         body = {"values": values}
-        return self.svc.spreadsheets().values().append(
-            spreadsheetId=self.sheet_id,
-            range=a1_range,
-            valueInputOption=input_opt,
-            insertDataOption="INSERT_ROWS",
-            body=body,
-        ).execute()
+        try:
+            return self.svc.spreadsheets().values().append(
+                spreadsheetId=self.sheet_id,
+                range=a1_range,
+                valueInputOption=input_opt,
+                insertDataOption="INSERT_ROWS",
+                body=body,
+            ).execute()
+        except Exception as ex:
+            self._on_range_error(a1_range, ex)
+            raise
 
     def _clear(self, a1_range: str):
-        return self.svc.spreadsheets().values().clear(
-            spreadsheetId=self.sheet_id, range=a1_range, body={}
-        ).execute()
+        try:
+            return self.svc.spreadsheets().values().clear(
+                spreadsheetId=self.sheet_id, range=a1_range, body={}
+            ).execute()
+        except Exception as ex:
+            self._on_range_error(a1_range, ex)
+            raise
+
+    def _on_range_error(self, a1_range: str, ex: Exception):
+        """Invalida el esquema cacheado de la pestaña si Sheets rechazó el rango."""
+        if is_range_error(ex):
+            tab, _, _ = SheetsBase._split_a1(a1_range)
+            SCHEMA_CACHE.invalidate(self.sheet_id, tab or None)
 
     def _ensure_tab_and_headers(self, tab_name: str, headers: List[str]):
         """
         Crea la pestaña si no existe y escribe encabezados en la fila 1 (idempotente).
+        Comparte SCHEMA_CACHE con SheetsBase: una pestaña verificada no se vuelve a consultar.
         """
-        meta = self.svc.spreadsheets().get(
-            spreadsheetId=self.sheet_id, fields="sheets.properties.title"
-        ).execute()
+        if SCHEMA_CACHE.headers(self.sheet_id, tab_name) is not None:
+            return
 
-        titles = [s["properties"]["title"] for s in meta.get("sheets", [])]
+        titles = SCHEMA_CACHE.tabs(self.sheet_id)
+        if titles is None or tab_name not in titles:
+            meta = self.svc.spreadsheets().get(
+                spreadsheetId=self.sheet_id, fields="sheets.properties(sheetId,title)"
+            ).execute()
+            titles = {s["properties"]["title"]: s["properties"] for s in meta.get("sheets", [])}
+            SCHEMA_CACHE.set_tabs(self.sheet_id, titles)
         needs_create = tab_name not in titles
 
         if needs_create:
@@ -120,10 +145,14 @@ class SheetsAPI:
                 spreadsheetId=self.sheet_id,
                 body={"requests": [{"addSheet": {"properties": {"title": tab_name}}}]},
             ).execute()
+            SCHEMA_CACHE.invalidate(self.sheet_id, tab_name)
 
         existing = self._get(f"{tab_name}!1:1")
         if not existing or not existing[0]:
             self._set(f"{tab_name}!A1:{self._col_letter(len(headers))}1", [headers])
+            SCHEMA_CACHE.set_headers(self.sheet_id, tab_name, headers)
+        else:
+            SCHEMA_CACHE.set_headers(self.sheet_id, tab_name, [str(h).strip() for h in existing[0]])
 
     @staticmethod
     def _col_letter(n: int) -> str:
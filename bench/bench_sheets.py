@@ -0,0 +1,292 @@
+# bench/bench_sheets.py
+"""
+Benchmark de la capa Sheets contra el emulador local (sin cuenta de Google).
+
+Para cada tamaño de dataset (filas de stock) arma un spreadsheet sintético, ejecuta
+las operaciones de los backends y reporta: tiempo, requests HTTP, bytes y pico de
+memoria. Cada operación tiene un presupuesto de requests; si alguno se excede el
+proceso termina con código 1.
+
+    python -m bench.bench_sheets                       # 100 / 10k / 100k filas
+    python -m bench.bench_sheets --sizes 100,10000 --latency 0.15 --json out.json
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+from back.integrations.google_emulator import GoogleEmulator
+from back.sheet.scheduler import SCHEDULER
+from back.sheet.stock_api import StockAPI
+from back.sheet.producto_api import ProductoAPI
+from back.sheet.deposito_api import DepositoAPI
+from back.sheet.logsAcn_api import LogsAcnAPI
+from back.sheet.imagen_api import ImagenAPI
+from back.sheet.log_api import LogAPI, LogPager, configure_log_buffer, flush_logs
+from back.sheet.maintenance import SheetMaintenance
+from back.sheets_ops import DEFAULT_SHEET_DATA
+from back.sheet.tabGestor.tabStock.tabBackStock import StockBackend
+from back.sheet.tabGestor.tabItems.tabBackItems import ItemsBackend
+from back.sheet.tabGestor.tabDeposito.tabBackDeposito import DepositoBackend
+
+DEFAULT_SIZES = (100, 10_000, 100_000)
+N_DEPOSITOS = 10
+
+# Presupuesto de requests HTTP por operación (estado "tibio": esquema ya verificado,
+# salvo las marcadas como cold). Las filas de 'logs' de los backends quedan en la cola
+# del LogAPI y se cuentan en "flush_logs" (un solo append para todas).
+# Los refrescos incluyen el files.get de Drive que decide qué pestañas releer.
+BUDGETS: Dict[str, int] = {
+    "StockBackend.refresh_all (cold)": 3,
+    "StockBackend.refresh_all": 1,
+    "StockBackend.refresh_all (after write)": 2,
+    "StockAPI.add_qty": 2,
+    "StockBackend.add_qty": 2,
+    "StockBackend.descargar": 2,
+    "StockBackend.add_new_stock": 1,
+    "StockBackend.move_add_row": 4,   # destino nuevo: + files.get que confirma el índice
+    "StockBackend.restore_pending": 7,
+    "ItemsBackend.refresh_items": 2,
+    "DepositoBackend.delete": 6,
+    "SheetMaintenance.compact": 3,
+    "StockBackend.gc_stock": 3,
+    "flush_logs": 1,
+    "LogAPI.append": 1,
+    "LogAPI.append (new instance)": 3,
+    "LogAPI.append (buffered)": 0,
+    "LogPager.open": 2,
+    "LogPager.newer": 1,
+}
+
+
+# ------------------------------------------------------------------
+#  Página falsa (lo mínimo que leen los backends)
+# ------------------------------------------------------------------
+class _Store(dict):
+    def get(self, key, default=None):
+        return dict.get(self, key, default)
+
+    def set(self, key, value):
+        self[key] = value
+
+    def contains_key(self, key):
+        return key in self
+
+
+def fake_page(sheet_id: str):
+    return SimpleNamespace(
+        auth=SimpleNamespace(
+            user={"id": "bench-user", "email": "bench@local"},
+            token=SimpleNamespace(access_token="bench-token", refresh_token=None, id_token=None, expires_at=None),
+        ),
+        session=_Store(user_name="Bench"),
+        client_storage=_Store(active_sheet_id=sheet_id, user_name="Bench"),
+        update=lambda *a, **k: None,
+    )
+
+
+# ------------------------------------------------------------------
+#  Dataset sintético
+# ------------------------------------------------------------------
+def build_dataset(emu: GoogleEmulator, n_stock: int) -> str:
+    """
+    stock: n filas con pares (producto, depósito) únicos, 1 de cada 50 en 0, más n/100 filas
+    duplicadas al final; producto: n/10; deposito: 10 (+1 vacío).
+    """
+    n_prod = max(1, n_stock // N_DEPOSITOS)
+    n_pend = max(5, n_stock // 100)
+    n_dup = max(1, n_stock // 100)
+    prod_headers = ProductoAPI.HEADERS_BASE + [ProductoAPI.DEFAULT_IMG_HEADER]
+    tabs = {
+        "stock": [StockAPI.HEADERS] + [
+            ["", f"s{i:07d}", f"p{i % n_prod}", f"d{(i // n_prod) % N_DEPOSITOS}",
+             "0" if i % 50 == 49 else str(1 + i % 9)]
+            for i in range(n_stock)
+        ] + [
+            ["", f"sd{i:06d}", f"p{(i * 7) % n_prod}", f"d{((i * 7) // n_prod) % N_DEPOSITOS}", "1"]
+            for i in range(n_dup)
+        ],
+        "producto": [prod_headers] + [
+            ["", f"p{j}", f"C{j:06d}", f"Producto {j}", f"Descripción del producto {j}",
+             f"i{j}" if j % 2 == 0 else ""]
+            for j in range(n_prod)
+        ],
+        "deposito": [DepositoAPI.HEADERS] + [
+            ["", f"d{k}", f"D{k:03d}", f"Depósito {k}", f"Calle {k}", "", ""]
+            for k in range(N_DEPOSITOS)
+        ] + [["", "dX", "DX", "Depósito vacío", "", "", "iX"]],
+        # cada 10 pendientes, una fila vacía (bajas viejas hechas con values.clear)
+        "logsAcn": [LogsAcnAPI.HEADERS] + [
+            ["", f"L{k}", f"p{k % n_prod}", f"d{k % N_DEPOSITOS}", "2", "salida", "pendiente"]
+            if k % 10 else [""] * len(LogsAcnAPI.HEADERS)
+            for k in range(n_pend)
+        ],
+        "imagen": [ImagenAPI.HEADERS] + [
+            ["", f"i{j}", f"https://drive.google.com/file/d/F{j}/view"] for j in range(0, n_prod, 2)
+        ] + [["", "iX", "https://drive.google.com/file/d/FX/view"]],
+        "logs": [DEFAULT_SHEET_DATA["logs"]],
+        "usuarios": [DEFAULT_SHEET_DATA["usuarios"]],
+        "dataIndexInfo": [DEFAULT_SHEET_DATA["dataIndexInfo"]],
+    }
+    return emu.create_spreadsheet(f"bench-{n_stock}", tabs)
+
+
+# ------------------------------------------------------------------
+#  Medición
+# ------------------------------------------------------------------
+def measure(emu: GoogleEmulator, name: str, fn: Callable[[], object], *,
+            track_memory: bool = True, verbose: bool = False) -> Dict:
+    emu.reset_stats()
+    if track_memory:
+        tracemalloc.start()
+    out = io.StringIO()
+    t0 = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(sys.stdout if verbose else out):
+            result = fn()
+        error = ""
+    except Exception as ex:
+        result, error = None, f"{type(ex).__name__}: {ex}"
+    elapsed = time.perf_counter() - t0
+    peak = 0
+    if track_memory:
+        _cur, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    tot = emu.totals()
+    budget = BUDGETS.get(name)
+    ok = (not error) and (budget is None or tot["requests"] <= budget)
+    return {
+        "op": name,
+        "seconds": round(elapsed, 4),
+        "requests": tot["requests"],
+        "bytes_sent": tot["bytes_sent"],
+        "bytes_received": tot["bytes_received"],
+        "peak_kib": round(peak / 1024, 1),
+        "budget": budget,
+        "ok": ok,
+        "error": error,
+        "result": repr(result)[:60],
+        "calls": [m for m, _ in emu.calls],
+    }
+
+
+def run_size(n_stock: int, latency: float = 0.0, track_memory: bool = True,
+             verbose: bool = False) -> List[Dict]:
+    emu = GoogleEmulator(latency=latency).install()
+    try:
+        sid = build_dataset(emu, n_stock)
+        page = fake_page(sid)
+        res: List[Dict] = []
+
+        def m(name, fn):
+            res.append(measure(emu, name, fn, track_memory=track_memory, verbose=verbose))
+
+        items = ItemsBackend(page)
+        depos = DepositoBackend(page)
+        stock = StockBackend(page, items_backend=items, depo_backend=depos)
+
+        m("StockBackend.refresh_all (cold)", stock.refresh_all)
+        m("StockBackend.refresh_all", stock.refresh_all)
+
+        # La hoja 'logs' ya verificada (estado normal después del primer movimiento)
+        if stock.logger:
+            stock.logger._ensure_logs_sheet()
+
+        m("StockAPI.add_qty", lambda: stock.api_stock.add_qty("s0000001", 1))
+        m("StockBackend.add_qty", lambda: stock.add_qty("s0000002", 1, "P", "D"))
+        m("StockBackend.refresh_all (after write)", stock.refresh_all)
+        m("StockBackend.descargar", lambda: stock.descargar("s0000003", 1, "P", "D"))
+        m("StockBackend.add_new_stock", lambda: stock.add_new_stock("p0", "dX", 4, "P", "DX"))
+        m("StockBackend.move_add_row", lambda: stock.move_add_row("s0000004", "dX", 1, "P", "D", "DX"))
+        m("StockBackend.restore_pending", lambda: stock.restore_pending("L1", "d9"))
+        m("ItemsBackend.refresh_items", items.refresh_items)
+
+        depos.refresh_all()
+        m("DepositoBackend.delete", lambda: depos.delete("dX"))
+
+        m("SheetMaintenance.compact", SheetMaintenance(page, sid).compact)
+        m("StockBackend.gc_stock", stock.gc_stock)
+        m("flush_logs", lambda: flush_logs(sid))
+
+        log = LogAPI(page, sid, buffered=False)
+        log._ensure_logs_sheet()
+        m("LogAPI.append", lambda: log.append("bench"))
+        m("LogAPI.append (new instance)", lambda: LogAPI(page, sid, buffered=False).append("bench"))
+        m("LogAPI.append (buffered)", lambda: LogAPI(page, sid, buffered=True).append("bench"))
+        flush_logs(sid)
+
+        pager = LogPager(LogAPI(page, sid, buffered=False))
+        m("LogPager.open", pager.open)
+        log.append("bench")
+        m("LogPager.newer", pager.newer)
+
+        for r in res:
+            r["rows"] = n_stock
+        return res
+    finally:
+        emu.uninstall()
+
+
+def _fmt_bytes(n: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GiB"
+
+
+def print_table(results: List[Dict]):
+    hdr = f"{'rows':>7}  {'operation':<40} {'time(s)':>8} {'req':>4} {'budget':>6} {'sent':>8} {'recv':>8} {'peak':>9}  status"
+    print(hdr)
+    print("-" * len(hdr))
+    for r in results:
+        status = "ok" if r["ok"] else ("ERROR " + r["error"] if r["error"] else "OVER BUDGET")
+        print(f"{r['rows']:>7}  {r['op']:<40} {r['seconds']:>8.3f} {r['requests']:>4} "
+              f"{(r['budget'] if r['budget'] is not None else '-'):>6} {_fmt_bytes(r['bytes_sent']):>8} "
+              f"{_fmt_bytes(r['bytes_received']):>8} {r['peak_kib']:>7.0f}Ki  {status}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark de la capa Sheets (emulador local)")
+    ap.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                    help="filas de stock por dataset, separadas por coma")
+    ap.add_argument("--latency", type=float, default=0.0, help="latencia simulada por request (s)")
+    ap.add_argument("--no-memory", action="store_true", help="no medir memoria (tracemalloc)")
+    ap.add_argument("--json", default="", help="guardar resultados en este archivo")
+    ap.add_argument("--verbose", action="store_true", help="mostrar la salida de los backends")
+    args = ap.parse_args(argv)
+
+    # Sin límite de cuota: se mide la capa, no la espera del token bucket
+    SCHEDULER.configure(rpm_read=1e9, rpm_write=1e9)
+    # La cola de logs sólo se vacía en "flush_logs": el hilo no se mete en otras mediciones
+    configure_log_buffer(flush_rows=10**9, flush_seconds=3600)
+
+    results: List[Dict] = []
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        results.extend(run_size(size, latency=args.latency,
+                                track_memory=not args.no_memory, verbose=args.verbose))
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    failed = [r for r in results if not r["ok"]]
+    if failed:
+        print(f"\n{len(failed)} operación(es) fuera de presupuesto o con error:", file=sys.stderr)
+        for r in failed:
+            print(f"  [{r['rows']}] {r['op']}: {r['requests']} requests (budget {r['budget']}) "
+                  f"{r['error']} calls={r['calls']}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
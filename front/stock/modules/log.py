@@ -1,13 +1,35 @@
 # front/stock/modules/log.py
 import flet as ft
-from typing import List, Dict
-from back.drive.drive_check import build_sheets_service
-from datetime import datetime
+from typing import List, Dict, Optional
+from back.integrations.api_metrics import track_operation
+from back.sheet.log_api import LogAPI, LogPager, flush_logs
+from back.sheet.log_store import LogEntry, LogStore
+from datetime import date, datetime
 
 RED = "#E53935"
 WHITE = ft.Colors.WHITE
 BG = ft.Colors.GREY_50
-LOG_SHEET = "logs"   # columnas: data_ini_prox | fecha | ID_usuario | Accion
+# Rango de fechas del visor -> meses hacia atrás desde el actual (None = todo)
+RANGES = {
+    "1m": ("Este mes", 0),
+    "3m": ("Últimos 3 meses", 2),
+    "12m": ("Últimos 12 meses", 11),
+    "all": ("Todo", None),
+}
+PAGE_ROWS = 50      # filas de la tabla que se dibujan a la vez
+FETCH_ROWS = 200    # filas que se piden a Sheets por página ("Cargar más")
+
+
+def _range_start(key: str) -> Optional[date]:
+    back = RANGES.get(key, RANGES["3m"])[1]
+    if back is None:
+        return None
+    t = date.today()
+    y, m = t.year, t.month - back
+    while m <= 0:
+        m += 12
+        y -= 1
+    return date(y, m, 1)
 
 
 def log_view(page: ft.Page) -> ft.Control:
@@ -23,19 +45,24 @@ def log_view(page: ft.Page) -> ft.Control:
             content=ft.Text("Elegí un Sheet para ver el log.", size=18, color=ft.Colors.RED),
         )
 
-    svc = build_sheets_service(page)
+    api = LogAPI(page, sheet_id, buffered=False)
 
     # Estado
-    logs: List[Dict] = []       # [{"fecha": str, "responsable": str, "accion": str}, ...]
-    filtered: List[Dict] = []
+    store = LogStore()          # filas decodificadas una vez + índice por fecha
+    filtered: List[LogEntry] = []
+    pager: Dict[str, Optional[LogPager]] = {"value": None}
 
     # sort_mode: 'date_asc' | 'date_desc' | 'resp_asc' | 'resp_desc'
     sort_mode = {"value": "date_desc"}
+    load_gen = {"value": 0}
+    page_idx = {"value": 0}
+    busy = {"value": False}
 
     status_txt = ft.Text("", size=12, color=ft.Colors.GREY_600)
+    page_lbl = ft.Text("", size=12, color=ft.Colors.GREY_700)
 
     search = ft.TextField(
-        hint_text="Buscar por acción...",
+        hint_text="Buscar en acción o responsable...",
         prefix_icon=ft.Icons.SEARCH,
         filled=True,
         bgcolor=WHITE,
@@ -74,92 +101,178 @@ def log_view(page: ft.Page) -> ft.Control:
         show_checkbox_column=False,
     )
 
-    def _parse_date(s: str):
-        """Devuelve (timestamp, texto_normalizado) para ordenar de forma robusta."""
-        s = (s or "").strip()
-        # Try varios formatos comunes
-        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y"):
-            try:
-                dt = datetime.strptime(s, fmt)
-                return dt.timestamp(), s
-            except Exception:
-                continue
-        # Si no parsea, lo empujamos al final/ principio según orden usando None
-        return None, s
-
-    def _read_logs() -> List[Dict]:
+    range_dd = ft.Dropdown(
+        width=190,
+        value="3m",
+        dense=True,
+        options=[ft.dropdown.Option(k, label) for k, (label, _m) in RANGES.items()],
+        on_change=lambda _: _load(),
+    )
+
+    ALL_USERS = "*"
+    user_dd = ft.Dropdown(
+        width=190,
+        value=ALL_USERS,
+        dense=True,
+        options=[ft.dropdown.Option(ALL_USERS, "Todos")],
+        on_change=lambda _: _apply_filter_and_sort(),
+    )
+
+    @track_operation("LogView.read_logs")
+    def _read_logs(step: str, pg: Optional[LogPager] = None) -> List[List[str]]:
         """
-        Lee logs!B2:D (B: fecha, C: ID_usuario, D: Accion)
-        y devuelve lista con fecha/responsable/accion.
+        Lee una página del log (B: fecha, C: ID_usuario, D: Accion) con el LogPager:
+        'open' = las últimas filas, 'older' = la página anterior, 'newer' = lo escrito
+        desde la última lectura.
         """
+        pg = pg or pager["value"]
+        if pg is None:
+            return []
         try:
-            resp = svc.spreadsheets().values().get(
-                spreadsheetId=sheet_id,
-                range=f"{LOG_SHEET}!B2:D",
-            ).execute()
-            rows = resp.get("values", []) or []
-            out: List[Dict] = []
-            for r in rows:
-                # r = [fecha, id_usuario, accion]
-                fecha = (r[0].strip() if len(r) > 0 else "")
-                responsable = (r[1].strip() if len(r) > 1 else "")
-                accion = (r[2].strip() if len(r) > 2 else "")
-                if fecha or responsable or accion:
-                    out.append({"fecha": fecha, "responsable": responsable, "accion": accion})
-            return out
+            # (pestaña, fila, [fecha, id_usuario, accion]) -> [fecha, id_usuario, accion]
+            return [r for _tab, _row, r in getattr(pg, step)()]
         except Exception as ex:
             # Si la hoja no existe o hay error, mostramos vacío y el estado indica error
-            status_txt.value = f"No se pudo leer '{LOG_SHEET}': {ex}"
-            page.update()
+            status_txt.value = f"No se pudo leer el log: {ex}"
             return []
 
+    def _load():
+        """Abre el rango elegido: sólo se leen las últimas FETCH_ROWS filas (en segundo plano)."""
+        load_gen["value"] += 1
+        gen = load_gen["value"]
+        status_txt.value = ""
+        pager["value"] = None
+        page_idx["value"] = 0
+        store.clear()
+        busy["value"] = True
+        _apply_filter_and_sort()
+
+        async def _work():
+            import asyncio
+            # lo encolado por esta sesión tiene que aparecer en la lista
+            await asyncio.to_thread(flush_logs, sheet_id, 3.0)
+            pg = LogPager(api, since=_range_start(range_dd.value), page_size=FETCH_ROWS)
+            rows = await asyncio.to_thread(_read_logs, "open", pg)
+            if gen != load_gen["value"]:
+                return      # cambiaron el rango mientras tanto
+            busy["value"] = False
+            pager["value"] = pg
+            store.add(rows)
+            _apply_filter_and_sort()
+            if len(store) < PAGE_ROWS and _has_more():
+                # principio de mes: se completa la primera página con el mes anterior
+                _fetch("older", then_page=0)
+
+        page.run_task(_work)
+
+    def _fetch(step: str, then_page: Optional[int] = None):
+        """older / newer en segundo plano; el resultado se suma a lo ya cargado."""
+        if busy["value"] or pager["value"] is None:
+            return
+        busy["value"] = True
+        gen = load_gen["value"]
+        _update_pager_controls()
+        page.update()
+
+        async def _work():
+            import asyncio
+            if step == "newer":
+                await asyncio.to_thread(flush_logs, sheet_id, 3.0)
+            rows = await asyncio.to_thread(_read_logs, step)
+            if gen != load_gen["value"]:
+                return      # cambiaron el rango mientras tanto (el _load nuevo maneja busy)
+            busy["value"] = False
+            store.add(rows, older=(step == "older"))
+            if then_page is not None:
+                page_idx["value"] = then_page
+            _apply_filter_and_sort(keep_page=True)
+
+        page.run_task(_work)
+
+    def _pages() -> int:
+        return max(1, (len(filtered) + PAGE_ROWS - 1) // PAGE_ROWS)
+
+    def _has_more() -> bool:
+        pg = pager["value"]
+        return bool(pg) and not pg.exhausted
+
+    def _update_pager_controls():
+        n = _pages()
+        page_lbl.value = f"Página {page_idx['value'] + 1} de {n}" + ("+" if _has_more() else "")
+        prev_btn.disabled = page_idx["value"] <= 0
+        next_btn.disabled = busy["value"] or (page_idx["value"] >= n - 1 and not _has_more())
+        more_btn.disabled = busy["value"] or not _has_more()
+        new_btn.disabled = busy["value"]
+
     def _refresh_table():
+        # Sólo se dibuja la página visible
+        n = _pages()
+        page_idx["value"] = min(max(0, page_idx["value"]), n - 1)
+        start = page_idx["value"] * PAGE_ROWS
         table.rows = [
             ft.DataRow(
                 cells=[
-                    ft.DataCell(ft.Text(r.get("fecha", ""))),
-                    ft.DataCell(ft.Text(r.get("responsable", ""))),
-                    ft.DataCell(ft.Text(r.get("accion", ""))),
+                    ft.DataCell(ft.Text(e.display_date)),
+                    ft.DataCell(ft.Text(e.user)),
+                    ft.DataCell(ft.Text(e.action)),
                 ]
             )
-            for r in filtered
+            for e in filtered[start:start + PAGE_ROWS]
         ]
-        status_txt.value = f"Registros: {len(logs)} | Filtrados: {len(filtered)}"
+        pg = pager["value"]
+        hint = pg.total_hint() if pg and not pg.exhausted else None
+        total = f" de {hint}" if hint is not None else ""
+        if not (status_txt.value or "").startswith("No se pudo"):
+            status_txt.value = f"Registros: {len(store)}{total} | Filtrados: {len(filtered)}"
+        _update_pager_controls()
         page.update()
 
-    def _apply_filter_and_sort():
-        # filtro por acción
-        q = (search.value or "").strip().lower()
-        filtered.clear()
-        if not q:
-            filtered.extend(logs)
-        else:
-            filtered.extend([r for r in logs if q in (r.get("accion", "").lower())])
+    def _sync_users():
+        names = store.users()
+        if [o.key for o in user_dd.options[1:]] == names:
+            return
+        user_dd.options = [ft.dropdown.Option(ALL_USERS, "Todos")] + [ft.dropdown.Option(n) for n in names]
+        if user_dd.value != ALL_USERS and user_dd.value not in names:
+            user_dd.value = ALL_USERS
+
+    def _apply_filter_and_sort(keep_page: bool = False):
+        # búsqueda en el índice invertido (términos AND, sin tildes) + responsable + rango
+        _sync_users()
+        since = _range_start(range_dd.value)
+        since_ts = datetime(since.year, since.month, since.day).timestamp() if since else None
+        user = user_dd.value if user_dd.value != ALL_USERS else None
 
-        # sort
+        # sort: por fecha sale ordenado del índice; por responsable, orden estable sobre eso
         mode = sort_mode["value"]
-        if mode.startswith("date_"):
-            # Orden por fecha usando timestamp; None va al final en asc y al principio en desc
-            with_keys = []
-            for r in filtered:
-                ts, _ = _parse_date(r.get("fecha", ""))
-                with_keys.append((ts, r))
-            if mode == "date_asc":
-                with_keys.sort(key=lambda t: (t[0] is None, t[0]))
-            else:  # date_desc
-                with_keys.sort(key=lambda t: (t[0] is None, -(t[0] or 0)))
-            filtered[:] = [r for _, r in with_keys]
-        else:
-            key = (lambda r: (r.get("responsable", "") or "").lower())
-            reverse = (mode == "resp_desc")
-            filtered.sort(key=key, reverse=reverse)
+        rows = store.search(search.value or "", user=user, since=since_ts, desc=(mode != "date_asc"))
+        if mode in ("resp_asc", "resp_desc"):
+            rows = store.by_user(rows, desc=(mode == "resp_desc"))
+        filtered[:] = rows
 
+        if not keep_page:
+            page_idx["value"] = 0
         _refresh_table()
 
     def _set_sort(mode: str):
         sort_mode["value"] = mode
         _apply_filter_and_sort()
 
+    def _go(delta: int):
+        target = page_idx["value"] + delta
+        if target >= _pages() and _has_more():
+            # no hay más filas cargadas: se pide la página anterior del log
+            _fetch("older", then_page=target)
+            return
+        page_idx["value"] = target
+        _refresh_table()
+
+    prev_btn = ft.IconButton(ft.Icons.CHEVRON_LEFT, tooltip="Página anterior", on_click=lambda _: _go(-1))
+    next_btn = ft.IconButton(ft.Icons.CHEVRON_RIGHT, tooltip="Página siguiente", on_click=lambda _: _go(1))
+    more_btn = ft.TextButton("Cargar más antiguos", icon=ft.Icons.HISTORY,
+                             on_click=lambda _: _fetch("older", then_page=page_idx["value"]))
+    new_btn = ft.IconButton(ft.Icons.REFRESH, tooltip="Traer registros nuevos",
+                            on_click=lambda _: _fetch("newer", then_page=page_idx["value"]))
+
     # Layout
     header_row = ft.Row(
         alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
@@ -171,7 +284,12 @@ def log_view(page: ft.Page) -> ft.Control:
     search_row = ft.Row(
         alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
         spacing=8,
-        controls=[search, sort_btn],
+        controls=[search, user_dd, range_dd, sort_btn, new_btn],
+    )
+    pager_row = ft.Row(
+        alignment=ft.MainAxisAlignment.END,
+        spacing=4,
+        controls=[more_btn, ft.Container(width=12), prev_btn, page_lbl, next_btn],
     )
 
     root = ft.Container(
@@ -192,13 +310,12 @@ def log_view(page: ft.Page) -> ft.Control:
                     padding=8,
                     content=ft.ListView(expand=True, controls=[table]),
                 ),
+                pager_row,
             ],
         ),
     )
 
     # Carga inicial
-    logs[:] = _read_logs()
-    filtered[:] = list(logs)
-    _apply_filter_and_sort()
+    _load()
 
     return root
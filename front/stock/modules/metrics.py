@@ -0,0 +1,280 @@
+# front/stock/modules/metrics.py
+import flet as ft
+import json
+import os
+import secrets
+import shutil
+import threading
+import time
+
+from back.integrations.api_metrics import METRICS
+from back.image.image_service import get_image_service, ASSETS_DIR
+from back.sheet.maintenance import compact_spreadsheet, collect_stock_garbage
+from back.sheet.usuario_api import UsuarioAPI
+
+RED = "#E53935"
+WHITE = ft.Colors.WHITE
+TXT_MUTED = ft.Colors.BLUE_GREY_600
+
+# Export: archivo de un solo uso bajo assets/ (nombre al azar) que se borra a los EXPORT_TTL s
+EXPORT_SUBDIR = "exports"
+EXPORT_TTL = 120
+
+
+def _fmt_bytes(n: int) -> str:
+    n = float(n or 0)
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def _short(sheet_id: str) -> str:
+    return (sheet_id[:8] + "…") if len(sheet_id or "") > 10 else (sheet_id or "-")
+
+
+def _is_admin(page: ft.Page, sheet_id: str) -> bool:
+    if not sheet_id:
+        return False
+    try:
+        return UsuarioAPI(page, sheet_id).current_rango().strip().lower() == "administrador"
+    except Exception as ex:
+        print(f"[metrics] no se pudo verificar el rango: {ex}", flush=True)
+        return False
+
+
+def _offer_download(page: ft.Page, name: str, data: str):
+    """Descarga en el navegador: carpeta con token al azar, borrada a los EXPORT_TTL segundos."""
+    token = secrets.token_urlsafe(24)
+    folder = os.path.join(ASSETS_DIR, EXPORT_SUBDIR, token)
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+        f.write(data)
+    threading.Timer(EXPORT_TTL, shutil.rmtree, args=(folder,), kwargs={"ignore_errors": True}).start()
+    page.launch_url(f"/{EXPORT_SUBDIR}/{token}/{name}", web_window_name="_blank")
+
+
+def metrics_view(page: ft.Page) -> ft.Control:
+    """Panel oculto (sólo Administrador): p50/p95 de esta planilla, últimos requests y export JSON."""
+    sheet_id = page.client_storage.get("active_sheet_id") or ""
+    if not _is_admin(page, sheet_id):
+        return ft.Container(
+            padding=20,
+            content=ft.Text("Las métricas sólo están disponibles para el Administrador de la planilla.",
+                            color=TXT_MUTED),
+        )
+    status_txt = ft.Text("", size=12, color=ft.Colors.GREY_600)
+    maint_txt = ft.Text("", size=12, color=ft.Colors.GREY_600)
+    img_txt = ft.Text("", size=12, color=ft.Colors.GREY_600)
+
+    ops_table = ft.DataTable(
+        column_spacing=18,
+        heading_row_height=36,
+        data_row_min_height=32,
+        columns=[ft.DataColumn(ft.Text(h)) for h in (
+            "Operación", "Sheet", "Acciones", "p50", "p95", "Requests",
+            "p50 req", "p95 req", "Reint.", "Errores", "Enviado", "Recibido",
+        )],
+        rows=[],
+    )
+    recent_table = ft.DataTable(
+        column_spacing=18,
+        heading_row_height=36,
+        data_row_min_height=28,
+        columns=[ft.DataColumn(ft.Text(h)) for h in (
+            "Hora", "Operación", "Método", "Rango", "Status", "Intento", "ms", "Tamaño",
+        )],
+        rows=[],
+    )
+
+    def _cell(v) -> ft.DataCell:
+        return ft.DataCell(ft.Text(str(v), size=12))
+
+    def _snapshot():
+        # sólo lo de esta planilla: el registro de métricas es de todo el proceso
+        snap = METRICS.snapshot()
+        snap["operations"] = [o for o in snap["operations"] if o["sheet_id"] == sheet_id]
+        snap["recent"] = [r for r in snap["recent"] if r.get("sheet") == sheet_id]
+        return snap
+
+    def _fill():
+        snap = _snapshot()
+        ops_table.rows = [
+            ft.DataRow(cells=[
+                _cell(o["operation"]),
+                _cell(_short(o["sheet_id"])),
+                _cell(o["action"]["count"] or "-"),
+                _cell(f'{o["action"]["p50_ms"]:.0f} ms' if o["action"]["count"] else "-"),
+                _cell(f'{o["action"]["p95_ms"]:.0f} ms' if o["action"]["count"] else "-"),
+                _cell(o["request"]["count"]),
+                _cell(f'{o["request"]["p50_ms"]:.0f} ms' if o["request"]["count"] else "-"),
+                _cell(f'{o["request"]["p95_ms"]:.0f} ms' if o["request"]["count"] else "-"),
+                _cell(o["retries"]),
+                _cell(o["request_errors"] + o["action_errors"]),
+                _cell(_fmt_bytes(o["bytes_sent"])),
+                _cell(_fmt_bytes(o["bytes_received"])),
+            ])
+            for o in snap["operations"]
+        ]
+        recent_table.rows = [
+            ft.DataRow(cells=[
+                _cell(time.strftime("%H:%M:%S", time.localtime(r["ts"]))),
+                _cell(r["op"]),
+                _cell(r["method"]),
+                _cell((r["range"] or "")[:40]),
+                _cell(r["status"] or "red"),
+                _cell(r["attempt"]),
+                _cell(f'{r["ms"]:.0f}'),
+                _cell(_fmt_bytes(r["sent"] + r["recv"])),
+            ])
+            for r in reversed(snap["recent"][-40:])
+        ]
+        status_txt.value = (
+            f"{len(snap['operations'])} operaciones · "
+            f"{sum(o['request']['count'] for o in snap['operations'])} requests desde "
+            f"{time.strftime('%d/%m %H:%M', time.localtime(snap['since']))}"
+        )
+        svc = get_image_service()
+        img = svc.session_stats(getattr(page, "session_id", None))
+        cache = svc.cache.stats()
+        img_txt.value = (
+            f"Esta sesión: {img['requests']} pedidos · {img['hit_rate'] * 100:.0f}% desde cache "
+            f"({img['mem_hits']} memoria, {img['disk_hits']} disco, {img['deduped']} compartidos) · "
+            f"{img['downloads']} descargas ({_fmt_bytes(img['download_bytes'])}) · "
+            f"{img['failures'] + img['negative_hits']} fallidas | "
+            f"Cache: {cache['items']} en memoria ({_fmt_bytes(cache['mem_bytes'])}), "
+            f"{_fmt_bytes(cache['disk_bytes'])} en disco"
+        )
+
+    def _refresh(_=None):
+        _fill()
+        page.update()
+
+    def _export(_=None):
+        name = time.strftime("api_metrics_%Y%m%d_%H%M%S.json")
+        try:
+            data = json.dumps(_snapshot(), ensure_ascii=False, indent=2)
+            _offer_download(page, name, data)
+            status_txt.value = f"Exportado: {name}"
+        except Exception as ex:
+            status_txt.value = f"No se pudo exportar: {ex}"
+        page.update()
+
+    def _reset(_=None):
+        METRICS.reset(sheet_id)   # los contadores de otros spreadsheets no se tocan
+        _refresh()
+
+    def _confirm(title: str, run):
+        # compactar / limpiar borran filas: sólo con la planilla sin nadie editando
+        btn_yes = ft.FilledButton(title, style=ft.ButtonStyle(bgcolor=RED, color=WHITE))
+        btn_no = ft.OutlinedButton("Cancelar")
+        dlg = ft.AlertDialog(
+            modal=True,
+            title=ft.Text(title),
+            content=ft.Text(
+                "Borra filas de la planilla. Si otra persona está editando al mismo tiempo, "
+                "sus cambios pueden perderse o quedar en otra fila. ¿Nadie más está usando la planilla?"
+            ),
+            actions=[btn_no, btn_yes],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+
+        def _close(_=None):
+            page.close(dlg)
+
+        def _yes(_=None):
+            page.close(dlg)
+            run()
+
+        btn_no.on_click = _close
+        btn_yes.on_click = _yes
+        page.open(dlg)
+
+    def _compact(_=None):
+        if not sheet_id:
+            return
+        maint_txt.value = "Compactando…"
+        page.update()
+
+        async def _work():
+            import asyncio
+            try:
+                res = await asyncio.to_thread(compact_spreadsheet, page, sheet_id)
+                maint_txt.value = (
+                    "Filas vacías borradas: " + ", ".join(f"{t}: {n}" for t, n in res.items())
+                    if res else "No había filas vacías."
+                )
+            except Exception as ex:
+                maint_txt.value = f"No se pudo compactar: {ex}"
+            _refresh()
+
+        page.run_task(_work)
+
+    def _gc_stock(_=None):
+        if not sheet_id:
+            return
+        maint_txt.value = "Limpiando stock…"
+        page.update()
+
+        async def _work():
+            import asyncio
+            try:
+                res = await asyncio.to_thread(collect_stock_garbage, page, sheet_id)
+                if res.get("skipped"):
+                    maint_txt.value = "La pestaña stock cambió mientras se revisaba; probá de nuevo."
+                else:
+                    maint_txt.value = (
+                        f"Stock: {res['deleted']} filas borradas ({res['merged']} duplicadas), "
+                        f"{res['updated']} cantidades actualizadas, "
+                        f"{res['kept']} conservadas por pendientes."
+                    )
+            except Exception as ex:
+                maint_txt.value = f"No se pudo limpiar el stock: {ex}"
+            _refresh()
+
+        page.run_task(_work)
+
+    toolbar = ft.Row(
+        spacing=8,
+        controls=[
+            ft.Text("Métricas de API", size=20, weight=ft.FontWeight.W_700),
+            ft.Container(expand=True),
+            ft.IconButton(ft.Icons.REFRESH, tooltip="Actualizar", on_click=_refresh),
+            ft.IconButton(ft.Icons.DOWNLOAD, tooltip="Exportar JSON", on_click=_export),
+            ft.IconButton(ft.Icons.DELETE_SWEEP_OUTLINED, tooltip="Reiniciar contadores de esta planilla", on_click=_reset),
+        ],
+    )
+
+    root = ft.Column(
+        expand=True,
+        scroll=ft.ScrollMode.AUTO,
+        spacing=10,
+        controls=[
+            toolbar,
+            status_txt,
+            ft.Text("Por acción y spreadsheet (p50 / p95 de la acción completa y de cada request)",
+                    size=12, color=TXT_MUTED),
+            ft.Row([ops_table], scroll=ft.ScrollMode.AUTO),
+            ft.Divider(height=1, color=ft.Colors.GREY_200),
+            ft.Text("Últimos requests", size=14, weight=ft.FontWeight.W_600),
+            ft.Row([recent_table], scroll=ft.ScrollMode.AUTO),
+            ft.Divider(height=1, color=ft.Colors.GREY_200),
+            ft.Text("Imágenes", size=14, weight=ft.FontWeight.W_600),
+            img_txt,
+            ft.Divider(height=1, color=ft.Colors.GREY_200),
+            ft.Text("Mantenimiento", size=14, weight=ft.FontWeight.W_600),
+            ft.Row([
+                ft.OutlinedButton("Compactar pestañas", icon=ft.Icons.COMPRESS,
+                                  on_click=lambda _: _confirm("Compactar pestañas", _compact),
+                                  disabled=not sheet_id),
+                ft.OutlinedButton("Limpiar stock", icon=ft.Icons.CLEANING_SERVICES_OUTLINED,
+                                  on_click=lambda _: _confirm("Limpiar stock", _gc_stock),
+                                  disabled=not sheet_id),
+                maint_txt,
+            ]),
+        ],
+    )
+
+    _fill()
+    return root
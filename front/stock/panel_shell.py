@@ -1,6 +1,9 @@
 import flet as ft
 import inspect
 
+from back.drive.service_pool import page_identity
+from back.sheet.log_api import flush_logs
+
 # Intentamos ubicar tu pantalla de Stock; ajusta si tu nombre/folder cambia.
 try:
     from front.stock.ventana_stock import stock_view as stock_screen
@@ -100,15 +103,22 @@ def panel_shell_window_view(page: ft.Page) -> ft.View:
 
     # ---------- botón Salir (sin botón de “volver”) ----------
     def on_exit(_):
-        # limpiar selección del sheet y volver a lista
-        for k in ("sheet_id", "sheet_name", "last_sheet_id", "panel_selected"):
-            page.session.set(k, None)
-        try:
-            page.client_storage.remove("active_sheet_id")
-            page.client_storage.remove("active_sheet_name")
-        except Exception:
-            pass
-        page.go("/sheets")
+        async def _exit_flow():
+            import asyncio
+            # solo la cola de este usuario en este spreadsheet, fuera del handler de UI
+            await asyncio.to_thread(flush_logs, page.session.get("sheet_id"), 5.0,
+                                    page_identity(page))
+            # limpiar selección del sheet y volver a lista
+            for k in ("sheet_id", "sheet_name", "last_sheet_id", "panel_selected"):
+                page.session.set(k, None)
+            try:
+                page.client_storage.remove("active_sheet_id")
+                page.client_storage.remove("active_sheet_name")
+            except Exception:
+                pass
+            page.go("/sheets")
+
+        page.run_task(_exit_flow)
 
     appbar = ft.AppBar(
         # Sin leading/back
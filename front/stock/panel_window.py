@@ -3,6 +3,9 @@ import flet as ft
 import os, sys, importlib, importlib.util, traceback
 import importlib
 
+from back.drive.service_pool import page_identity
+from back.sheet.log_api import flush_logs
+
 PRIMARY = "#E53935"
 WHITE = ft.Colors.WHITE
 BG = ft.Colors.GREY_50
@@ -42,6 +45,11 @@ try:
 except Exception:
     logs_module_view = None
 
+try:
+    from front.stock.modules.metrics import metrics_view as metrics_module_view
+except Exception:
+    metrics_module_view = None
+
 
 # ===== Util: cargar gestorMain por paquete o por ruta =====
 def _load_gestor_view_callable():
@@ -214,6 +222,11 @@ def panel_window_view(page: ft.Page) -> ft.View:
     def view_logs() -> ft.Control:
         return logs_module_view(page) if callable(logs_module_view) else card_stub("Logs", "Eventos y auditoría")
 
+    # Panel oculto de métricas (sin botón de menú: Ctrl+Shift+M o mantener apretado el título).
+    # metrics_view verifica que el usuario sea Administrador de la planilla.
+    def view_metrics() -> ft.Control:
+        return metrics_module_view(page) if callable(metrics_module_view) else card_stub("Métricas", "Métricas de API")
+
     def view_gestor() -> ft.Control:
         fn, err = _get_gestor_view()
         if err:
@@ -235,6 +248,8 @@ def panel_window_view(page: ft.Page) -> ft.View:
             return view_usuarios()
         if key == "logs":
             return view_logs()
+        if key == "metrics":
+            return view_metrics()
         if key == "gestor":
             return view_gestor()
         return view_home()
@@ -401,6 +416,9 @@ def panel_window_view(page: ft.Page) -> ft.View:
 
         async def _exit_flow():
             import asyncio
+            # lo que este usuario dejó en la cola de este spreadsheet se manda antes de soltarlo
+            await asyncio.to_thread(flush_logs, page.session.get("sheet_id"), 5.0,
+                                    page_identity(page))
             for k in ("sheet_id", "sheet_name", "last_sheet_id", "panel_selected"):
                 page.session.set(k, None)
             try:
@@ -440,7 +458,10 @@ def panel_window_view(page: ft.Page) -> ft.View:
 
     appbar = ft.AppBar(
         leading=menu_btn,
-        title=ft.Text(f"Base :   {sheet_name}", color=WHITE),
+        title=ft.GestureDetector(
+            content=ft.Text(f"Base :   {sheet_name}", color=WHITE),
+            on_long_press_start=lambda e: set_selected("metrics"),
+        ),
         center_title=False, bgcolor=PRIMARY, color=WHITE,
     )
 
@@ -506,6 +527,20 @@ def panel_window_view(page: ft.Page) -> ft.View:
 
         page.run_task(_switch)
 
+    # Atajo del panel oculto de métricas
+    _prev_keyboard = page.on_keyboard_event
+    # Si el panel se vuelve a armar, no encadenar el handler anterior de este mismo panel
+    _prev_keyboard = getattr(_prev_keyboard, "prev", _prev_keyboard)
+
+    def _on_keyboard(e: ft.KeyboardEvent):
+        if e.ctrl and e.shift and (e.key or "").upper() == "M":
+            set_selected("metrics")
+        elif callable(_prev_keyboard):
+            _prev_keyboard(e)
+
+    _on_keyboard.prev = _prev_keyboard
+    page.on_keyboard_event = _on_keyboard
+
     # Render inicial
     def first_render():
         highlight_menu()